@@ -0,0 +1,121 @@
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+import profiling
+import memory_monitor
+from llm_ledger import LEDGER
+from schedule_store import invalidate_schedule_caches
+from business_store import invalidate_business_caches
+from registration_lookup import invalidate_registration
+import read_replica
+from tool_executor import run_blocking
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def is_admin(token: Optional[str]) -> bool:
+    """Admin routes are disabled entirely unless ADMIN_TOKEN is set."""
+    return bool(ADMIN_TOKEN) and token is not None and secrets.compare_digest(token, ADMIN_TOKEN)
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+class ProfilingSettings(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    slow_threshold: Optional[float] = Field(None, ge=0)
+    interval: Optional[float] = Field(None, gt=0)  # a zero interval would busy-loop the sampler thread
+
+@router.get("/profiling")
+async def get_profiling_settings():
+    """Current profiling settings."""
+    return {
+        "sample_rate": profiling.config.sample_rate,
+        "slow_threshold": profiling.config.slow_threshold,
+        "interval": profiling.config.interval,
+    }
+
+@router.post("/profiling")
+async def update_profiling_settings(settings: ProfilingSettings):
+    """Adjust automatic profiling at runtime."""
+    for field, value in settings.model_dump(exclude_none=True).items():
+        setattr(profiling.config, field, value)
+    return await get_profiling_settings()
+
+@router.get("/profiles")
+async def list_profiles():
+    """Stored profiles, newest last."""
+    return {"profiles": profiling.list_profiles()}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def download_profile(profile_id: int):
+    """Collapsed stacks for one profile (feed to flamegraph.pl or speedscope)."""
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profile["collapsed"],
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
+
+@router.post("/memory/baseline")
+async def memory_baseline():
+    """Start tracemalloc (if needed) and record a baseline snapshot."""
+    return memory_monitor.take_baseline()
+
+@router.get("/memory/diff")
+async def memory_diff(top: int = 25):
+    """Allocation growth since the baseline, grouped by module."""
+    try:
+        return {"modules": memory_monitor.snapshot_diff(top)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.delete("/memory/tracing")
+async def memory_stop_tracing():
+    """Stop tracemalloc and drop the baseline."""
+    memory_monitor.stop_tracing()
+    return {"tracing": False}
+
+@router.get("/memory/caches")
+async def memory_caches():
+    """Entry counts and estimated bytes per in-process cache."""
+    return {"rss_bytes": memory_monitor.current_rss(), "caches": await run_blocking(memory_monitor.cache_estimates)}
+
+@router.post("/schedule/invalidate")
+async def schedule_invalidate():
+    """Drop schedule caches after an import (see schedule_ingest.py --notify-url)."""
+    return invalidate_schedule_caches()
+
+@router.post("/businesses/invalidate")
+async def businesses_invalidate():
+    """Drop ib_businesses caches after an import (see business_ingest.py --notify-url)."""
+    return invalidate_business_caches()
+
+@router.post("/registrations/{registration_id}/invalidate")
+async def registration_invalidate(registration_id: str):
+    """Drop a cached users row after the registration system changes the user's details."""
+    return {"invalidated": invalidate_registration(registration_id)}
+
+@router.get("/replica")
+async def replica_status():
+    """Freshness, lag and row count of each table in the local read replica."""
+    if read_replica.REPLICA is None:
+        return {"enabled": False, "tables": {}}
+    return {"enabled": True, "max_staleness_seconds": read_replica.REPLICA.max_staleness,
+            "tables": read_replica.REPLICA.status()}
+
+@router.get("/llm/ledger")
+async def llm_ledger(recent: int = 20):
+    """Per-agent prompt size, completion tokens and latency, plus the most recent calls."""
+    return {"agents": LEDGER.summary(), "recent": list(LEDGER.recent)[-recent:] if recent > 0 else []}
+
+@router.delete("/llm/ledger")
+async def llm_ledger_reset():
+    """Start a fresh measurement window."""
+    LEDGER.reset()
+    return {"reset": True}
@@ -0,0 +1,112 @@
+"""Static parts of the /chat response, introspected from the agents once and kept as JSON bytes.
+
+chat_response() serializes only the per-request fields and splices the
+cached agent list and response fragments in, so every request skips
+rebuilding and re-encoding the same dicts.
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder produces the same bytes, slower
+    orjson = None
+
+CONFERENCE_NAME = "Aviation Tech Summit 2025"
+TIMESTAMP = "2024-01-01T00:00:00Z"
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+def _guardrail_name(guardrail: Any) -> str:
+    name = getattr(guardrail, "name", None)
+    if name:
+        return name
+    function = getattr(guardrail, "guardrail_function", None)
+    return getattr(function, "__name__", None) or type(guardrail).__name__
+
+def describe_agent(agent: Any, description: Optional[str] = None, routes_to: Iterable[Any] = ()) -> Dict[str, Any]:
+    """The UI's view of an agent: SDK handoffs plus routes made outside the SDK, tool and guardrail names."""
+    handoffs = []
+    for target in list(getattr(agent, "handoffs", None) or []) + list(routes_to):
+        name = getattr(target, "agent_name", None) or getattr(target, "name", None)
+        if name and name not in handoffs:
+            handoffs.append(name)
+    return {
+        "name": agent.name,
+        "description": description or getattr(agent, "handoff_description", None) or "",
+        "handoffs": handoffs,
+        "tools": [getattr(tool, "name", None) or getattr(tool, "__name__", str(tool)) for tool in getattr(agent, "tools", None) or []],
+        "input_guardrails": [_guardrail_name(g) for g in getattr(agent, "input_guardrails", None) or []],
+    }
+
+class AgentRegistry:
+    """Agents registered once at startup, with their description pre-encoded."""
+
+    def __init__(self):
+        self.agents: Dict[str, Dict[str, Any]] = {}
+        self.agents_json = b"[]"
+
+    def register(self, agent: Any, description: Optional[str] = None, routes_to: Iterable[Any] = ()) -> Any:
+        self.agents[agent.name] = describe_agent(agent, description, routes_to)
+        self.agents_json = dumps(list(self.agents.values()))
+        return agent
+
+AGENT_REGISTRY = AgentRegistry()
+
+# Fragments around the per-request values, each ending where a value is spliced in
+_RELEVANCE_PREFIX = b'[{"id":"1","name":"relevance","input":'
+_RELEVANCE_SUFFIX = dumps({"reasoning": "Message is relevant", "passed": True, "timestamp": TIMESTAMP})[1:] + b"]"
+_CUSTOMER_PREFIX = b'{"customer":{"name":"Conference Attendee","registration_id":'
+_CUSTOMER_SUFFIX = (b',"is_conference_attendee":true,"conference_name":' + dumps(CONFERENCE_NAME) + b'},"bookings":[]}')
+
+GREETING_GUARDRAILS = dumps([{"id": "1", "name": "relevance", "input": "", "reasoning": "OK", "passed": True, "timestamp": TIMESTAMP}])
+
+def relevance_guardrails(message: str) -> bytes:
+    """The (always passing) relevance guardrail entry for a message."""
+    return _RELEVANCE_PREFIX + dumps(message) + b"," + _RELEVANCE_SUFFIX
+
+def attendee_info(registration_id: Optional[str]) -> bytes:
+    return _CUSTOMER_PREFIX + dumps(registration_id) + _CUSTOMER_SUFFIX
+
+def chat_response(
+    response: str,
+    agent: str,
+    conversation_id: str,
+    context: Dict[str, Any],
+    events: List[Dict[str, Any]],
+    guardrails: bytes,
+    customer_info: bytes,
+    agents: Optional[bytes] = None,
+) -> Response:
+    """A /chat body with the same fields and order as before, from pre-encoded fragments."""
+    head = dumps({"response": response, "agent": agent, "current_agent": agent,
+                  "conversation_id": conversation_id, "context": context})
+    body = b"".join((
+        head[:-1],
+        b',"agents":', AGENT_REGISTRY.agents_json if agents is None else agents,
+        b',"events":', dumps(events),
+        b',"guardrails":', guardrails,
+        b',"customer_info":', customer_info,
+        b"}",
+    ))
+    return Response(content=body, media_type="application/json")
+
+ERROR_RESPONSE = dumps({
+    "response": "I'm sorry, there was an error. Please try again.",
+    "agent": "System",
+    "current_agent": "System",
+    "conversation_id": "error",
+    "context": {},
+    "agents": [],
+    "events": [],
+    "guardrails": [],
+    "customer_info": None,
+})
+
+def error_response() -> Response:
+    return Response(content=ERROR_RESPONSE, media_type="application/json")
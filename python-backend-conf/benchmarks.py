@@ -0,0 +1,657 @@
+"""Microbenchmarks for backend hot paths.
+
+Usage: python benchmarks.py [name ...] [--save-baseline] [--compare] [--threshold 0.2]
+
+No names runs everything. --save-baseline writes the results to
+BENCH_BASELINE (benchmarks_baseline.json); --compare reports every result
+that got worse than its baseline by more than the threshold and exits 1.
+Take baselines on the machine you compare on.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {}
+BASELINE_PATH = os.getenv("BENCH_BASELINE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json"))
+REGRESSION_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.2"))
+
+# "benchmark/label" -> (value, unit) for the current run; every unit is lower-is-better
+RESULTS: Dict[str, Tuple[float, str]] = {}
+_current = ""
+
+def benchmark(name: str):
+    """Register a benchmark under name."""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+def ns_per_op(func: Callable[[], object], number: int = 10000, repeat: int = 5) -> float:
+    """Best-of-repeat nanoseconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+def bytes_per_op(func: Callable[[], object], number: int = 200) -> float:
+    """Median peak bytes allocated during one call (temporaries included, tracemalloc overhead excluded)."""
+    func()  # Warm caches and lazy imports outside the measurement
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    samples = []
+    try:
+        for _ in range(number):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            samples.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    samples.sort()
+    return float(samples[len(samples) // 2])
+
+def report(label: str, value: float, unit: str = "ns/op") -> None:
+    RESULTS[f"{_current}/{label}"] = (value, unit)
+    print(f"  {label:<56} {value:>12,.0f} {unit}")
+
+def measure(label: str, func: Callable[[], object], number: int = 10000, repeat: int = 5) -> None:
+    """Report ns/op and B/op for func."""
+    report(label, ns_per_op(func, number, repeat))
+    report(f"{label} (alloc)", bytes_per_op(func), "B/op")
+
+def compare(baseline: Dict[str, Dict[str, object]], threshold: float) -> list:
+    """Results worse than their baseline by more than threshold, as printable lines."""
+    regressions = []
+    for key, (value, unit) in RESULTS.items():
+        entry = baseline.get(key)
+        if not entry or entry.get("unit") != unit or not entry.get("value"):
+            continue
+        change = value / float(entry["value"]) - 1
+        if change > threshold:
+            regressions.append(f"{key}: {entry['value']:,.0f} -> {value:,.0f} {unit} (+{change:.0%})")
+    return regressions
+
+# -- logging -----------------------------------------------------------------
+
+def _simulate_request_logging(log: logging.Logger, booking: dict, message: str) -> None:
+    """The log calls a typical /chat request with a booking lookup makes."""
+    log.info("Processing message (%d chars)", len(message))
+    log.info("Using agent: %s", "ConferenceAgent")
+    log.debug("✅ Found booking %s for %s", booking["id"], booking["confirmation_number"])
+    log.info("✅ Found flight status for %s", "FL123")
+    log.info("✅ Found %s conference sessions", 5)
+    log.warning("❌ No businesses found for user_id: %s", "42")
+
+def _simulate_request_logging_eager(log: logging.Logger, booking: dict, message: str) -> None:
+    """The same calls written as eager f-strings, as the hot path used to."""
+    log.info(f"Processing message: {message}")
+    log.info(f"Using agent: {'ConferenceAgent'}")
+    log.debug(f"✅ Found booking: {booking}")
+    log.info(f"✅ Found flight status for {'FL123'}")
+    log.info(f"✅ Found {5} conference sessions")
+    log.warning(f"❌ No businesses found for user_id: {'42'}")
+
+@benchmark("logging")
+def bench_logging() -> None:
+    """Caller-side logging cost per request: sync stream handler vs queue pipeline."""
+    from logging_config import configure_logging, shutdown_logging, ContextFilter, JsonFormatter
+    booking = {
+        "id": 1, "confirmation_number": "AB12CD", "seat_number": "12A",
+        "customers": {"name": "Jane Doe", "email": "jane@example.com", "account_number": "38249175"},
+        "flights": {"flight_number": "FL123", "origin": "SFO", "destination": "LAX"},
+    }
+    message = "Which sessions on predictive maintenance are on tomorrow? " * 4
+    log = logging.getLogger("bench.request")
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+
+    with open(os.devnull, "w") as devnull:
+        sync_handler = logging.StreamHandler(devnull)
+        sync_handler.setFormatter(JsonFormatter())
+        sync_handler.addFilter(ContextFilter())
+        root.handlers = [sync_handler]
+        root.setLevel(logging.INFO)
+        report("sync JSON handler, eager f-strings", ns_per_op(lambda: _simulate_request_logging_eager(log, booking, message), 2000), "ns/request")
+        report("sync JSON handler, lazy %-args", ns_per_op(lambda: _simulate_request_logging(log, booking, message), 2000), "ns/request")
+
+        configure_logging(level="INFO", stream=devnull)
+        try:
+            report("queue pipeline (caller side)", ns_per_op(lambda: _simulate_request_logging(log, booking, message), 2000), "ns/request")
+        finally:
+            shutdown_logging()
+
+        configure_logging(level="INFO", sample_rates={"bench.request": 0.1}, stream=devnull)
+        try:
+            report("queue pipeline, 10% sampling", ns_per_op(lambda: _simulate_request_logging(log, booking, message), 2000), "ns/request")
+        finally:
+            shutdown_logging()
+
+    root.handlers, root.level = saved_handlers, saved_level
+
+# -- tool fan-out -------------------------------------------------------------
+
+@benchmark("tool_fanout")
+def bench_tool_fanout() -> None:
+    """One model turn requesting N blocking lookups: sequential vs offloaded fan-out."""
+    import asyncio
+    import time
+    from tool_executor import offload_blocking
+
+    def lookup(delay: float) -> str:
+        time.sleep(delay)  # Stands in for a blocking .execute() round trip
+        return "ok"
+
+    offloaded = offload_blocking()(lookup)
+    delays = [0.05, 0.03, 0.04, 0.02]
+
+    started = time.perf_counter()
+    for delay in delays:
+        lookup(delay)
+    report(f"sequential, {len(delays)} lookups", (time.perf_counter() - started) * 1e3, "ms/turn")
+
+    async def turn():
+        await asyncio.gather(*(offloaded(delay) for delay in delays))
+    started = time.perf_counter()
+    asyncio.run(turn())
+    report(f"offloaded fan-out, {len(delays)} lookups", (time.perf_counter() - started) * 1e3, "ms/turn")
+    report("slowest single lookup", max(delays) * 1e3, "ms")
+
+# -- session search -------------------------------------------------------------
+
+def _synthetic_sessions(count: int):
+    import random
+    rng = random.Random(7)
+    subjects = ["predictive maintenance", "fleet analytics", "digital twins", "sustainable fuel", "air traffic",
+                "cabin connectivity", "cybersecurity", "autonomous drones", "engine health", "crew scheduling"]
+    angles = ["at scale", "in practice", "with machine learning", "for regional carriers", "lessons learned", "roadmap"]
+    speakers = [f"{first} {last}" for first in ("Ana", "Raj", "Mei", "Tom", "Lena", "Omar", "Sara", "Ivan")
+                for last in ("Airbus", "Boeing", "Embraer", "Rolls", "Safran", "Honeywell", "Thales", "GE")]
+    tracks = ["Artificial Intelligence", "Machine Learning", "Internet of Things", "Blockchain Technology", "Operations"]
+    return [
+        {
+            "id": i,
+            "topic": f"{rng.choice(subjects).title()} {rng.choice(angles)} #{i}",
+            "speaker_name": rng.choice(speakers),
+            "conference_date": f"2025-06-{10 + i % 3}",
+            "start_time": f"{9 + i % 9:02d}:00:00",
+            "conference_room_name": f"Hall {i % 40}",
+            "track_name": rng.choice(tracks),
+        }
+        for i in range(count)
+    ]
+
+@benchmark("session_search")
+def bench_session_search() -> None:
+    """search_sessions query latency over a large synthetic schedule."""
+    import time
+    from session_search import SessionSearchIndex
+
+    sessions = _synthetic_sessions(50000)
+    index = SessionSearchIndex()
+    started = time.perf_counter()
+    index.apply_changes(sessions, [])
+    report(f"index build, {len(sessions):,} sessions", (time.perf_counter() - started) * 1e3, "ms")
+    started = time.perf_counter()
+    index.apply_changes([dict(sessions[0], topic="Hydrogen propulsion")], [1])
+    report("incremental update, 2 sessions", (time.perf_counter() - started) * 1e6, "µs")
+
+    queries = {
+        "exact terms": ("predictive maintenance airbus", {}),
+        "track alias": ("ai drones", {}),
+        "prefix": ("cyber", {}),
+        "typo": ("maintenence", {}),
+        "filtered": ("fleet analytics", {"conference_date": "2025-06-11", "track_name": "ml"}),
+    }
+    for label, (query, filters) in queries.items():
+        report(f"query ({label})", ns_per_op(lambda: index.search(query, **filters), 50, 5) / 1e3, "µs/query")
+
+# -- schedule timeline -----------------------------------------------------------
+
+def _synthetic_timeline(count: int, rooms: int = 400, days: int = 5):
+    """Sessions back to back in each room, 30-90 minutes long, with end_time set."""
+    import random
+    rng = random.Random(11)
+    tracks = ["Artificial Intelligence", "Machine Learning", "Internet of Things", "Blockchain Technology", "Operations"]
+    sessions, room, day, minute = [], 0, 0, 8 * 60
+    for i in range(count):
+        length = rng.choice((30, 45, 60, 90))
+        if minute + length > 20 * 60:
+            room, minute = room + 1, 8 * 60
+            if room == rooms:
+                room, day = 0, (day + 1) % days
+        sessions.append({
+            "id": i,
+            "topic": f"Session {i}",
+            "speaker_name": f"Speaker {i % 997}",
+            "conference_date": f"2025-06-{10 + day}",
+            "start_time": f"{minute // 60:02d}:{minute % 60:02d}:00",
+            "end_time": f"{(minute + length) // 60:02d}:{(minute + length) % 60:02d}:00",
+            "conference_room_name": f"Room {room}",
+            "track_name": rng.choice(tracks),
+        })
+        minute += length + rng.choice((0, 0, 15, 30))
+    return sessions
+
+@benchmark("schedule_timeline")
+def bench_schedule_timeline() -> None:
+    """Time-index queries over a large synthetic schedule (tests/test_schedule_timeline.py checks the answers)."""
+    import random
+    import time
+    from datetime import datetime
+    from schedule_timeline import ScheduleTimeline
+
+    sessions = _synthetic_timeline(50000)
+    timeline = ScheduleTimeline()
+    started = time.perf_counter()
+    timeline.apply_changes(sessions, [])
+    report(f"index build, {len(sessions):,} sessions", (time.perf_counter() - started) * 1e3, "ms")
+    started = time.perf_counter()
+    timeline.apply_changes([dict(sessions[5], start_time="07:00:00", end_time="07:45:00")], [6])
+    report("incremental update, 2 sessions", (time.perf_counter() - started) * 1e6, "µs")
+
+    rng = random.Random(3)
+    moment = datetime(2025, 6, 11, 14, 20)
+    running = sorted(s["id"] for s in timeline.happening_at(moment))
+    agenda = rng.sample(sorted(timeline.spans), 40) + running[:3]
+
+    afternoon = (datetime(2025, 6, 11, 14), datetime(2025, 6, 11, 16))
+    queries = {
+        "on now, all rooms": lambda: timeline.happening_at(moment),
+        "on now, one room": lambda: timeline.happening_at(moment, room="Room 7"),
+        "next 5 in a room": lambda: timeline.next_sessions(moment, room="Room 7"),
+        "free slots 2-4pm in a room": lambda: timeline.free_slots(*afternoon, room="Room 7"),
+        "free slots 2-4pm in an agenda": lambda: timeline.free_slots(*afternoon, agenda=agenda),
+        "agenda conflicts (43 sessions)": lambda: timeline.agenda_conflicts(agenda),
+        "alternatives for one conflict": lambda: timeline.alternatives(agenda[-1], agenda),
+    }
+    for label, query in queries.items():
+        report(label, ns_per_op(query, 200, 5) / 1e3, "µs/query")
+
+# -- business matching -----------------------------------------------------------
+
+def _synthetic_businesses(count: int):
+    import random
+    rng = random.Random(5)
+    sectors = {
+        "Aviation": ["MRO", "Airlines", "Airports", "Ground Handling"],
+        "Technology": ["Software", "Drones", "Cybersecurity", "Data Analytics"],
+        "Logistics": ["Freight", "Warehousing", "Last Mile"],
+        "Energy": ["Sustainable Fuel", "Hydrogen", "Solar"],
+        "Finance": ["Leasing", "Insurance", "Payments"],
+    }
+    locations = ["Dubai", "Riyadh", "Singapore", "London", "Toulouse", "Seattle", "Doha", "Mumbai", "Nairobi", "Cairo"]
+    words = ["predictive", "maintenance", "engine", "cabin", "fleet", "analytics", "cargo", "booking", "crew",
+             "training", "simulation", "composites", "avionics", "connectivity", "catering", "security", "leasing",
+             "biofuel", "charging", "drone", "inspection", "satellite", "navigation", "weather", "parts", "repair"]
+    rows = []
+    for i in range(count):
+        sector = rng.choice(list(sectors))
+        rows.append({"id": i, "user_id": f"user-{i % (count // 2)}", "is_active": True, "details": {
+            "companyName": f"{rng.choice(words).title()}{rng.choice(words).title()} {i}",
+            "industrySector": sector,
+            "subSector": rng.choice(sectors[sector]),
+            "location": rng.choice(locations),
+            "briefDescription": " ".join(rng.sample(words, 8)),
+            "productsOrServices": ", ".join(rng.sample(words, 4)),
+        }})
+    return rows
+
+@benchmark("business_matching")
+def bench_business_matching() -> None:
+    """recommend_businesses latency over a large synthetic ib_businesses snapshot."""
+    import time
+    from business_matching import BusinessMatcher
+
+    rows = _synthetic_businesses(100000)
+    matcher = BusinessMatcher()
+    matcher.apply_changes(rows, [])
+    profile = {"companyName": "SkyFix", "industrySector": "Aviation", "subSector": "MRO", "location": "Dubai",
+               "briefDescription": "Predictive maintenance and engine repair for regional fleets",
+               "productsOrServices": "inspection drones, parts"}
+    started = time.perf_counter()
+    matcher.recommend(profile)
+    report(f"matrix build, {len(rows):,} businesses", (time.perf_counter() - started) * 1e3, "ms")
+    report("recommend top 5", ns_per_op(lambda: matcher.recommend(profile, exclude_user_id="user-1"), 50, 5) / 1e3, "µs/query")
+
+    added = [dict(rows[0], id=100000 + i) for i in range(50)]
+    started = time.perf_counter()
+    matcher.apply_changes(added, [])
+    matcher.recommend(profile)
+    report(f"incremental add of {len(added)} + query", (time.perf_counter() - started) * 1e3, "ms")
+    report("recommend top 5 with pending delta rows", ns_per_op(lambda: matcher.recommend(profile), 50, 5) / 1e3, "µs/query")
+    top = matcher.recommend(profile, limit=1)[0]
+    print(f"  best match: {top.business['details']['companyName']} ({top.score:.2f}) because {', '.join(top.reasons)}")
+
+@benchmark("change_feed")
+def bench_change_feed() -> None:
+    """Keeping a 50k-row ib_businesses snapshot fresh: whole-table reload and diff vs change-feed poll, under churn."""
+    import random
+    import sqlite3
+    import time
+    from datetime import datetime, timedelta, timezone
+    from change_feed import ChangeFeed, SQLiteSource
+    from snapshot_store import SnapshotStore
+
+    rng = random.Random(3)
+    clock = [datetime(2025, 5, 1, tzinfo=timezone.utc)]
+
+    def stamp() -> str:
+        clock[0] += timedelta(milliseconds=1)
+        return clock[0].isoformat()
+
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("create table ib_businesses (id integer primary key, user_id text, details text, is_active integer, updated_at text)")
+    conn.execute("create index ib_businesses_updated_at_idx on ib_businesses (updated_at, id)")
+    conn.executemany("insert into ib_businesses values (?, ?, ?, ?, ?)",
+                     [(row["id"], row["user_id"], json.dumps(row["details"]), 1, stamp()) for row in _synthetic_businesses(50000)])
+
+    def table_rows():
+        cursor = conn.execute("select * from ib_businesses order by id")
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    reload_store = SnapshotStore("bench-reload", table_rows, 0)
+    feed = ChangeFeed("bench-feed", SQLiteSource(conn, "ib_businesses"), reconcile_seconds=3600)
+    feed_store = SnapshotStore("bench-feed", table_rows, 0, feed=feed)
+    changes = []
+    feed_store.subscribe(lambda upserts, deletes: changes.append((len(upserts), len(deletes))))
+    logging.getLogger("snapshot_store").setLevel(logging.WARNING)
+    reload_store.apply_snapshot(table_rows())
+    feed.poll()
+
+    def churn(updates: int = 200, inserts: int = 50, deletes: int = 20) -> None:
+        ids = [row_id for (row_id,) in conn.execute("select id from ib_businesses")]
+        for row_id in rng.sample(ids, updates):
+            conn.execute("update ib_businesses set is_active = 1 - is_active, updated_at = ? where id = ?", (stamp(), row_id))
+        top = max(ids)
+        conn.executemany("insert into ib_businesses values (?, 'user-new', '{}', 1, ?)", [(top + 1 + i, stamp()) for i in range(inserts)])
+        conn.executemany("delete from ib_businesses where id = ?", [(row_id,) for row_id in rng.sample(ids, deletes)])
+
+    reload_ms, poll_ms, reconcile_ms = [], [], []
+    for _ in range(5):
+        churn()
+        started = time.perf_counter()
+        reload_store.apply_snapshot(table_rows())
+        reload_ms.append((time.perf_counter() - started) * 1e3)
+        started = time.perf_counter()
+        feed.poll()
+        poll_ms.append((time.perf_counter() - started) * 1e3)
+        feed.reconcile_soon()
+        started = time.perf_counter()
+        feed.poll()
+        reconcile_ms.append((time.perf_counter() - started) * 1e3)
+        expected = {row["id"]: row for row in table_rows()}
+        assert feed_store.rows == expected, "change-feed snapshot diverged from the table"
+        assert reload_store.rows == expected
+    report("whole-table reload + diff, 50k rows, 270 changed", min(reload_ms), "ms")
+    report("change-feed poll (upserts only)", min(poll_ms), "ms")
+    report("change-feed id reconcile (deletes)", min(reconcile_ms), "ms")
+    print(f"  listener calls per churn round: {changes[-2:]}, feed v{feed.version}, store v{feed_store.version}")
+
+# -- per-message hot paths ----------------------------------------------------------
+
+def _synthetic_messages(count: int, length: int, seed: int = 11):
+    """User messages of about length chars: filler words, intent keywords and the odd typo."""
+    import random
+    from semantic_mappings import GUARDRAIL_KEYWORDS, SEMANTIC_MAPPINGS
+    rng = random.Random(seed)
+    keywords = [k for spec in SEMANTIC_MAPPINGS.values() for k in spec["keywords"]] + GUARDRAIL_KEYWORDS["relevant"]
+    filler = ["please", "could", "you", "tell", "me", "about", "the", "tomorrow", "morning", "which", "is",
+              "there", "any", "on", "my", "for", "and", "thanks", "what", "time", "where", "attend", "want"]
+    messages = []
+    for _ in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < length:
+            word = rng.choice(keywords) if rng.random() < 0.15 else rng.choice(filler)
+            if len(word) > 5 and rng.random() < 0.05:
+                i = rng.randrange(len(word))
+                word = word[:i] + word[i + 1:]  # Typo; only fuzzy categories catch these
+            words.append(word)
+        messages.append(" ".join(words).capitalize() + "?")
+    return messages
+
+@benchmark("message_matching")
+def bench_message_matching() -> None:
+    """Keyword scan behind route_request and the relevance/jailbreak guardrails, by message length."""
+    import itertools
+    from keyword_matcher import MESSAGE_MATCHER, match_message
+    for length in (40, 400, 4000):
+        messages = _synthetic_messages(256, length)
+        fresh = itertools.cycle(messages)
+        number = 2000 if length < 4000 else 200
+        measure(f"scan, {length}-char messages", lambda: MESSAGE_MATCHER.match(next(fresh)), number)
+        for message in messages:
+            match_message(message)
+        cached = itertools.cycle(messages)
+        # One turn: route_request plus both guardrails on the same message
+        measure(f"route + 2 guardrails, cached, {length} chars", lambda: (
+            match_message(next(cached)).has("conference"),
+            match_message(next(cached)).has("relevant"),
+            match_message(next(cached)).has("jailbreak"),
+        ), number)
+    match_message.cache_clear()
+
+@benchmark("canonical_mappings")
+def bench_canonical_mappings() -> None:
+    """get_canonical_key / get_canonical_value over mixed inputs and growing value mappings."""
+    import itertools
+    import semantic_mappings
+    from semantic_mappings import KEY_MAPPINGS, get_canonical_key, get_canonical_value
+    keys = itertools.cycle(list(KEY_MAPPINGS) + ["conference_date", "Topic", "details", "start_time"])
+    measure("get_canonical_key", lambda: get_canonical_key(next(keys)))
+    passthrough = itertools.cycle(["2025-06-10", "09:00", "Confirmed", "12A"])
+    measure("get_canonical_value, non-fuzzy field", lambda: get_canonical_value("conference_date", next(passthrough)))
+
+    saved = semantic_mappings.VALUE_MAPPINGS["track_name"]
+    values = itertools.cycle(["ai", "machine lerning", "Internet of Things", "Operations", "block chain", "cyber security"])
+    try:
+        for size in (len(saved), 50, 500):
+            mapping = dict(saved)
+            for i in range(size - len(mapping)):
+                mapping[f"track alias {i}"] = f"Track {i}"
+            semantic_mappings.VALUE_MAPPINGS["track_name"] = mapping
+            measure(f"get_canonical_value, track_name, {size} mappings",
+                    lambda: get_canonical_value("track_name", next(values)), 2000 if size < 500 else 200)
+    finally:
+        semantic_mappings.VALUE_MAPPINGS["track_name"] = saved
+
+@benchmark("faq")
+def bench_faq() -> None:
+    """faq_lookup_tool's deterministic answer, per question branch."""
+    from faq_agent_tools import answer_faq
+    questions = {
+        "baggage": "How many checked bags can I bring and what are the luggage fees?",
+        "aircraft": "How many seats does the plane have and what is the configuration?",
+        "fallback": "Do you serve vegetarian meals on the morning flight to Dubai? " * 3,
+    }
+    for label, question in questions.items():
+        measure(f"answer_faq, {label}", lambda: answer_faq(question))
+
+@benchmark("tool_formatting")
+def bench_tool_formatting() -> None:
+    """String builders of the schedule and networking tools, by result-set size."""
+    from schedule_agent_tools import _format_sessions, _session_line
+    from networking_agent_tools import _format_businesses
+    sessions = _synthetic_sessions(500)
+    for size in (5, 50, 500):
+        measure(f"get_conference_sessions text, {size} sessions", lambda: _format_sessions(sessions[:size]), 2000 if size < 500 else 100)
+    measure("search_sessions line", lambda: _session_line(sessions[0]))
+    businesses = [{"details": row["details"], "users": {"user_name": f"member{row['id']}"}} for row in _synthetic_businesses(200)]
+    for size in (3, 200):
+        measure(f"search_businesses text, {size} results", lambda: _format_businesses(businesses[:size]))
+
+@benchmark("tool_output")
+def bench_tool_output() -> None:
+    """Estimated tokens each tool result adds to the model context, verbose vs compact output."""
+    from business_matching import Recommendation
+    from common_tools import format_booking
+    from flight_status_agent_tools import format_flight_status
+    from llm_ledger import estimate_tokens
+    from networking_agent_tools import _format_businesses, _format_recommendations
+    from schedule_agent_tools import FACETS, _format_facet, _format_search, _format_sessions
+    from session_search import SearchHit
+    from tool_output import COMPACT, VERBOSE, output_mode_scope
+
+    sessions = _synthetic_sessions(50)
+    speakers = sorted({s["speaker_name"] for s in sessions})
+    facet = [{FACETS["speakers"][1]: name, "session_count": 3} for name in speakers]
+    businesses = [{"details": row["details"], "users": {"user_name": f"member{row['id']}"}} for row in _synthetic_businesses(20)]
+    booking = {"seat_number": "12A", "booking_status": "Confirmed", "customers": {"name": "Jane Doe"},
+               "flights": {"flight_number": "FL123", "origin": "DXB", "destination": "LHR"}}
+    flight = {"current_status": "Delayed", "gate": "B12", "terminal": "3", "delay_minutes": 25}
+    outputs = {
+        "get_conference_sessions, 5 sessions": lambda: _format_sessions(sessions[:5]),
+        "get_conference_sessions, 50 sessions": lambda: _format_sessions(sessions, "eyJpZCI6NTB9"),
+        "get_all_speakers, one page": lambda: _format_facet("speakers", "Speakers", "speakers", facet, "eyJpZCI6NTB9"),
+        "search_sessions, 10 hits": lambda: _format_search("predictive maintenance", [SearchHit(1.0, s) for s in sessions[:10]]),
+        "get_booking_details": lambda: format_booking("AB12CD", booking),
+        "flight_status_tool": lambda: format_flight_status("FL123", flight),
+        "search_businesses, 20 results": lambda: _format_businesses(businesses, shown=20),
+        "recommend_businesses, top 5": lambda: _format_recommendations(
+            [Recommendation(0.8, row, ["same sector", "predictive", "maintenance"]) for row in businesses[:5]]),
+    }
+    for label, render in outputs.items():
+        with output_mode_scope(VERBOSE):
+            verbose = estimate_tokens(render())
+        with output_mode_scope(COMPACT):
+            compact = estimate_tokens(render())
+        assert compact < verbose, f"compact {label} output is not smaller"
+        report(f"{label}, verbose", verbose, "tokens")
+        report(f"{label}, compact", compact, "tokens")
+
+@benchmark("agent_context")
+def bench_agent_context() -> None:
+    """AirlineAgentContext construction and serialization, by number of bookings."""
+    from context import AirlineAgentContext, CustomerBooking, UserDetails
+    user = UserDetails(user_id="42", registration_id="100042", user_name="jdoe", firstName="Jane", lastName="Doe",
+                       email="jane@example.com")
+    for count in (0, 5, 50):
+        bookings = [CustomerBooking(id=i, confirmation_number=f"CN{i:04d}", flight_number=f"FL{i}", seat_number="12A",
+                                    booking_status="Confirmed", origin="DXB", destination="LHR", customer_name="Jane Doe")
+                    for i in range(count)]
+        number = 5000 if count < 50 else 500
+        measure(f"construct, {count} bookings", lambda: AirlineAgentContext(
+            registration_id="100042", user_id="42", passenger_name="Jane Doe", customer_bookings=bookings,
+            agenda_session_ids=list(range(10)), user_details=user), number)
+        ctx = AirlineAgentContext(registration_id="100042", customer_bookings=bookings, user_details=user)
+        measure(f".dict(), {count} bookings", lambda: ctx.model_dump(), number)
+        measure(f"checkpoint JSON round trip, {count} bookings",
+                lambda: AirlineAgentContext.model_validate_json(ctx.model_dump_json()), number)
+
+@benchmark("checkpoints")
+def bench_checkpoints() -> None:
+    """Conversation checkpoints: buffered save() on the request path, and the writer's batched flush to SQLite."""
+    import itertools
+    import tempfile
+    import time
+    from contextlib import closing
+    from checkpoint_store import CheckpointStore
+    from context import AirlineAgentContext, CustomerBooking
+    bookings = [CustomerBooking(id=i, confirmation_number=f"CN{i:04d}", flight_number=f"FL{i}", seat_number="12A")
+                for i in range(5)]
+    ctx = AirlineAgentContext(registration_id="100042", customer_bookings=bookings, agenda_session_ids=list(range(10)))
+    history = [{"role": "user", "content": "Which sessions are on tomorrow?"},
+               {"type": "function_call", "call_id": "c1", "name": "get_conference_sessions", "arguments": "{}"},
+               {"type": "function_call_output", "call_id": "c1", "output": "x" * 2000},
+               {"role": "assistant", "content": "Here are tomorrow's sessions."}]
+    with tempfile.TemporaryDirectory() as tmp:
+        # The writer thread only runs when told to, so save() and flush are measured apart
+        store = CheckpointStore(os.path.join(tmp, "checkpoints.db"), flush_interval=3600, batch_size=10**9)
+        ids = itertools.count()
+        measure("save(), new conversation", lambda: store.save(f"conv_{next(ids)}", ctx, history, 0), 2000)
+        store._pending.clear()
+        for size in (1, 500):
+            for i in range(size):
+                store.save(f"flush_{size}_{i}", ctx, history, 0)
+            with closing(store._connect()) as conn:
+                started = time.perf_counter()
+                store._flush(conn)
+                elapsed = time.perf_counter() - started
+            report(f"flush, batch of {size}", elapsed / size * 1e6, "µs/row")
+        store.close()
+
+@benchmark("chat_envelope")
+def bench_chat_envelope() -> None:
+    """/chat response serialization: literal dicts through FastAPI's encoder vs spliced pre-encoded fragments."""
+    from fastapi.encoders import jsonable_encoder
+    from agent_registry import attendee_info, chat_response, dumps, relevance_guardrails
+    from schedule_agent_tools import _format_sessions
+    agents = [
+        {"name": "TriageAgent", "description": "Routes requests", "handoffs": ["ConferenceAgent"], "tools": [], "input_guardrails": []},
+        {"name": "ConferenceAgent", "description": "Conference queries", "handoffs": ["TriageAgent"],
+         "tools": ["get_conference_sessions", "search_sessions", "get_all_speakers", "get_all_tracks", "get_all_rooms", "whats_on",
+                   "find_free_slots", "add_to_agenda", "remove_from_agenda", "review_agenda"], "input_guardrails": []},
+    ]
+    agents_json = dumps(agents)
+    message = "Which sessions on predictive maintenance are on tomorrow?"
+    for size in (5, 50):
+        text = _format_sessions(_synthetic_sessions(size))
+        events = [{"id": "1", "type": "message", "agent": "ConferenceAgent", "content": f"Processed: {message[:30]}...",
+                   "timestamp": "2024-01-01T00:00:00Z", "metadata": {}}]
+
+        def literal() -> bytes:
+            body = {
+                "response": text, "agent": "ConferenceAgent", "current_agent": "ConferenceAgent",
+                "conversation_id": "conv_100042", "context": {"registration_id": "100042"},
+                "agents": [dict(agent) for agent in agents],
+                "events": events,
+                "guardrails": [{"id": "1", "name": "relevance", "input": message, "reasoning": "Message is relevant",
+                                "passed": True, "timestamp": "2024-01-01T00:00:00Z"}],
+                "customer_info": {"customer": {"name": "Conference Attendee", "registration_id": "100042",
+                                               "is_conference_attendee": True, "conference_name": "Aviation Tech Summit 2025"},
+                                  "bookings": []},
+            }
+            return json.dumps(jsonable_encoder(body), ensure_ascii=False, separators=(",", ":")).encode()
+
+        def spliced() -> bytes:
+            return chat_response(text, "ConferenceAgent", "conv_100042", {"registration_id": "100042"}, events,
+                                 relevance_guardrails(message), attendee_info("100042"), agents_json).body
+
+        assert json.loads(literal()) == json.loads(spliced()), "spliced /chat body differs from the literal one"
+        measure(f"literal dicts + jsonable_encoder, {size}-session reply", literal, 2000)
+        measure(f"pre-encoded fragments, {size}-session reply", spliced, 2000)
+        report(f"payload, {size}-session reply", len(spliced()), "bytes")
+
+def main(argv=None) -> int:
+    global _current
+    parser = argparse.ArgumentParser(description="Run backend microbenchmarks.")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {BASELINE_PATH}")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown, e.g. 0.2 for 20%%")
+    args = parser.parse_args(argv)
+
+    for name in args.names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark {name!r}; choose from {', '.join(BENCHMARKS)}")
+        print(f"{name}: {BENCHMARKS[name].__doc__}")
+        _current = name
+        BENCHMARKS[name]()
+
+    if args.compare:
+        if not os.path.exists(BASELINE_PATH):
+            sys.exit(f"No baseline at {BASELINE_PATH}; run with --save-baseline first")
+        with open(BASELINE_PATH) as fp:
+            regressions = compare(json.load(fp), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as fp:
+                baseline = json.load(fp)
+        baseline.update({key: {"value": round(value, 1), "unit": unit} for key, (value, unit) in RESULTS.items()})
+        with open(BASELINE_PATH, "w") as fp:
+            json.dump(baseline, fp, indent=2, sort_keys=True)
+        print(f"Saved {len(RESULTS)} results to {BASELINE_PATH}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
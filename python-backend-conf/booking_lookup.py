@@ -0,0 +1,69 @@
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+from context import CustomerBooking
+from database import db_client
+from cache_utils import LRUCache
+from common_tools import build_customer_booking
+from resilience import guarded, DB_CALL_TIMEOUT
+from memory_monitor import register_cache
+from tool_executor import run_blocking
+from read_replica import note_write
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Same embedded join as fetch_booking: one round trip for booking, customer and flight
+BOOKING_SELECT = "*, customers:customer_id(*), flights:flight_id(*)"
+MAX_BATCH_SIZE = int(os.getenv("BOOKING_BATCH_LIMIT", "50"))
+_NOT_FOUND = object()
+
+# The public endpoints answer anyone who knows a confirmation number, so they leave these out
+PRIVATE_BOOKING_FIELDS = {"customer_id", "customer_email", "account_number"}
+# Confirmation numbers one client may look up per minute; a full batch must fit in the burst
+LOOKUPS_PER_MINUTE = float(os.getenv("BOOKING_LOOKUPS_PER_MINUTE", "60"))
+LOOKUP_LIMITER = RateLimiter("booking_lookups", LOOKUPS_PER_MINUTE / 60, max(LOOKUPS_PER_MINUTE, MAX_BATCH_SIZE))
+
+# Short TTL: seat changes and cancellations made elsewhere show up within seconds
+_bookings = LRUCache(
+    maxsize=int(os.getenv("BOOKING_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("BOOKING_CACHE_TTL_SECONDS", "30")),
+)
+register_cache("bookings_by_confirmation", lambda: _bookings._data)
+
+def _query_bookings(confirmation_numbers: List[str]) -> List[Dict[str, Any]]:
+    response = db_client.table("bookings").select(BOOKING_SELECT).in_("confirmation_number", confirmation_numbers).execute()
+    return response.data or []
+
+async def lookup_bookings(confirmation_numbers: Iterable[str]) -> Dict[str, Optional[CustomerBooking]]:
+    """Bookings by confirmation number (None when not found); cache misses share one query."""
+    wanted = list(dict.fromkeys(str(number).strip() for number in confirmation_numbers if str(number).strip()))
+    found: Dict[str, Optional[CustomerBooking]] = {}
+    missing: List[str] = []
+    for number in wanted:
+        cached = _bookings.get(number, None)
+        if cached is None:
+            missing.append(number)
+        else:
+            found[number] = None if cached is _NOT_FOUND else cached
+    if missing:
+        rows = await guarded("db.bookings", lambda: run_blocking(_query_bookings, missing), timeout=DB_CALL_TIMEOUT, hedge=True)
+        by_number = {row.get("confirmation_number"): build_customer_booking(row) for row in rows or []}
+        for number in missing:
+            booking = by_number.get(number)
+            _bookings.set(number, _NOT_FOUND if booking is None else booking)
+            found[number] = booking
+        logger.debug("Loaded %d of %d bookings in one query", len(by_number), len(missing))
+    return {number: found[number] for number in wanted}
+
+async def lookup_booking(confirmation_number: str) -> Optional[CustomerBooking]:
+    return (await lookup_bookings([confirmation_number])).get(str(confirmation_number).strip())
+
+def public_booking(booking: CustomerBooking) -> Dict[str, Any]:
+    """A booking without the customer's contact and account details."""
+    return booking.model_dump(exclude=PRIVATE_BOOKING_FIELDS)
+
+def invalidate_booking(confirmation_number: str) -> None:
+    """Forget a cached booking, e.g. after its seat or status changes."""
+    _bookings.pop(str(confirmation_number).strip())
+    note_write("bookings")
@@ -0,0 +1,245 @@
+"""Streaming building blocks for bulk imports: read, validate, transform and write in batches.
+
+Records are pulled lazily from the source file, so memory is bounded by
+batch_size * concurrency no matter how large the file is.
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import time
+import urllib.request
+from itertools import chain, islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+from pydantic import TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+JSON_CHUNK_SIZE = 1 << 16
+MAX_JSON_RECORD_SIZE = 1 << 20  # Characters one element of a JSON array may span
+MAX_REJECT_SAMPLES = 20
+
+# (1-based record number, raw record)
+Record = Tuple[int, Dict[str, Any]]
+
+SEPARATORS_RE = re.compile(r"[\s,]*")
+
+class MalformedInput(ValueError):
+    """Raised when a JSON array cannot be read any further."""
+
+class Unparsable:
+    """Stands in for a JSON lines record that is not valid JSON; run_pipeline rejects it."""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+def _iter_json_array(fp: TextIO, buffer: str) -> Iterator[Dict[str, Any]]:
+    """Elements of a JSON array, decoded incrementally from fp after the text already in buffer."""
+    decoder = json.JSONDecoder()
+    position, count = 1, 0
+    while True:
+        position = SEPARATORS_RE.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # Either the element continues in the next chunk or it is malformed; the cap tells them apart
+            chunk = fp.read(JSON_CHUNK_SIZE) if len(buffer) - position <= MAX_JSON_RECORD_SIZE else ""
+            if not chunk:
+                if not buffer[position:].strip():
+                    return
+                raise MalformedInput(
+                    f"Record {count + 1} is not valid JSON ({e.msg}) or longer than "
+                    f"{MAX_JSON_RECORD_SIZE:,} characters: {buffer[position:position + 80]!r}"
+                ) from e
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        count += 1
+        yield value
+
+def _iter_json_lines(first_line: str, fp: TextIO) -> Iterator[Any]:
+    """One value per non-blank line; lines that do not parse become Unparsable."""
+    for line in chain((first_line,), fp):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield Unparsable(f"invalid JSON: {e.msg} at column {e.colno}")
+
+def _iter_json(fp: TextIO) -> Iterator[Any]:
+    """Objects from a JSON array or from JSON lines, decoded incrementally."""
+    first = fp.read(1)
+    while first.isspace():
+        first = fp.read(1)
+    if first == "[":
+        return _iter_json_array(fp, first + fp.read(JSON_CHUNK_SIZE))
+    return _iter_json_lines(first + fp.readline(), fp)
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Record]:
+    """Stream records from a CSV, JSON array or JSON lines file.
+
+    A JSON lines record that does not parse is yielded as Unparsable and
+    rejected by run_pipeline; a JSON array that does not parse raises
+    MalformedInput, since nothing after the bad element can be located.
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "json")
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8-sig") as fp:
+        rows: Iterable[Dict[str, Any]] = csv.DictReader(fp) if fmt == "csv" else _iter_json(fp)
+        for number, row in enumerate(rows, 1):
+            yield number, row
+
+def batched(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class Rejected(Exception):
+    """Raised by a transform to reject one record with a reason."""
+
+class IngestReport:
+    """Counters for one import run."""
+
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.reject_samples: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, number: int, reason: str, sink: Optional[TextIO] = None) -> None:
+        self.rejected += 1
+        entry = {"record": number, "reason": reason}
+        if len(self.reject_samples) < MAX_REJECT_SAMPLES:
+            self.reject_samples.append(entry)
+        if sink is not None:
+            sink.write(json.dumps(entry) + "\n")
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "read": self.read,
+            "written": self.written,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "reject_samples": self.reject_samples,
+        }
+
+def validate_batch(adapter: TypeAdapter, batch: Sequence[Record]) -> Tuple[List[Tuple[int, Any]], List[Tuple[int, str]]]:
+    """Validate a batch with one TypeAdapter call; on errors, split out the bad records and re-validate the rest."""
+    rows = [row for _, row in batch]
+    try:
+        return list(zip((number for number, _ in batch), adapter.validate_python(rows))), []
+    except ValidationError as e:
+        problems: Dict[int, List[str]] = {}
+        for error in e.errors():
+            index = error["loc"][0]
+            field = ".".join(str(part) for part in error["loc"][1:])
+            problems.setdefault(index, []).append(f"{field}: {error['msg']}" if field else error["msg"])
+    good = [record for index, record in enumerate(batch) if index not in problems]
+    rejected = [(batch[index][0], "; ".join(messages)) for index, messages in sorted(problems.items())]
+    valid, more_rejected = validate_batch(adapter, good) if good else ([], [])
+    return valid, rejected + more_rejected
+
+async def run_pipeline(
+    records: Iterable[Record],
+    adapter: TypeAdapter,
+    write: Optional[Callable[[List[Any]], Awaitable[int]]],
+    transform: Optional[Callable[[Any], Any]] = None,
+    batch_size: int = 500,
+    concurrency: int = 4,
+    rejects: Optional[TextIO] = None,
+    progress_every: int = 100000,
+    dedupe_key: Optional[Callable[[Any], Any]] = None,
+) -> IngestReport:
+    """Validate and transform records in batches and write up to concurrency batches at once.
+
+    write(items) returns the number of rows written; with write=None the run
+    only validates (a dry run). A failed write counts its batch as failed and
+    the run carries on. With dedupe_key, items of one batch that share a key
+    (e.g. an upsert's conflict columns) are written once: the last one wins
+    and the earlier ones are rejected.
+    """
+    report = IngestReport()
+    in_flight: set = set()
+    next_progress = progress_every
+
+    async def _write(items: List[Any]) -> None:
+        try:
+            report.written += await write(items)
+        except Exception as e:
+            report.failed_batches += 1
+            logger.error("Batch of %d rows failed: %s", len(items), e)
+
+    for batch in batched(records, batch_size):
+        report.read += len(batch)
+        parsed = []
+        for number, row in batch:
+            if isinstance(row, Unparsable):
+                report.reject(number, row.reason, rejects)
+            else:
+                parsed.append((number, row))
+        valid, invalid = validate_batch(adapter, parsed) if parsed else ([], [])
+        for number, reason in invalid:
+            report.reject(number, reason, rejects)
+        kept: Dict[Any, Tuple[int, Any]] = {}
+        for number, item in valid:
+            try:
+                item = transform(item) if transform else item
+            except Rejected as e:
+                report.reject(number, str(e), rejects)
+                continue
+            key = dedupe_key(item) if dedupe_key else number
+            if key in kept:
+                report.reject(kept.pop(key)[0], f"superseded by record {number} with the same key {key}", rejects)
+            kept[key] = (number, item)
+        items = [item for _, item in kept.values()]
+        if items and write is not None:
+            if len(in_flight) >= concurrency:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.add(asyncio.ensure_future(_write(items)))
+            await asyncio.sleep(0)  # Let the write start before validating the next batch
+        elif items:
+            report.written += len(items)
+        if report.read >= next_progress:
+            next_progress += progress_every
+            report.elapsed = time.perf_counter() - report.started
+            logger.info("Ingested %d rows (%.0f rows/s, %d rejected)", report.read, report.rows_per_second, report.rejected)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+def format_report(report: IngestReport, dry_run: bool = False) -> str:
+    verb = "validated" if dry_run else "written"
+    lines = [
+        f"Read {report.read:,} rows in {report.elapsed:.1f}s ({report.rows_per_second:,.0f} rows/s)",
+        f"{report.written:,} {verb}, {report.rejected:,} rejected, {report.failed_batches} failed batches",
+    ]
+    lines += [f"  record {sample['record']}: {sample['reason']}" for sample in report.reject_samples]
+    return "\n".join(lines)
+
+def notify_server(base_url: str, path: str) -> Dict[str, Any]:
+    """POST to an admin endpoint of a running backend (needs ADMIN_TOKEN), e.g. to drop its caches."""
+    request = urllib.request.Request(
+        base_url.rstrip("/") + path,
+        method="POST",
+        headers={"x-admin-token": os.getenv("ADMIN_TOKEN", "")},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read() or b"{}")
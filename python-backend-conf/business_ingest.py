@@ -0,0 +1,217 @@
+"""Stream an exhibitor or member list into ib_businesses.
+
+Usage: python business_ingest.py exhibitors.csv [--user-id ID] [--organization-id ID]
+                                  [--batch-size 500] [--concurrency 4] [--dry-run]
+                                  [--rejects rejects.jsonl] [--notify-url http://localhost:8000]
+
+Accepts CSV, a JSON array or JSON lines of BusinessDetails fields (plus
+optional user_id / organization_id columns). Companies that already exist
+in ib_businesses, or earlier in the file, are rejected as duplicates by
+normalized company name; the rest are inserted in multi-row batches.
+--dry-run validates and dedupes without writing.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import re
+import sys
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter, model_validator
+from rapidfuzz import fuzz, process
+from context import BusinessDetails
+from semantic_mappings import get_canonical_value
+from bulk_ingest import MalformedInput, Rejected, format_report, notify_server, read_records, run_pipeline, IngestReport
+
+logger = logging.getLogger(__name__)
+
+# Near-identical names within the same prefix block count as the same company
+DUPLICATE_NAME_THRESHOLD = 95.0
+NAME_BLOCK_CHARS = 3
+LEGAL_SUFFIXES = frozenset({"ltd", "limited", "llc", "inc", "incorporated", "corp", "corporation", "co", "company",
+                            "plc", "gmbh", "sa", "ag", "bv", "pvt", "pte", "fze", "fzco", "fz", "wll", "est"})
+NORMALIZED_FIELDS = ("industrySector", "subSector", "location")
+NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+DIGITS_RE = re.compile(r"\d+")
+
+class BusinessRecord(BusinessDetails):
+    user_id: Optional[str] = None
+    organization_id: Optional[str] = None
+
+    class Config:
+        extra = "ignore"  # Exhibitor lists carry columns the profile does not have
+        str_strip_whitespace = True
+        coerce_numbers_to_str = True
+
+    @model_validator(mode="before")
+    @classmethod
+    def blank_cells(cls, data: Any) -> Any:
+        if not isinstance(data, dict):
+            return data
+        return {str(key).strip(): (None if value == "" else value) for key, value in data.items() if key is not None}
+
+BUSINESS_ADAPTER = TypeAdapter(List[BusinessRecord])
+
+@lru_cache(maxsize=65536)
+def company_key(name: str) -> str:
+    """Company name without case, punctuation or legal suffixes: "Acme Aero, Ltd." -> "acme aero"."""
+    words = NON_WORD_RE.sub(" ", name.lower()).split()
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+@lru_cache(maxsize=4096)
+def _canonical(field: str, value: str) -> str:
+    return get_canonical_value(field, value) or value
+
+class CompanyIndex:
+    """Normalized company names seen so far, blocked by prefix, length and digits for the fuzzy comparison.
+
+    fuzz.ratio >= t needs the shorter name to be at least t / (200 - t) of the
+    longer one, so only blocks in that length window are compared. Names that
+    differ in their digits ("Hangar 7" / "Hangar 9") are never merged.
+    """
+
+    def __init__(self, threshold: float = DUPLICATE_NAME_THRESHOLD):
+        self.threshold = threshold
+        self.ids: Dict[str, Any] = {}
+        self.blocks: Dict[Tuple[str, int, str], List[str]] = defaultdict(list)
+        self.min_length_ratio = threshold / (200 - threshold)
+
+    def add(self, name: str, business_id: Any = None) -> None:
+        key = company_key(name)
+        if key and key not in self.ids:
+            self.ids[key] = business_id
+            self.blocks[self._block(key, len(key))].append(key)
+
+    @staticmethod
+    def _block(key: str, length: int) -> Tuple[str, int, str]:
+        return key[:NAME_BLOCK_CHARS], length, " ".join(DIGITS_RE.findall(key))
+
+    def find(self, name: str) -> Optional[Tuple[str, Any]]:
+        """(matching key, business id) of an existing company with this name, if any."""
+        key = company_key(name)
+        if key in self.ids:
+            return key, self.ids[key]
+        best = None
+        for length in range(math.ceil(len(key) * self.min_length_ratio), math.floor(len(key) / self.min_length_ratio) + 1):
+            block = self.blocks.get(self._block(key, length))
+            if block:
+                match = process.extractOne(key, block, scorer=fuzz.ratio, score_cutoff=self.threshold)
+                if match and (best is None or match[1] > best[1]):
+                    best = match
+        return (best[0], self.ids[best[0]]) if best else None
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], threshold: float = DUPLICATE_NAME_THRESHOLD) -> "CompanyIndex":
+        index = cls(threshold)
+        for row in rows:
+            name = (row.get("details") or {}).get("companyName")
+            if name and row.get("is_active") is not False:
+                index.add(name, row.get("id"))
+        return index
+
+def make_transform(index: CompanyIndex, user_id: Optional[str], organization_id: Optional[str]):
+    """Reject duplicates and turn a record into an ib_businesses row."""
+    def to_row(record: BusinessRecord) -> Dict[str, Any]:
+        match = index.find(record.companyName)
+        if match is not None:
+            existing = f"business #{match[1]}" if match[1] is not None else "an earlier record"
+            raise Rejected(f"duplicate of {existing} ({match[0]!r})")
+        index.add(record.companyName)
+        details = record.model_dump(exclude_none=True, exclude={"user_id", "organization_id"})
+        for field in NORMALIZED_FIELDS:
+            if details.get(field):
+                details[field] = _canonical(field, details[field])
+        return {
+            "user_id": record.user_id or user_id,
+            "organization_id": record.organization_id or organization_id,
+            "details": details,
+            "is_active": True,
+        }
+    return to_row
+
+async def insert_businesses(rows: List[Dict[str, Any]]) -> int:
+    # Imported here so the module loads without database credentials
+    from database import db_client
+    from tool_executor import run_blocking
+    from business_store import BUSINESS_STORE
+    from read_replica import note_write
+
+    def _insert() -> List[Dict[str, Any]]:
+        return db_client.table("ib_businesses").insert(rows).execute().data or []
+    inserted = await run_blocking(_insert)
+    note_write("ib_businesses")
+    if inserted:
+        BUSINESS_STORE.apply_changes(inserted)
+    return len(inserted)
+
+async def load_company_index(threshold: float = DUPLICATE_NAME_THRESHOLD) -> CompanyIndex:
+    from business_store import BUSINESS_STORE
+
+    await BUSINESS_STORE.ensure_fresh()
+    index = CompanyIndex.from_rows(list(BUSINESS_STORE.rows.values()), threshold)
+    logger.info("Deduplicating against %d existing companies", len(index.ids))
+    return index
+
+async def ingest_businesses(
+    path: str,
+    user_id: Optional[str] = None,
+    organization_id: Optional[str] = None,
+    batch_size: int = 500,
+    concurrency: int = 4,
+    dry_run: bool = False,
+    rejects_path: Optional[str] = None,
+    fmt: Optional[str] = None,
+    threshold: float = DUPLICATE_NAME_THRESHOLD,
+) -> IngestReport:
+    """Stream a business list into ib_businesses (or only validate and dedupe it, with dry_run)."""
+    index = await load_company_index(threshold)
+    rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    try:
+        return await run_pipeline(
+            read_records(path, fmt),
+            BUSINESS_ADAPTER,
+            None if dry_run else insert_businesses,
+            transform=make_transform(index, user_id, organization_id),
+            batch_size=batch_size,
+            concurrency=concurrency,
+            rejects=rejects,
+        )
+    finally:
+        if rejects:
+            rejects.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream a business list into ib_businesses.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "json"), help="Defaults to the file extension")
+    parser.add_argument("--user-id", help="Owner for records without a user_id column")
+    parser.add_argument("--organization-id", help="Organization for records without an organization_id column")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duplicate-threshold", type=float, default=DUPLICATE_NAME_THRESHOLD,
+                        help="rapidfuzz ratio at which two normalized names are the same company")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and dedupe only")
+    parser.add_argument("--rejects", help="Write rejected records as JSON lines to this file")
+    parser.add_argument("--notify-url", help="Backend base URL whose business caches to invalidate afterwards")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        report = asyncio.run(ingest_businesses(
+            args.path, args.user_id, args.organization_id, args.batch_size, args.concurrency,
+            args.dry_run, args.rejects, args.format, args.duplicate_threshold,
+        ))
+    except MalformedInput as e:
+        print(f"Import stopped: {e}", file=sys.stderr)
+        return 2
+    print(format_report(report, args.dry_run))
+    if args.notify_url and not args.dry_run and report.written:
+        print(f"Server caches invalidated: {notify_server(args.notify_url, '/admin/businesses/invalidate')}")
+    return 1 if report.failed_batches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
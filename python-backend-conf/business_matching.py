@@ -0,0 +1,221 @@
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, NamedTuple, Tuple
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 1 << int(os.getenv("BUSINESS_FEATURE_BITS", "18"))  # Hashed feature space
+# Appended rows are scored in a side matrix until there are this many, then everything is rebuilt
+DELTA_COMPACT_ROWS = int(os.getenv("BUSINESS_DELTA_COMPACT_ROWS", "2000"))
+
+# Profile fields and their weights; categorical fields also match on the whole value
+FIELD_WEIGHTS = {
+    "industrySector": 2.0,
+    "subSector": 1.5,
+    "location": 1.0,
+    "companyName": 0.5,
+    "briefDescription": 1.0,
+    "productsOrServices": 1.0,
+}
+CATEGORICAL_FIELDS = ("industrySector", "subSector", "location")
+FIELD_LABELS = {"industrySector": "industry", "subSector": "sub-sector", "location": "location"}
+WORD_RE = re.compile(r"[a-z0-9]{3,}")
+STOPWORDS = frozenset({"and", "the", "for", "with", "our", "from", "services", "solutions", "company", "ltd", "llc", "inc"})
+
+def profile_terms(details: Dict[str, Any]) -> Dict[str, float]:
+    """Readable weighted terms for a business profile: "industrySector=aviation", "w:drones", ..."""
+    terms: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = str(details.get(field) or "").strip().lower()
+        if not value:
+            continue
+        if field in CATEGORICAL_FIELDS:
+            key = f"{field}={value}"
+            terms[key] = terms.get(key, 0.0) + weight
+        for word in WORD_RE.findall(value):
+            if word not in STOPWORDS:
+                key = f"w:{word}"
+                terms[key] = terms.get(key, 0.0) + weight
+    return terms
+
+def feature_index(term: str) -> int:
+    return zlib.crc32(term.encode()) & (N_FEATURES - 1)
+
+def hashed_row(terms: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted feature indices and summed weights (hash collisions add up)."""
+    indices = np.fromiter((feature_index(term) for term in terms), dtype=np.int64, count=len(terms))
+    weights = np.fromiter(terms.values(), dtype=np.float64, count=len(terms))
+    unique, inverse = np.unique(indices, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights)
+
+def describe_term(term: str) -> str:
+    if term.startswith("w:"):
+        return term[2:]
+    field, value = term.split("=", 1)
+    return f"same {FIELD_LABELS.get(field, field)} ({value})"
+
+class Recommendation(NamedTuple):
+    score: float
+    business: Dict[str, Any]
+    reasons: List[str]
+
+def _reasons(contributions: np.ndarray, q_indices: np.ndarray, query_terms: Dict[int, str], limit: int = 3) -> List[str]:
+    """Matched categories, then the strongest shared words not already covered by one."""
+    reasons: List[str] = []
+    covered: set = set()
+    shared = [i for i in np.argsort(-contributions) if contributions[i] > 0]
+    for i in sorted(shared, key=lambda i: query_terms[q_indices[i]].startswith("w:")):
+        if len(reasons) >= limit:
+            break
+        term = query_terms[q_indices[i]]
+        word = term[2:] if term.startswith("w:") else None
+        if word in covered:
+            continue
+        if word is None:
+            covered.update(WORD_RE.findall(term.split("=", 1)[1]))
+        reasons.append(describe_term(term))
+    return reasons
+
+class BusinessMatcher:
+    """TF-IDF matrix over hashed ib_businesses profile terms, scored in one sparse product.
+
+    The snapshot matrix is CSC so a query only touches the columns of its own
+    terms. Businesses added or changed after a build go to a small CSR delta
+    matrix (weighted with the snapshot idf) and superseded rows are masked out;
+    the delta is folded in by a full rebuild once it reaches DELTA_COMPACT_ROWS.
+    Store notifications only queue work; it is applied on the next query,
+    which callers run off the event loop.
+    """
+
+    def __init__(self):
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.ids: List[Any] = []
+        self.user_ids: List[Any] = []
+        self.positions: Dict[Any, int] = {}
+        self.active = np.zeros(0, dtype=bool)
+        self.idf = np.ones(N_FEATURES)
+        self.matrix = sparse.csc_matrix((0, N_FEATURES))
+        self.delta_ids: List[Any] = []
+        self.delta = sparse.csr_matrix((0, N_FEATURES))
+        self._pending: List[Tuple[List[Dict[str, Any]], List[Any]]] = []
+        self._needs_rebuild = True
+        self._lock = threading.Lock()
+
+    # -- maintenance ---------------------------------------------------------
+
+    def apply_changes(self, upserts: List[Dict[str, Any]], deletes: List[Any]) -> None:
+        """BUSINESS_STORE listener: queue the change for the next query."""
+        with self._lock:
+            self._pending.append((upserts, deletes))
+
+    def _sync(self) -> None:
+        pending, self._pending = self._pending, []
+        changed: List[Any] = []
+        for upserts, deletes in pending:
+            for business_id in deletes:
+                self.rows.pop(business_id, None)
+                changed.append(business_id)
+            for row in upserts:
+                if row.get("is_active") is False:
+                    self.rows.pop(row["id"], None)
+                else:
+                    self.rows[row["id"]] = row
+                changed.append(row["id"])
+        if self._needs_rebuild or len(self.delta_ids) + len(changed) > DELTA_COMPACT_ROWS:
+            self._rebuild()
+        elif changed:
+            self._extend_delta(changed)
+
+    def _weighted_rows(self, rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        indptr, indices, data = [0], [], []
+        for row in rows:
+            row_indices, row_weights = hashed_row(profile_terms(row.get("details") or {}))
+            indices.append(row_indices)
+            data.append(row_weights)
+            indptr.append(indptr[-1] + len(row_indices))
+        concat = lambda parts, dtype: np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+        return np.asarray(indptr, dtype=np.int64), concat(indices, np.int64), concat(data, np.float64)
+
+    def _normalized(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray) -> sparse.csr_matrix:
+        matrix = sparse.csr_matrix(((1 + np.log(data)) * self.idf[indices], indices, indptr),
+                                   shape=(len(indptr) - 1, N_FEATURES))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+    def _rebuild(self) -> None:
+        rows = list(self.rows.values())
+        indptr, indices, data = self._weighted_rows(rows)
+        df = np.bincount(indices, minlength=N_FEATURES)
+        self.idf = np.log((1 + len(rows)) / (1 + df)) + 1
+        self.matrix = self._normalized(indptr, indices, data).tocsc()
+        self.ids = [row["id"] for row in rows]
+        self.user_ids = [row.get("user_id") for row in rows]
+        self.positions = {business_id: i for i, business_id in enumerate(self.ids)}
+        self.active = np.ones(len(rows), dtype=bool)
+        self.delta_ids = []
+        self.delta = sparse.csr_matrix((0, N_FEATURES))
+        self._needs_rebuild = False
+        logger.info("Business matcher rebuilt: %d businesses, %d features", len(rows), self.matrix.nnz)
+
+    def _extend_delta(self, changed: List[Any]) -> None:
+        changed_set = set(changed)
+        for business_id in changed_set:
+            position = self.positions.get(business_id)
+            if position is not None:
+                self.active[position] = False
+        self.delta_ids = [business_id for business_id in self.delta_ids if business_id not in changed_set]
+        self.delta_ids += [business_id for business_id in dict.fromkeys(changed) if business_id in self.rows]
+        self.delta = self._normalized(*self._weighted_rows([self.rows[i] for i in self.delta_ids]))
+
+    # -- querying ------------------------------------------------------------
+
+    def recommend(self, details: Dict[str, Any], limit: int = 5, exclude_user_id: Any = None,
+                  exclude_ids: Tuple[Any, ...] = ()) -> List[Recommendation]:
+        """Businesses most similar to a profile, with the shared terms that matched."""
+        with self._lock:
+            self._sync()
+            terms = profile_terms(details)
+            if not terms or not self.rows:
+                return []
+            query_terms = {feature_index(term): term for term in terms}
+            q_indices, q_weights = hashed_row(terms)
+            q_values = (1 + np.log(q_weights)) * self.idf[q_indices]
+            q_values /= np.linalg.norm(q_values) or 1.0
+
+            base_columns = self.matrix[:, q_indices]
+            scores = base_columns @ q_values
+            scores[~self.active] = 0.0
+            delta_columns = self.delta[:, q_indices]
+            delta_scores = delta_columns @ q_values
+            ids = self.ids + self.delta_ids
+            user_ids = self.user_ids + [self.rows[i].get("user_id") for i in self.delta_ids]
+            all_scores = np.concatenate([scores, delta_scores])
+
+            excluded = set(exclude_ids)
+            candidates = min(len(all_scores), limit + len(excluded) + 16)
+            top = np.argpartition(-all_scores, candidates - 1)[:candidates] if candidates < len(all_scores) else np.arange(len(all_scores))
+            top = top[np.argsort(-all_scores[top])]
+
+            results: List[Recommendation] = []
+            for position in top:
+                score = float(all_scores[position])
+                if score <= 0 or len(results) >= limit:
+                    break
+                business_id = ids[position]
+                if business_id in excluded or (exclude_user_id is not None and user_ids[position] == exclude_user_id):
+                    continue
+                if position < len(self.ids):
+                    row_values = base_columns.getrow(position).toarray().ravel()
+                else:
+                    row_values = delta_columns.getrow(position - len(self.ids)).toarray().ravel()
+                contributions = row_values * q_values
+                results.append(Recommendation(score, self.rows[business_id], _reasons(contributions, q_indices, query_terms)))
+            return results
+
+BUSINESS_MATCHER = BusinessMatcher()
@@ -0,0 +1,30 @@
+import os
+from snapshot_store import SnapshotStore, read_all_rows
+from change_feed import change_feed
+from memory_monitor import register_cache
+from tool_memo import invalidate_everywhere
+from read_replica import note_write
+
+BUSINESS_REFRESH_SECONDS = float(os.getenv("BUSINESS_REFRESH_SECONDS", "600"))
+BUSINESS_COLUMNS = "id, user_id, details, is_active"
+# Tools whose memoized results are derived from ib_businesses
+BUSINESS_TOOLS = ("search_businesses", "get_user_businesses")
+
+# Feeds the recommendation matrix
+BUSINESS_STORE = SnapshotStore(
+    "Businesses",
+    lambda: read_all_rows("ib_businesses", BUSINESS_COLUMNS),
+    BUSINESS_REFRESH_SECONDS,
+    feed=change_feed("ib_businesses", BUSINESS_COLUMNS),
+)
+register_cache("business_store", lambda: BUSINESS_STORE.rows)
+
+def invalidate_business_caches() -> dict:
+    """Forget everything derived from ib_businesses after a bulk import.
+
+    The snapshot reloads on the next recommendation and its diff updates the
+    recommendation matrix incrementally.
+    """
+    BUSINESS_STORE.invalidate()
+    note_write("ib_businesses")
+    return {"memo_entries": invalidate_everywhere(*BUSINESS_TOOLS), "snapshot_version": BUSINESS_STORE.version}
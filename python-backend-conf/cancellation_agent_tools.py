@@ -3,6 +3,8 @@ import logging
 from context import AirlineAgentContext
 from database import db_client
 from agents import function_tool
+from tool_memo import invalidates_memo, idempotent_tool
+from booking_lookup import invalidate_booking
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,8 @@ logger = logging.getLogger(__name__)
     name_override="cancel_flight",
     description_override="Cancel a flight booking and update the booking status."
 )
+@invalidates_memo("get_booking_details", "display_seat_map", match_args=("confirmation_number",))
+@idempotent_tool(scope_args=("confirmation_number",))
 async def cancel_flight(confirmation_number: str, context: AirlineAgentContext) -> str:
     """Cancel a flight booking and update the booking status."""
     try:
@@ -19,7 +23,7 @@ async def cancel_flight(confirmation_number: str, context: AirlineAgentContext)
             single=True
         )
         if not booking:
-            logger.warning(f"❌ No booking found for confirmation number: {confirmation_number}")
+            logger.warning("❌ No booking found for confirmation number: %s", confirmation_number)
             return f"No booking found for confirmation number {confirmation_number}"
         
         updated = await db_client.query(
@@ -28,11 +32,12 @@ async def cancel_flight(confirmation_number: str, context: AirlineAgentContext)
             filters={"confirmation_number": confirmation_number, "booking_status": "Cancelled"}
         )
         if updated:
-            logger.info(f"✅ Successfully cancelled booking {confirmation_number}")
+            invalidate_booking(confirmation_number)
+            logger.info("✅ Successfully cancelled booking %s", confirmation_number)
             return f"Booking {confirmation_number} has been cancelled."
         else:
-            logger.warning(f"❌ Failed to cancel booking {confirmation_number}")
+            logger.warning("❌ Failed to cancel booking %s", confirmation_number)
             return f"Failed to cancel booking {confirmation_number}"
     except Exception as e:
-        logger.error(f"❌ Error cancelling booking: {e}", exc_info=True)
+        logger.error("❌ Error cancelling booking: %s", e, exc_info=True)
         return f"Error cancelling booking: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""Delta sync of a table by updated_at watermark, for caches that would otherwise reload it whole.
+
+A ChangeFeed polls its source for rows changed since the last watermark,
+paging with an (updated_at, id) keyset, and passes inserts, updates and
+deletes to its listeners, the same (upserts, deleted_ids) callbacks
+SnapshotStore listeners take. collect() only reads, so it can run on a
+worker thread while push() (and the listeners) run on the event loop. Each poll re-reads a short overlap so rows
+from transactions that committed late are not missed; rows already seen at
+the same updated_at are skipped. Hard deletes carry no updated_at, so the
+id list is reconciled every CHANGE_FEED_RECONCILE_SECONDS. A change stream
+(e.g. Supabase realtime) can feed the same listeners through push().
+
+Sources: PostgrestSource for Supabase tables (they need the updated_at
+column from sql/read_replica.sql) and SQLiteSource for a local table,
+which the change_feed benchmark uses to simulate churn.
+"""
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tables whose snapshot stores sync by change feed instead of reloading
+CHANGE_FEED_TABLES = {t.strip() for t in os.getenv("CHANGE_FEED_TABLES", "").split(",") if t.strip()}
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "15"))
+RECONCILE_SECONDS = float(os.getenv("CHANGE_FEED_RECONCILE_SECONDS", "300"))
+WATERMARK_OVERLAP_SECONDS = float(os.getenv("CHANGE_FEED_WATERMARK_OVERLAP_SECONDS", "5"))
+PAGE_SIZE = 1000  # PostgREST caps responses at 1000 rows by default
+
+ChangeListener = Callable[[List[Dict[str, Any]], List[Any]], None]
+Keyset = Tuple[Any, Any]
+
+_changes = metrics.counter("change_feed_rows_total", "Rows passed on by change feeds", ("feed", "change"))
+_polls = metrics.counter("change_feed_polls_total", "Change feed polls", ("feed",))
+
+def overlap(watermark: Optional[str], seconds: float = WATERMARK_OVERLAP_SECONDS) -> Optional[str]:
+    """The watermark moved back by seconds, in the same ISO format."""
+    if not watermark:
+        return None
+    try:
+        return (datetime.fromisoformat(watermark) - timedelta(seconds=seconds)).isoformat()
+    except ValueError:
+        return watermark
+
+def fetch_changes(table: str, since: Optional[str], after: Optional[Keyset], limit: int = PAGE_SIZE,
+                  columns: str = "*") -> List[Dict[str, Any]]:
+    """Rows updated at or after since, in (updated_at, id) order, following the (updated_at, id) keyset after."""
+    from database import db_client
+    from schedule_queries import _quote
+
+    query = db_client.table(table).select(columns)
+    if since:
+        query = query.gte("updated_at", since)
+    if after:
+        stamp, row_id = _quote(after[0]), _quote(after[1])
+        query = query.or_(f"updated_at.gt.{stamp},and(updated_at.eq.{stamp},id.gt.{row_id})")
+    return query.order("updated_at").order("id").limit(limit).execute().data or []
+
+class PostgrestSource:
+    def __init__(self, table: str, columns: str = "*"):
+        self.table = table
+        # The keyset needs both columns whatever the cache keeps; listeners do not see the ones added for it
+        self.keyset_only: Tuple[str, ...] = ()
+        if columns.strip() != "*":
+            names = [c.strip() for c in columns.split(",")]
+            added = [c for c in ("id", "updated_at") if c not in names]
+            columns = ", ".join(names + added)
+            self.keyset_only = tuple(c for c in added if c != "id")
+        self.columns = columns
+
+    def changes(self, since: Optional[str], after: Optional[Keyset], limit: int) -> List[Dict[str, Any]]:
+        return fetch_changes(self.table, since, after, limit, self.columns)
+
+    def ids(self) -> List[Any]:
+        from snapshot_store import fetch_all_rows
+
+        return [row["id"] for row in fetch_all_rows(self.table, "id")]
+
+class SQLiteSource:
+    """A local SQLite table with id and updated_at columns (ISO text); rows come back as dicts."""
+
+    keyset_only: Tuple[str, ...] = ()
+
+    def __init__(self, conn: sqlite3.Connection, table: str):
+        self.conn = conn
+        self.table = table
+
+    def changes(self, since: Optional[str], after: Optional[Keyset], limit: int) -> List[Dict[str, Any]]:
+        sql, params = f'select * from "{self.table}" where 1 = 1', []
+        if since:
+            sql += " and updated_at >= ?"
+            params.append(since)
+        if after:
+            sql += " and (updated_at, id) > (?, ?)"
+            params.extend(after)
+        cursor = self.conn.execute(sql + " order by updated_at, id limit ?", params + [limit])
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def ids(self) -> List[Any]:
+        return [row_id for (row_id,) in self.conn.execute(f'select id from "{self.table}"')]
+
+class ChangeFeed:
+    """Watermark, seen rows and listeners for one table.
+
+    version increases with every poll or push that changed something, so
+    downstream caches can key on it.
+    """
+
+    def __init__(self, name: str, source: Any, poll_seconds: float = CHANGE_FEED_POLL_SECONDS,
+                 reconcile_seconds: float = RECONCILE_SECONDS, page_size: int = PAGE_SIZE):
+        self.name = name
+        self.source = source
+        self.poll_seconds = poll_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.page_size = page_size
+        self.watermark: Optional[str] = None
+        self.seen: Dict[Any, Any] = {}  # id -> updated_at of the version passed on
+        self.version = 0
+        self.reconciled_at: Optional[float] = None
+        self.keyset_only = tuple(getattr(source, "keyset_only", ()))
+        self._listeners: List[ChangeListener] = []
+
+    def subscribe(self, listener: ChangeListener) -> None:
+        self._listeners.append(listener)
+
+    def reconcile_soon(self) -> None:
+        """Check for deleted rows on the next poll, e.g. after a bulk change."""
+        self.reconciled_at = None
+
+    def poll(self) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """Fetch and pass on everything changed since the last poll; returns (upserts, deleted ids)."""
+        upserts, deletes = self.collect()
+        self.push(upserts, deletes)
+        return upserts, deletes
+
+    def collect(self) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """Read everything changed since the last poll without passing it on; hand the result to push()."""
+        _polls.inc(feed=self.name)
+        since = overlap(self.watermark)
+        upserts: List[Dict[str, Any]] = []
+        after: Optional[Keyset] = None
+        while True:
+            rows = self.source.changes(since, after, self.page_size)
+            for row in rows:
+                stamp = row.get("updated_at")
+                if self.seen.get(row["id"], object()) != stamp:
+                    upserts.append(row)
+                if stamp is not None and (self.watermark is None or str(stamp) > self.watermark):
+                    self.watermark = str(stamp)
+            if len(rows) < self.page_size:
+                break
+            after = (rows[-1].get("updated_at"), rows[-1]["id"])
+        deletes: List[Any] = []
+        now = time.monotonic()
+        if self.seen and (self.reconciled_at is None or now - self.reconciled_at > self.reconcile_seconds):
+            present = set(self.source.ids())
+            deletes = [row_id for row_id in list(self.seen) if row_id not in present]
+            self.reconciled_at = now
+        elif not self.seen:
+            self.reconciled_at = now  # A first poll reads everything
+        return upserts, deletes
+
+    def push(self, upserts: List[Dict[str, Any]], deletes: Iterable[Any] = ()) -> bool:
+        """Apply changes from a poll or a change stream and notify listeners. Returns True if anything changed."""
+        deletes = [row_id for row_id in deletes if row_id in self.seen]
+        if not upserts and not deletes:
+            return False
+        for row_id in deletes:
+            del self.seen[row_id]
+        for row in upserts:
+            self.seen[row["id"]] = row.get("updated_at")
+        if self.keyset_only:
+            upserts = [{k: v for k, v in row.items() if k not in self.keyset_only} for row in upserts]
+        self.version += 1
+        _changes.inc(len(upserts), feed=self.name, change="upsert")
+        _changes.inc(len(deletes), feed=self.name, change="delete")
+        for listener in self._listeners:
+            try:
+                listener(upserts, deletes)
+            except Exception as e:
+                logger.error("%s listener %s failed: %s", self.name, listener, e, exc_info=True)
+        return True
+
+def change_feed(table: str, columns: str = "*") -> Optional[ChangeFeed]:
+    """A feed for table when it is listed in CHANGE_FEED_TABLES, else None (reload whole snapshots)."""
+    if table not in CHANGE_FEED_TABLES:
+        return None
+    return ChangeFeed(table, PostgrestSource(table, columns))
@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+import metrics
+from memory_monitor import register_cache
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_FLUSH_INTERVAL = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL_SECONDS", "0.05"))
+CHECKPOINT_BATCH_SIZE = int(os.getenv("CHECKPOINT_BATCH_SIZE", "500"))
+HISTORY_MAX_ITEMS = int(os.getenv("CHECKPOINT_HISTORY_MAX_ITEMS", "20"))
+HISTORY_MAX_TOOL_OUTPUT_CHARS = int(os.getenv("CHECKPOINT_HISTORY_MAX_TOOL_OUTPUT_CHARS", "1000"))
+
+checkpoint_writes = metrics.counter("checkpoint_writes_total", "Checkpoints written to SQLite")
+checkpoint_conflicts = metrics.counter("checkpoint_conflicts_total", "Checkpoint writes rejected by a newer version")
+
+SCHEMA = """
+create table if not exists checkpoints (
+    conversation_id text primary key,
+    version integer not null,
+    context text not null,
+    history text not null,
+    updated_at real not null
+);
+create index if not exists checkpoints_updated_at_idx on checkpoints (updated_at);
+"""
+
+# Insert, or update only if the stored row is older than the incoming version
+UPSERT = """
+insert into checkpoints (conversation_id, version, context, history, updated_at)
+values (?, ?, ?, ?, ?)
+on conflict (conversation_id) do update set
+    version = excluded.version,
+    context = excluded.context,
+    history = excluded.history,
+    updated_at = excluded.updated_at
+where checkpoints.version < excluded.version
+"""
+
+class ConversationCheckpoint(BaseModel):
+    conversation_id: str
+    version: int
+    context: str  # Serialized AirlineAgentContext (model_dump_json)
+    history: List[Dict[str, Any]] = []
+    updated_at: float
+
+class CheckpointConflict(Exception):
+    """Raised when a save is based on a version that is no longer current."""
+
+def _is_user_message(item: Any) -> bool:
+    return isinstance(item, dict) and item.get("role") == "user" and item.get("type", "message") == "message"
+
+def compact_history(items: List[Dict[str, Any]], max_items: int = HISTORY_MAX_ITEMS) -> List[Dict[str, Any]]:
+    """Keep the most recent whole turns (about max_items items) and truncate bulky tool outputs.
+
+    The kept history starts at a user message, so no function_call_output is
+    separated from its function_call. A last turn longer than max_items is
+    kept whole.
+    """
+    starts = [i for i, item in enumerate(items) if _is_user_message(item)]
+    start = next((i for i in starts if i >= len(items) - max_items), starts[-1] if starts else len(items))
+    compacted = []
+    for item in items[start:]:
+        output = item.get("output") if isinstance(item, dict) else None
+        if isinstance(output, str) and len(output) > HISTORY_MAX_TOOL_OUTPUT_CHARS:
+            item = {**item, "output": output[:HISTORY_MAX_TOOL_OUTPUT_CHARS] + " …[truncated]"}
+        compacted.append(item)
+    return compacted
+
+class CheckpointStore:
+    """Conversation checkpoints in a local SQLite file (WAL) shared by all workers on a box.
+
+    save() checks the version and buffers the row under one lock, so within a
+    process a save based on a stale version raises CheckpointConflict. A writer
+    thread flushes buffered rows in batched transactions, so requests never wait
+    on fsync. Across workers the check is not atomic: until a buffered write is
+    flushed (flush_interval) another worker still sees the previous version, so
+    two workers serving one conversation at once can both save the same
+    version. The conditional upsert keeps whichever is flushed first. The
+    loser's worker remembers the dropped checkpoint: its load() returns the
+    winner's row from then on, and a save based on the dropped one raises
+    CheckpointConflict instead of building on a turn that was never stored.
+    Both methods block; call them through run_blocking on the request path.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, ttl: float = CHECKPOINT_TTL_SECONDS,
+                 flush_interval: float = CHECKPOINT_FLUSH_INTERVAL, batch_size: int = CHECKPOINT_BATCH_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[str, ConversationCheckpoint] = {}
+        self._inflight: Dict[str, ConversationCheckpoint] = {}  # Being written by the flush in progress
+        # (version, updated_at) of checkpoints this process saved that lost to another worker's write
+        self._lost: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._last_sweep = time.time()
+        self._writer = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("pragma journal_mode=wal")
+        conn.execute("pragma synchronous=normal")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -- request path --------------------------------------------------------
+
+    def load(self, conversation_id: str) -> Optional[ConversationCheckpoint]:
+        """Latest checkpoint, preferring this process's unflushed write."""
+        with self._lock:
+            pending = self._pending.get(conversation_id) or self._inflight.get(conversation_id)
+        if pending is not None:
+            return pending
+        row = self._reader().execute(
+            "select version, context, history, updated_at from checkpoints where conversation_id = ?",
+            (conversation_id,),
+        ).fetchone()
+        if row is None or row[3] < time.time() - self.ttl:
+            return None
+        return ConversationCheckpoint(
+            conversation_id=conversation_id, version=row[0], context=row[1],
+            history=json.loads(row[2]), updated_at=row[3],
+        )
+
+    def _stored_version(self, conversation_id: str) -> int:
+        row = self._reader().execute(
+            "select version, updated_at from checkpoints where conversation_id = ?", (conversation_id,),
+        ).fetchone()
+        return row[0] if row is not None and row[1] >= time.time() - self.ttl else 0
+
+    def save(self, conversation_id: str, context: BaseModel, history: List[Dict[str, Any]],
+             expected_version: int, expected_updated_at: Optional[float] = None) -> ConversationCheckpoint:
+        """Buffer a new version; expected_version is the version the caller loaded (0 if none).
+
+        Pass the loaded checkpoint's updated_at as expected_updated_at so a save
+        based on a checkpoint that lost to another worker's write is rejected.
+        """
+        checkpoint = ConversationCheckpoint(
+            conversation_id=conversation_id,
+            version=expected_version + 1,
+            context=context.model_dump_json(),
+            history=compact_history(history),
+            updated_at=time.time(),
+        )
+        with self._lock:
+            pending = self._pending.get(conversation_id) or self._inflight.get(conversation_id)
+            current_version = pending.version if pending is not None else self._stored_version(conversation_id)
+            lost = self._lost.get(conversation_id)
+            if current_version != expected_version or lost == (expected_version, expected_updated_at):
+                checkpoint_conflicts.inc()
+                raise CheckpointConflict(
+                    f"Checkpoint for {conversation_id} is at version {current_version}, not {expected_version}"
+                    if current_version != expected_version else
+                    f"Checkpoint version {expected_version} of {conversation_id} lost to another worker's write"
+                )
+            self._pending[conversation_id] = checkpoint
+            self._lost.pop(conversation_id, None)
+            backlog = len(self._pending)
+        if backlog >= self.batch_size:
+            self._wake.set()
+        return checkpoint
+
+    # -- writer thread -------------------------------------------------------
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush(conn)
+            if time.time() - self._last_sweep > min(self.ttl, 3600):
+                self._sweep(conn)
+        self._flush(conn)
+        conn.close()
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+        rows = [
+            (c.conversation_id, c.version, c.context, json.dumps(c.history, default=str), c.updated_at)
+            for c in batch.values()
+        ]
+        try:
+            conn.execute("begin immediate")
+            before = conn.total_changes
+            conn.executemany(UPSERT, rows)
+            conn.execute("commit")
+            written = conn.total_changes - before
+            checkpoint_writes.inc(written)
+            if written < len(rows):
+                self._record_lost(conn, batch)
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("rollback")
+            logger.error("Checkpoint flush failed: %s", e, exc_info=True)
+            with self._lock:
+                for conversation_id, checkpoint in batch.items():
+                    self._pending.setdefault(conversation_id, checkpoint)
+        finally:
+            with self._lock:
+                self._inflight = {}
+
+    def _record_lost(self, conn: sqlite3.Connection, batch: Dict[str, ConversationCheckpoint]) -> None:
+        """Remember which rows of a flushed batch the upsert dropped for an equal or newer version."""
+        stored = {}
+        ids = list(batch)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            stored.update((row[0], (row[1], row[2])) for row in conn.execute(
+                f"select conversation_id, version, updated_at from checkpoints "
+                f"where conversation_id in ({', '.join('?' * len(chunk))})", chunk,
+            ))
+        lost = [c for c in batch.values() if stored.get(c.conversation_id) != (c.version, c.updated_at)]
+        with self._lock:
+            for checkpoint in lost:
+                self._lost[checkpoint.conversation_id] = (checkpoint.version, checkpoint.updated_at)
+        checkpoint_conflicts.inc(len(lost))
+        logger.warning("%d checkpoint writes lost to other workers' writes", len(lost))
+
+    def _sweep(self, conn: sqlite3.Connection) -> None:
+        self._last_sweep = time.time()
+        with self._lock:
+            # Requests that loaded a lost checkpoint before its flush have long finished by now
+            self._lost = {cid: lost for cid, lost in self._lost.items() if lost[1] > self._last_sweep - 3600}
+        deleted = conn.execute("delete from checkpoints where updated_at < ?", (time.time() - self.ttl,)).rowcount
+        if deleted:
+            logger.info("Swept %d expired checkpoints", deleted)
+
+    def flush(self) -> None:
+        """Ask the writer to flush now (does not wait)."""
+        self._wake.set()
+
+    def close(self) -> None:
+        """Flush outstanding checkpoints and stop the writer."""
+        self._closed.set()
+        self._wake.set()
+        self._writer.join()
+
+_store: Optional[CheckpointStore] = None
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Process-wide checkpoint store, opened on first use."""
+    global _store
+    if _store is None:
+        _store = CheckpointStore()
+        register_cache("checkpoint_pending", lambda: _store._pending)
+        register_cache("checkpoint_lost", lambda: _store._lost)
+    return _store
@@ -1,11 +1,84 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 import logging
 from context import AirlineAgentContext, CustomerBooking
 from database import db_client
 from agents import function_tool
+from tool_memo import memoize_tool
+from resilience import guarded, DB_CALL_TIMEOUT
+from read_replica import replica_get
+from tool_output import is_compact, table
 
 logger = logging.getLogger(__name__)
 
+def build_customer_booking(booking: Dict[str, Any]) -> CustomerBooking:
+    """Build a CustomerBooking from a bookings row joined with customers and flights."""
+    flight = booking.get("flights") or {}
+    customer = booking.get("customers") or {}
+    return CustomerBooking(
+        id=booking.get("id"),
+        confirmation_number=booking.get("confirmation_number"),
+        customer_id=booking.get("customer_id"),
+        flight_id=booking.get("flight_id"),
+        flight_number=flight.get("flight_number"),
+        seat_number=booking.get("seat_number"),
+        booking_status=booking.get("booking_status"),
+        origin=flight.get("origin"),
+        destination=flight.get("destination"),
+        customer_name=customer.get("name"),
+        customer_email=customer.get("email"),
+        account_number=customer.get("account_number")
+    )
+
+def replica_booking(confirmation_number: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """The booking joined locally when bookings, customers and flights are all replicated and fresh."""
+    served, booking = replica_get("bookings", "confirmation_number", confirmation_number)
+    if not served or booking is None:
+        return served, None
+    flight_served, flight = replica_get("flights", "id", booking.get("flight_id"))
+    customer_served, customer = replica_get("customers", "id", booking.get("customer_id"))
+    if not (flight_served and customer_served):
+        return False, None
+    return True, {**booking, "flights": flight, "customers": customer}
+
+async def query_booking(confirmation_number: str) -> Optional[Dict[str, Any]]:
+    served, booking = replica_booking(confirmation_number)
+    if served:
+        return booking
+    return await guarded(
+        "db.bookings",
+        lambda: db_client.query(
+            table_name="bookings",
+            select_fields="*, customers:customer_id(*), flights:flight_id(*)",
+            filters={"confirmation_number": confirmation_number},
+            single=True
+        ),
+        timeout=DB_CALL_TIMEOUT,
+        hedge=True
+    )
+
+@memoize_tool(name="get_booking_details", key_args=("confirmation_number",), per_output_mode=False)
+async def fetch_booking(confirmation_number: str) -> Optional[Dict[str, Any]]:
+    """Fetch a booking joined with its customer and flight."""
+    return await query_booking(confirmation_number)
+
+def format_booking(confirmation_number: str, booking: Dict[str, Any]) -> str:
+    flight = booking.get("flights") or {}
+    customer = booking.get("customers") or {}
+    if is_compact():
+        return table(("confirmation", "passenger", "flight", "seat", "status", "origin", "destination"), [(
+            confirmation_number, customer.get("name"), flight.get("flight_number"), booking.get("seat_number"),
+            booking.get("booking_status"), flight.get("origin"), flight.get("destination"),
+        )])
+    return (
+        f"Booking Details for Confirmation {confirmation_number}:\n"
+        f"Passenger: {customer.get('name')}\n"
+        f"Flight: {flight.get('flight_number')}\n"
+        f"Seat: {booking.get('seat_number')}\n"
+        f"Status: {booking.get('booking_status')}\n"
+        f"Origin: {flight.get('origin')}\n"
+        f"Destination: {flight.get('destination')}"
+    )
+
 @function_tool(
     name_override="get_booking_details",
     description_override="Get booking details by confirmation number and update context."
@@ -13,18 +86,13 @@ logger = logging.getLogger(__name__)
 async def get_booking_details(confirmation_number: str, context: AirlineAgentContext) -> str:
     """Get booking details by confirmation number and update context."""
     try:
-        booking = await db_client.query(
-            table_name="bookings",
-            select_fields="*, customers:customer_id(*), flights:flight_id(*)",
-            filters={"confirmation_number": confirmation_number},
-            single=True
-        )
+        booking = await fetch_booking(confirmation_number)
         
         if not booking:
-            logger.warning(f"❌ No booking found for confirmation number: {confirmation_number}")
+            logger.warning("❌ No booking found for confirmation number: %s", confirmation_number)
             return f"No booking found for confirmation number {confirmation_number}"
         
-        logger.debug(f"✅ Found booking: {booking}")
+        logger.debug("✅ Found booking %s for %s", booking.get("id"), confirmation_number)
         
         # Update context
         context.passenger_name = booking.get("customers", {}).get("name")
@@ -37,32 +105,9 @@ async def get_booking_details(confirmation_number: str, context: AirlineAgentCon
         context.booking_id = booking.get("id")
         
         # Update customer_bookings
-        context.customer_bookings = [
-            CustomerBooking(
-                id=booking.get("id"),
-                confirmation_number=booking.get("confirmation_number"),
-                customer_id=booking.get("customer_id"),
-                flight_id=booking.get("flight_id"),
-                flight_number=booking.get("flights", {}).get("flight_number"),
-                seat_number=booking.get("seat_number"),
-                booking_status=booking.get("booking_status"),
-                origin=booking.get("flights", {}).get("origin"),
-                destination=booking.get("flights", {}).get("destination"),
-                customer_name=booking.get("customers", {}).get("name"),
-                customer_email=booking.get("customers", {}).get("email"),
-                account_number=booking.get("customers", {}).get("account_number")
-            )
-        ]
+        context.customer_bookings = [build_customer_booking(booking)]
         
-        return (
-            f"Booking Details for Confirmation {confirmation_number}:\n"
-            f"Passenger: {context.passenger_name}\n"
-            f"Flight: {context.flight_number}\n"
-            f"Seat: {context.seat_number}\n"
-            f"Status: {booking.get('booking_status')}\n"
-            f"Origin: {booking.get('flights', {}).get('origin')}\n"
-            f"Destination: {booking.get('flights', {}).get('destination')}"
-        )
+        return format_booking(confirmation_number, booking)
     except Exception as e:
-        logger.error(f"❌ Error fetching booking details for {confirmation_number}: {e}", exc_info=True)
+        logger.error("❌ Error fetching booking details for %s: %s", confirmation_number, e, exc_info=True)
         return f"Error fetching booking details: {str(e)}"
\ No newline at end of file
@@ -72,6 +72,7 @@ class AirlineAgentContext(BaseModel):
     
     # Related data
     customer_bookings: List[CustomerBooking] = []
+    agenda_session_ids: List[int] = []  # Bookmarked conference_schedules ids
     user_details: Optional[UserDetails] = None
     business_details: Optional[BusinessDetails] = None
 
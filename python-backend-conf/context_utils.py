@@ -1,33 +1,34 @@
 from context import AirlineAgentContext
-from database import db_client
+from registration_lookup import prefetch_user_context
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fields load_user_context reads from the database; the rest is conversation state
+PROFILE_FIELDS = {
+    "registration_id", "user_id", "organization_id", "passenger_name", "customer_email",
+    "customer_bookings", "user_details", "business_details",
+}
+
 async def create_initial_context() -> AirlineAgentContext:
     """Create an initial empty AirlineAgentContext."""
     return AirlineAgentContext()
 
 async def load_user_context(registration_id: str) -> AirlineAgentContext:
-    """Load user context from database."""
+    """Load user context (user, businesses and bookings) from database."""
     ctx = await create_initial_context()
     ctx.registration_id = registration_id
     
     try:
-        # Try to load user data
-        response = db_client.table("users").select("id, details").filter("details->>registration_id", "eq", registration_id).execute()
-        
-        if response.data:
-            user = response.data[0]
-            ctx.user_id = user["id"]
-            if user.get("details"):
-                details = user["details"]
-                ctx.passenger_name = details.get("user_name") or f"{details.get('firstName', '')} {details.get('lastName', '')}".strip()
-                ctx.customer_email = details.get("email")
-        
-        logger.info(f"Loaded context for registration_id: {registration_id}")
+        await prefetch_user_context(ctx, registration_id)
+        logger.info("Loaded context for registration_id: %s", registration_id)
         return ctx
         
     except Exception as e:
-        logger.warning(f"Could not load user context: {e}")
-        return ctx
\ No newline at end of file
+        logger.warning("Could not load user context: %s", e)
+        return ctx
+
+def restore_conversation_state(ctx: AirlineAgentContext, checkpointed: str) -> AirlineAgentContext:
+    """ctx (freshly loaded) with the conversation state of a checkpointed context."""
+    saved = AirlineAgentContext.model_validate_json(checkpointed)
+    return ctx.model_copy(update=saved.model_dump(exclude=PROFILE_FIELDS))
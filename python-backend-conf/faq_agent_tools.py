@@ -6,6 +6,10 @@ from agents import function_tool
 )
 async def faq_lookup_tool(question: str) -> str:
     """Lookup comprehensive airline information including policies, services, and travel details."""
+    return answer_faq(question)
+
+def answer_faq(question: str) -> str:
+    """Deterministic FAQ answer; also used as a fallback when the model is unavailable."""
     q = question.lower()
     
     if any(word in q for word in ["bag", "baggage", "luggage", "carry", "checked"]):
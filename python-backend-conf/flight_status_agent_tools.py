@@ -1,34 +1,57 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 from context import AirlineAgentContext
 from database import db_client
 from agents import function_tool
+from tool_memo import memoize_tool
+from resilience import guarded, DB_CALL_TIMEOUT
+from read_replica import replica_get
+from tool_output import is_compact, table
 
 logger = logging.getLogger(__name__)
 
+async def query_flight(flight_number: str) -> Optional[Dict[str, Any]]:
+    served, flight = replica_get("flights", "flight_number", flight_number)
+    if served:
+        return flight
+    return await guarded(
+        "db.flights",
+        lambda: db_client.query(
+            table_name="flights",
+            filters={"flight_number": flight_number},
+            single=True
+        ),
+        timeout=DB_CALL_TIMEOUT,
+        hedge=True
+    )
+
+def format_flight_status(flight_number: str, flight: Dict[str, Any]) -> str:
+    if is_compact():
+        return table(("flight", "status", "gate", "terminal", "delay_minutes"), [(
+            flight_number, flight.get("current_status"), flight.get("gate"), flight.get("terminal"), flight.get("delay_minutes", 0),
+        )])
+    return (
+        f"Flight {flight_number} Status:\n"
+        f"Status: {flight.get('current_status')}\n"
+        f"Gate: {flight.get('gate')}\n"
+        f"Terminal: {flight.get('terminal')}\n"
+        f"Delay: {flight.get('delay_minutes', 0)} minutes"
+    )
+
 @function_tool(
     name_override="flight_status_tool",
     description_override="Get flight status information."
 )
+@memoize_tool(key_args=("flight_number",), ttl=30)  # Status changes; keep the window short
 async def flight_status_tool(flight_number: str, context: AirlineAgentContext) -> str:
     """Get flight status information."""
     try:
-        flight = await db_client.query(
-            table_name="flights",
-            filters={"flight_number": flight_number},
-            single=True
-        )
+        flight = await query_flight(flight_number)
         if not flight:
-            logger.warning(f"❌ No flight found for flight_number: {flight_number}")
+            logger.warning("❌ No flight found for flight_number: %s", flight_number)
             return f"No flight found for flight number {flight_number}"
-        logger.info(f"✅ Found flight status for {flight_number}")
-        return (
-            f"Flight {flight_number} Status:\n"
-            f"Status: {flight.get('current_status')}\n"
-            f"Gate: {flight.get('gate')}\n"
-            f"Terminal: {flight.get('terminal')}\n"
-            f"Delay: {flight.get('delay_minutes', 0)} minutes"
-        )
+        logger.info("✅ Found flight status for %s", flight_number)
+        return format_flight_status(flight_number, flight)
     except Exception as e:
-        logger.error(f"❌ Error fetching flight status: {e}", exc_info=True)
+        logger.error("❌ Error fetching flight status: %s", e, exc_info=True)
         return f"Error fetching flight status: {str(e)}"
\ No newline at end of file
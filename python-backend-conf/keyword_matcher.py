@@ -0,0 +1,89 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set
+from semantic_mappings import SEMANTIC_MAPPINGS, GUARDRAIL_KEYWORDS
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # Fuzzy matching is optional
+    process = None
+
+class KeywordHit(NamedTuple):
+    category: str
+    keyword: str
+    start: int
+    end: int
+    fuzzy: bool = False
+
+class MatchResult(NamedTuple):
+    hits: List[KeywordHit]
+    categories: FrozenSet[str]
+
+    def has(self, category: str) -> bool:
+        return category in self.categories
+
+class KeywordMatcher:
+    """All keyword sets compiled into one case-insensitive alternation, matched in one pass.
+
+    Keywords match at the start of a word, so "session" still matches "sessions"
+    but "hack" no longer matches inside "shack". With fuzzy_threshold set, words
+    missed by the regex are compared against the single-word keywords of
+    fuzzy_categories (default: all) with rapidfuzz to tolerate typos ("sesion",
+    "speeker"). A fuzzy hit only ever reports a fuzzy category.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], fuzzy_threshold: Optional[float] = None,
+                 fuzzy_min_length: int = 5, fuzzy_categories: Optional[Iterable[str]] = None):
+        self.by_keyword: Dict[str, List[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self.by_keyword.setdefault(keyword.lower(), []).append(category)
+        # Longest first so multi-word phrases win over their prefixes
+        alternation = "|".join(re.escape(k) for k in sorted(self.by_keyword, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b(?:{alternation})", re.IGNORECASE)
+        self.fuzzy_threshold = fuzzy_threshold if process is not None else None
+        self.fuzzy_min_length = fuzzy_min_length
+        fuzzy = set(categories if fuzzy_categories is None else fuzzy_categories)
+        self.fuzzy_keywords: Dict[str, List[str]] = {}
+        for keyword, owners in self.by_keyword.items():
+            owners = [category for category in owners if category in fuzzy]
+            if owners and " " not in keyword and len(keyword) >= fuzzy_min_length:
+                self.fuzzy_keywords[keyword] = owners
+        self.fuzzy_choices = list(self.fuzzy_keywords)
+
+    def match(self, text: str) -> MatchResult:
+        hits: List[KeywordHit] = []
+        covered: Set[int] = set()
+        for m in self.pattern.finditer(text):
+            keyword = m.group(0).lower()
+            covered.add(m.start())
+            for category in self.by_keyword[keyword]:
+                hits.append(KeywordHit(category, keyword, m.start(), m.end()))
+        if self.fuzzy_threshold is not None and self.fuzzy_choices:
+            for word in re.finditer(r"\w+", text):
+                if word.start() in covered or len(word.group(0)) < self.fuzzy_min_length:
+                    continue
+                best = process.extractOne(word.group(0).lower(), self.fuzzy_choices, scorer=fuzz.ratio,
+                                          score_cutoff=self.fuzzy_threshold)
+                if best is not None:
+                    for category in self.fuzzy_keywords[best[0]]:
+                        hits.append(KeywordHit(category, best[0], word.start(), word.end(), fuzzy=True))
+        return MatchResult(hits, frozenset(hit.category for hit in hits))
+
+def build_message_matcher(fuzzy_threshold: Optional[float] = 85.0, fuzzy_categories: Iterable[str] = ()) -> KeywordMatcher:
+    """Matcher over the routing intents and guardrail keyword sets.
+
+    Fuzzy matching is opt-in per category and off for all of these by default:
+    near misses such as "sneaker" for "speaker" would route messages and let
+    off-topic ones past the relevance guardrail.
+    """
+    categories: Dict[str, Iterable[str]] = {name: spec["keywords"] for name, spec in SEMANTIC_MAPPINGS.items()}
+    categories.update(GUARDRAIL_KEYWORDS)
+    return KeywordMatcher(categories, fuzzy_threshold=fuzzy_threshold, fuzzy_categories=fuzzy_categories)
+
+MESSAGE_MATCHER = build_message_matcher()
+
+@lru_cache(maxsize=1024)
+def match_message(text: str) -> MatchResult:
+    """Scan a user message once; the guardrails and the router share the cached result."""
+    return MESSAGE_MATCHER.match(text)
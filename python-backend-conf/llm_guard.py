@@ -0,0 +1,40 @@
+"""Circuit breaker and deadline on every model call of an agent run.
+
+A run alternates model calls with tool calls, and tools such as cancel_flight
+write as they go. A deadline around the whole run would abandon it mid-tool
+and report nothing done after a write went through; guarding each model
+call instead means a run only ever fails between steps, never inside a tool.
+"""
+from typing import Optional
+from agents import Model, ModelProvider, RunConfig
+from agents.models.multi_provider import MultiProvider
+from resilience import guarded, LLM_CALL_TIMEOUT
+
+class GuardedModel(Model):
+    """A model whose responses go through guarded(breaker, timeout=timeout)."""
+
+    def __init__(self, model: Model, breaker: str = "llm", timeout: float = LLM_CALL_TIMEOUT):
+        self.model = model
+        self.breaker = breaker
+        self.timeout = timeout
+
+    async def get_response(self, *args, **kwargs):
+        return await guarded(self.breaker, lambda: self.model.get_response(*args, **kwargs), timeout=self.timeout)
+
+    def stream_response(self, *args, **kwargs):
+        # Runner.run does not stream; streamed runs keep their own pacing
+        return self.model.stream_response(*args, **kwargs)
+
+class GuardedModelProvider(ModelProvider):
+    """Wraps every model another provider (default: the SDK's) hands out in a GuardedModel."""
+
+    def __init__(self, provider: Optional[ModelProvider] = None, breaker: str = "llm",
+                 timeout: float = LLM_CALL_TIMEOUT):
+        self.provider = provider or MultiProvider()
+        self.breaker = breaker
+        self.timeout = timeout
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return GuardedModel(self.provider.get_model(model_name), self.breaker, self.timeout)
+
+GUARDED_RUN_CONFIG = RunConfig(model_provider=GuardedModelProvider())
@@ -0,0 +1,215 @@
+"""Per-agent accounting of model calls: prompt size by part, completion tokens and latency.
+
+Usage: python llm_ledger.py [--budget 3000] [--agent-budget "Triage Agent=1200"]
+
+The command checks the static prompt (instructions plus tool and handoff
+schemas) of every agent in m.py and main.py against a token budget and exits
+non-zero when one grows past it.
+"""
+import argparse
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from agents import Agent, RunHooks
+import metrics
+from cache_utils import LRUCache
+from memory_monitor import register_cache
+
+PROMPT_PARTS = ("instructions", "tool_schemas", "history", "tool_outputs")
+CHARS_PER_TOKEN = 4  # No Llama tokenizer here; close enough to compare agents and catch growth
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+LEDGER_RECENT_CALLS = int(os.getenv("LLM_LEDGER_RECENT_CALLS", "500"))
+
+_calls = metrics.counter("llm_calls_total", "Model calls", ("agent",))
+_prompt_tokens = metrics.counter("llm_prompt_tokens_total", "Prompt tokens by part", ("agent", "part"))
+_completion_tokens = metrics.counter("llm_completion_tokens_total", "Completion tokens", ("agent",))
+_latency = metrics.counter("llm_call_seconds_total", "Model call latency", ("agent",))
+_static_prompt = metrics.gauge("llm_static_prompt_tokens", "Instructions plus tool schemas of the last call", ("agent",))
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def tool_schemas(agent: Any) -> str:
+    """The tool and handoff definitions the model sees, as JSON."""
+    schemas = []
+    for tool in getattr(agent, "tools", None) or []:
+        schemas.append({"name": getattr(tool, "name", None), "description": getattr(tool, "description", None),
+                        "parameters": getattr(tool, "params_json_schema", None)})
+    for target in getattr(agent, "handoffs", None) or []:
+        if target is None:
+            continue
+        name = getattr(target, "tool_name", None) or f"transfer_to_{getattr(target, 'name', '')}"
+        description = getattr(target, "tool_description", None) or getattr(target, "handoff_description", None)
+        schemas.append({"name": name, "description": description})
+    return json.dumps(schemas, default=str)
+
+def static_instructions(agent: Any) -> str:
+    """Instructions as text; callables are called with as many (context, agent) args as they take."""
+    instructions = getattr(agent, "instructions", None)
+    if callable(instructions):
+        instructions = instructions(*(None, agent)[:len(inspect.signature(instructions).parameters)])
+    return instructions if isinstance(instructions, str) else ""
+
+def split_input(input_items: Iterable[Any]) -> Tuple[str, str]:
+    """(history, tool outputs) text of the items sent to the model."""
+    history, outputs = [], []
+    for item in input_items or []:
+        if isinstance(item, dict) and item.get("type") == "function_call_output":
+            outputs.append(str(item.get("output", "")))
+        elif isinstance(item, dict):
+            history.append(json.dumps(item.get("content", item), default=str))
+        else:
+            history.append(str(item))
+    return "".join(history), "".join(outputs)
+
+class LLMLedger:
+    """Recent model calls plus running totals per agent."""
+
+    def __init__(self, recent: int = LEDGER_RECENT_CALLS):
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, prompt: Dict[str, int], completion_tokens: int, latency: float,
+               time_to_first_token: Optional[float] = None) -> Dict[str, Any]:
+        entry = {
+            "agent": agent,
+            "at": time.time(),
+            "prompt_tokens": sum(prompt.values()),
+            "prompt": prompt,
+            "completion_tokens": completion_tokens,
+            "latency": round(latency, 4),
+            "time_to_first_token": None if time_to_first_token is None else round(time_to_first_token, 4),
+        }
+        with self._lock:
+            self.recent.append(entry)
+            totals = self.totals.setdefault(agent, {"calls": 0, "completion_tokens": 0, "latency": 0.0, "max_prompt_tokens": 0,
+                                                    "ttft": 0.0, "ttft_calls": 0, **{part: 0 for part in PROMPT_PARTS}})
+            totals["calls"] += 1
+            totals["completion_tokens"] += completion_tokens
+            totals["latency"] += latency
+            totals["max_prompt_tokens"] = max(totals["max_prompt_tokens"], entry["prompt_tokens"])
+            if time_to_first_token is not None:
+                totals["ttft"] += time_to_first_token
+                totals["ttft_calls"] += 1
+            for part, tokens in prompt.items():
+                totals[part] += tokens
+        _calls.inc(agent=agent)
+        for part, tokens in prompt.items():
+            _prompt_tokens.inc(tokens, agent=agent, part=part)
+        _completion_tokens.inc(completion_tokens, agent=agent)
+        _latency.inc(latency, agent=agent)
+        _static_prompt.set(prompt["instructions"] + prompt["tool_schemas"], agent=agent)
+        return entry
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent averages, largest agents (by prompt tokens) first."""
+        with self._lock:
+            totals = {agent: dict(values) for agent, values in self.totals.items()}
+        result = {}
+        for agent, values in sorted(totals.items(), key=lambda item: -sum(item[1][p] for p in PROMPT_PARTS)):
+            calls = values["calls"]
+            result[agent] = {
+                "calls": calls,
+                "avg_prompt_tokens": {part: round(values[part] / calls, 1) for part in PROMPT_PARTS},
+                "avg_completion_tokens": round(values["completion_tokens"] / calls, 1),
+                "max_prompt_tokens": values["max_prompt_tokens"],
+                "avg_latency": round(values["latency"] / calls, 4),
+                "avg_time_to_first_token": round(values["ttft"] / values["ttft_calls"], 4) if values["ttft_calls"] else None,
+            }
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self.recent.clear()
+            self.totals.clear()
+
+LEDGER = LLMLedger()
+register_cache("llm_ledger", lambda: LEDGER.recent)
+
+class LedgerHooks(RunHooks):
+    """Run hooks that time every model call and record it in the ledger.
+
+    Runner.run is not streamed, so the first token arrives with the whole
+    response and time_to_first_token stays unset; prompt parts are estimated
+    from text and scaled to the provider's reported input tokens.
+    """
+
+    def __init__(self, ledger: LLMLedger = LEDGER):
+        self.ledger = ledger
+        # Calls that fail never reach on_llm_end; the LRU bound drops their start entries
+        self._started = LRUCache(maxsize=1024)
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        history, outputs = split_input(input_items)
+        parts = {
+            "instructions": estimate_tokens(system_prompt or ""),
+            "tool_schemas": estimate_tokens(tool_schemas(agent)),
+            "history": estimate_tokens(history),
+            "tool_outputs": estimate_tokens(outputs),
+        }
+        self._started.set((id(context), agent.name), (time.perf_counter(), parts))
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        started = self._started.pop((id(context), agent.name), None)
+        if started is None:
+            return
+        started_at, parts = started
+        usage = getattr(response, "usage", None)
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        estimated = sum(parts.values())
+        if input_tokens and estimated:
+            parts = {part: round(tokens * input_tokens / estimated) for part, tokens in parts.items()}
+        self.ledger.record(agent.name, parts, getattr(usage, "output_tokens", 0) or 0, time.perf_counter() - started_at)
+
+LEDGER_HOOKS = LedgerHooks()
+
+def find_agents(module_names: Iterable[str]) -> Dict[str, Any]:
+    """Agents defined at module level in the given modules, by name."""
+    found: Dict[str, Any] = {}
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for value in vars(module).values():
+            if isinstance(value, Agent):
+                found.setdefault(value.name, value)
+    return found
+
+def static_prompt_tokens(agent: Any) -> Dict[str, int]:
+    return {"instructions": estimate_tokens(static_instructions(agent)), "tool_schemas": estimate_tokens(tool_schemas(agent))}
+
+def check_prompt_budgets(agents: Dict[str, Any], budget: int = PROMPT_TOKEN_BUDGET,
+                         overrides: Optional[Dict[str, int]] = None) -> Tuple[List[str], Dict[str, Dict[str, int]]]:
+    """Agents whose instructions plus tool schemas exceed their token budget."""
+    overrides = overrides or {}
+    sizes = {name: static_prompt_tokens(agent) for name, agent in sorted(agents.items())}
+    failures = []
+    for name, size in sizes.items():
+        limit = overrides.get(name, budget)
+        if sum(size.values()) > limit:
+            failures.append(f"{name}: {sum(size.values())} prompt tokens > budget {limit} "
+                            f"(instructions {size['instructions']}, tool schemas {size['tool_schemas']})")
+    return failures, sizes
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fail when an agent's static prompt exceeds its token budget.")
+    parser.add_argument("--budget", type=int, default=PROMPT_TOKEN_BUDGET)
+    parser.add_argument("--agent-budget", action="append", default=[], metavar="NAME=TOKENS")
+    parser.add_argument("--module", action="append", help="Modules to collect agents from (default: m, main)")
+    args = parser.parse_args(argv)
+    overrides = {name: int(tokens) for name, _, tokens in (item.rpartition("=") for item in args.agent_budget)}
+
+    failures, sizes = check_prompt_budgets(find_agents(args.module or ("m", "main")), args.budget, overrides)
+    for name, size in sizes.items():
+        print(f"{name:<24} {sum(size.values()):>6} tokens (instructions {size['instructions']}, tool schemas {size['tool_schemas']})")
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from request_context import request_id_var, conversation_id_var
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+# Confirmation numbers are 6 uppercase alphanumerics mixing letters and digits; flight
+# numbers ("FL1234": carrier code and four digits) have that shape too and stay readable
+CONFIRMATION_RE = re.compile(r"\b(?![A-Z]{2}\d{4}\b)(?=[A-Z0-9]{6}\b)(?=[A-Z]*\d)(?=\d*[A-Z])[A-Z0-9]{6}\b")
+
+def redact(text: str) -> str:
+    """Mask emails and confirmation numbers in a log message."""
+    text = EMAIL_RE.sub("<email>", text)
+    return CONFIRMATION_RE.sub("<confirmation>", text)
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the request/conversation IDs of the calling task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.conversation_id = conversation_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO-and-below records per logger; warnings always pass."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting, redaction and output to the listener thread.
+
+    msg % args is rendered on the caller's thread, since args may be mutated
+    before the listener gets to them; everything else (JSON, redaction,
+    tracebacks, the write) is left to the listener. Unlike the stock handler
+    the record is not copied.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with PII redacted from the rendered message."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+            "request_id": getattr(record, "request_id", None),
+            "conversation_id": getattr(record, "conversation_id", None),
+        }
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False)
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "logger=rate,logger=rate" (e.g. "schedule_agent_tools=0.1")."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(
+    level: Optional[str] = None,
+    sample_rates: Optional[Dict[str, float]] = None,
+    stream=None,
+) -> logging.handlers.QueueListener:
+    """Route all logging through a queue drained by a background listener thread.
+
+    Idempotent; returns the running listener. Settings default to LOG_LEVEL and
+    LOG_SAMPLE_RATES from the environment.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
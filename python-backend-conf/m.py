@@ -2,6 +2,8 @@ from __future__ import annotations as _annotations
 import logging
 from typing import Optional, List, Dict, Any
 from context import AirlineAgentContext
+from logging_config import configure_logging
+from keyword_matcher import match_message
 from database import db_client
 from agents import (
     Agent,
@@ -21,24 +23,20 @@ from seat_booking_agent_tools import update_seat, display_seat_map
 from flight_status_agent_tools import flight_status_tool
 from cancellation_agent_tools import cancel_flight
 from faq_agent_tools import faq_lookup_tool
-from schedule_agent_tools import get_conference_sessions, get_all_speakers, get_all_tracks, get_all_rooms
-from networking_agent_tools import search_businesses, get_user_businesses, display_business_form, add_business
+from schedule_agent_tools import get_conference_sessions, get_all_speakers, get_all_tracks, get_all_rooms, search_sessions, whats_on, find_free_slots, add_to_agenda, remove_from_agenda, review_agenda
+from tool_output import agent_instructions, agent_tools
+from networking_agent_tools import search_businesses, get_user_businesses, display_business_form, add_business, recommend_businesses
 
 # Configure logging
+configure_logging()
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Placeholder guardrail implementations (replace with actual ones)
 @input_guardrail
 async def relevance_guardrail(input: TResponseInputItem) -> GuardrailFunctionOutput:
     """Check if the input is relevant to airline or conference queries."""
-    logger.debug(f"Applying relevance guardrail to input: {input.content}")
-    relevant_keywords = [
-        "flight", "seat", "booking", "cancel", "status", "baggage", "luggage",
-        "conference", "session", "speaker", "track", "room", "networking", "business"
-    ]
-    is_relevant = any(keyword in input.content.lower() for keyword in relevant_keywords)
-    if is_relevant:
+    logger.debug("Applying relevance guardrail to input (%d chars)", len(input.content))
+    if match_message(input.content).has("relevant"):
         return GuardrailFunctionOutput(should_proceed=True)
     return GuardrailFunctionOutput(
         should_proceed=False,
@@ -48,9 +46,8 @@ async def relevance_guardrail(input: TResponseInputItem) -> GuardrailFunctionOut
 @input_guardrail
 async def jailbreak_guardrail(input: TResponseInputItem) -> GuardrailFunctionOutput:
     """Check for attempts to bypass system instructions."""
-    logger.debug(f"Applying jailbreak guardrail to input: {input.content}")
-    suspicious_phrases = ["ignore instructions", "bypass", "system prompt", "hack"]
-    if any(phrase in input.content.lower() for phrase in suspicious_phrases):
+    logger.debug("Applying jailbreak guardrail to input (%d chars)", len(input.content))
+    if match_message(input.content).has("jailbreak"):
         return GuardrailFunctionOutput(
             should_proceed=False,
             message="I'm sorry, but I can't process that request. Please ask a valid question about airline services or the Aviation Tech Summit 2025."
@@ -92,6 +89,8 @@ def schedule_instructions() -> str:
     return (
         "You are the Schedule Agent for the Aviation Tech Summit 2025. Your role is to provide detailed conference schedule information, including sessions, speakers, tracks, and rooms. "
         "Use the provided tools to retrieve and format schedule data. "
+        "For questions about a topic, speaker or track, use search_sessions rather than listing every session. "
+        "Use whats_on for what is happening now or next, find_free_slots for free time, and the agenda tools to bookmark sessions and resolve clashes. "
         "If the query is unrelated to the conference, hand off to the Triage Agent."
     )
 
@@ -99,6 +98,7 @@ def networking_instructions() -> str:
     return (
         "You are the Networking Agent for the Aviation Tech Summit 2025. Your role is to facilitate business networking by searching for businesses, retrieving user business profiles, or adding new businesses. "
         "Use the provided tools to manage business data. "
+        "When the user asks who they should meet, use recommend_businesses. "
         "If the query is unrelated to networking, hand off to the Triage Agent."
     )
 
@@ -123,8 +123,8 @@ seat_booking_agent = Agent[AirlineAgentContext](
     name="Seat Booking Agent",
     model="grok/llama3-8b-8192",
     handoff_description="A specialist agent for seat changes and seat map viewing.",
-    instructions=seat_booking_instructions,
-    tools=[update_seat, display_seat_map, get_booking_details],
+    instructions=agent_instructions("Seat Booking Agent", seat_booking_instructions),
+    tools=agent_tools("Seat Booking Agent", [update_seat, display_seat_map, get_booking_details]),
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
     handoffs=[None],  # Will update with triage_agent after its definition
 )
@@ -133,8 +133,8 @@ flight_status_agent = Agent[AirlineAgentContext](
     name="Flight Status Agent",
     model="grok/llama3-8b-8192",
     handoff_description="A specialist agent for real-time flight status and departure information.",
-    instructions=flight_status_instructions,
-    tools=[flight_status_tool, get_booking_details],
+    instructions=agent_instructions("Flight Status Agent", flight_status_instructions),
+    tools=agent_tools("Flight Status Agent", [flight_status_tool, get_booking_details]),
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
     handoffs=[None],  # Will update with triage_agent after its definition
 )
@@ -143,8 +143,8 @@ cancellation_agent = Agent[AirlineAgentContext](
     name="Cancellation Agent",
     model="grok/llama3-8b-8192",
     handoff_description="A specialist agent for cancelling flight bookings.",
-    instructions=cancellation_instructions,
-    tools=[cancel_flight, get_booking_details],
+    instructions=agent_instructions("Cancellation Agent", cancellation_instructions),
+    tools=agent_tools("Cancellation Agent", [cancel_flight, get_booking_details]),
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
     handoffs=[None],  # Will update with triage_agent after its definition
 )
@@ -163,8 +163,8 @@ schedule_agent = Agent[AirlineAgentContext](
     name="Schedule Agent",
     model="grok/llama3-8b-8192",
     handoff_description="A specialist agent for conference schedule information.",
-    instructions=schedule_instructions,
-    tools=[get_conference_sessions, get_all_speakers, get_all_tracks, get_all_rooms],
+    instructions=agent_instructions("Schedule Agent", schedule_instructions),
+    tools=agent_tools("Schedule Agent", [get_conference_sessions, search_sessions, get_all_speakers, get_all_tracks, get_all_rooms, whats_on, find_free_slots, add_to_agenda, remove_from_agenda, review_agenda]),
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
     handoffs=[None],  # Will update with triage_agent after its definition
 )
@@ -173,8 +173,8 @@ networking_agent = Agent[AirlineAgentContext](
     name="Networking Agent",
     model="grok/llama3-8b-8192",
     handoff_description="A specialist agent for business networking and company information.",
-    instructions=networking_instructions,
-    tools=[search_businesses, get_user_businesses, display_business_form, add_business],
+    instructions=agent_instructions("Networking Agent", networking_instructions),
+    tools=agent_tools("Networking Agent", [search_businesses, recommend_businesses, get_user_businesses, display_business_form, add_business]),
     input_guardrails=[relevance_guardrail, jailbreak_guardrail],
     handoffs=[None],  # Will update with triage_agent after its definition
 )
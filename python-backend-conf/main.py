@@ -1,23 +1,51 @@
 from context import AirlineAgentContext
-from context_utils import create_initial_context, load_user_context
-from fastapi import FastAPI
+from context_utils import create_initial_context, load_user_context, restore_conversation_state
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 import logging
 import os
 from dotenv import load_dotenv
 from agents import Agent, Runner
-from schedule_agent_tools import get_conference_sessions, get_all_speakers, get_all_tracks, get_all_rooms
+from schedule_agent_tools import get_conference_sessions, get_all_speakers, get_all_tracks, get_all_rooms, search_sessions, whats_on, find_free_slots, add_to_agenda, remove_from_agenda, review_agenda
 from fastapi.middleware.cors import CORSMiddleware
+from tool_memo import conversation_scope
+from registration_lookup import resolve_user
+from booking_lookup import lookup_bookings, public_booking, LOOKUP_LIMITER, MAX_BATCH_SIZE
+from logging_config import configure_logging
+from request_context import bind_request, bind_conversation
+from tool_executor import run_blocking
+from resilience import request_budget, recall, get_breaker, is_transient, CircuitOpenError
+from faq_agent_tools import answer_faq
+from profiling import ProfilingMiddleware
+from admin import router as admin_router, is_admin
+from schedule_api import router as schedule_router
+from metrics import render_metrics
+from memory_monitor import run_memory_gauges
+from checkpoint_store import get_checkpoint_store, CheckpointConflict
+from keyword_matcher import match_message
+from llm_ledger import LEDGER_HOOKS
+from llm_guard import GUARDED_RUN_CONFIG
+from prefetch import prefetch_scope
+from read_replica import run_replica_sync
+from tool_output import COMPACT, agent_instructions, agent_tools, humanize
+from agent_registry import AGENT_REGISTRY, GREETING_GUARDRAILS, attendee_info, chat_response, error_response, relevance_guardrails
+import asyncio
+import math
+import uuid
+from typing import Any, List, Optional, Tuple
 
 # Load environment variables
 load_dotenv()
 
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Define input model for chat endpoint
 class ChatRequest(BaseModel):
     message: str
     registration_id: str | None = None
+    conversation_id: str | None = None
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -30,128 +58,194 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware, is_admin=is_admin)
+app.include_router(admin_router)
+app.include_router(schedule_router)
 
 # Define agents with minimal instructions to avoid context length issues
 conference_agent = Agent(
     name="ConferenceAgent",
-    instructions="Help with Aviation Tech Summit 2025 conference queries. Use tools to get sessions, speakers, tracks, and rooms.",
-    tools=[get_conference_sessions, get_all_speakers, get_all_tracks, get_all_rooms],
-    model="groq/llama3-8b-8192"
+    instructions=agent_instructions("ConferenceAgent", "Help with Aviation Tech Summit 2025 conference queries. Use tools to get sessions, speakers, tracks, and rooms."),
+    tools=agent_tools("ConferenceAgent", [get_conference_sessions, search_sessions, get_all_speakers, get_all_tracks, get_all_rooms, whats_on, find_free_slots, add_to_agenda, remove_from_agenda, review_agenda]),
+    model="groq/llama3-8b-8192",
+    handoff_description="Conference queries",
 )
 
 triage_agent = Agent(
     name="TriageAgent", 
     instructions="Route conference queries to ConferenceAgent. For sessions, speakers, tracks, rooms use ConferenceAgent.",
     tools=[],
-    model="groq/llama3-8b-8192"
+    model="groq/llama3-8b-8192",
+    handoff_description="Routes requests",
 )
 
+# route_request does the routing between them, so the SDK handoffs are declared here for the UI
+AGENT_REGISTRY.register(triage_agent, routes_to=[conference_agent])
+AGENT_REGISTRY.register(conference_agent, routes_to=[triage_agent])
+
 async def create_context(registration_id: str | None = None) -> AirlineAgentContext:
-    """Create context."""
-    ctx = await create_initial_context()
+    """Create context, prefetching the user's details, businesses and bookings."""
     if registration_id:
-        ctx.registration_id = str(registration_id)
-    return ctx
+        return await load_user_context(str(registration_id))
+    return await create_initial_context()
 
 # Initialize Runner
 runner = Runner()
 
+def conversation_for(request: ChatRequest) -> str:
+    """The caller's conversation id: conv_<registration_id>, or a random one per anonymous session.
+
+    A client-supplied conversation_id is kept only if it has the caller's
+    prefix, so one attendee's conversations and anonymous sessions stay
+    apart. registration_id itself is not authenticated: whoever sends an
+    attendee's registration_id resumes that attendee's conversation, so this
+    separates conversations, it does not protect them.
+    """
+    owner = f"conv_{request.registration_id}" if request.registration_id else "conv_anon"
+    supplied = request.conversation_id
+    if supplied and ((supplied == owner and request.registration_id) or supplied.startswith(owner + "_")):
+        return supplied
+    return owner if request.registration_id else f"{owner}_{uuid.uuid4().hex}"
+
 def route_request(message: str) -> Agent:
     """Route requests to appropriate agent."""
-    message_lower = message.lower()
-    conference_keywords = ["session", "speaker", "track", "room", "schedule", "conference"]
-    
-    if any(keyword in message_lower for keyword in conference_keywords):
+    if match_message(message).has("conference"):
         return conference_agent
     return triage_agent
 
+def interrupted_answer(writes: List[Tuple[str, Any]]) -> Optional[str]:
+    """What a run that failed after mutating tools did, so the user is not told nothing happened."""
+    results = list(dict.fromkeys(str(result) for _, result in writes))
+    if not results:
+        return None
+    return ("Our assistant could not finish its reply, but this was already done:\n\n"
+            + "\n".join(f"- {result}" for result in results))
+
+def fallback_answer(message: str, agent: Agent) -> str:
+    """Deterministic answer used when the model is slow or its circuit is open."""
+    if agent is conference_agent:
+        cached = recall("get_conference_sessions")
+        if not cached:
+            compact = recall("get_conference_sessions", output_mode=COMPACT)
+            cached = humanize(compact) if compact else None
+        if cached:
+            return "Our assistant is busy right now, so here is the latest schedule I have:\n\n" + cached
+        return "Our assistant is busy right now. Please try your schedule question again in a moment."
+    return answer_faq(message)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.memory_gauges = asyncio.create_task(run_memory_gauges())
+    app.state.replica_sync = asyncio.create_task(run_replica_sync())
+
+@app.on_event("shutdown")
+async def flush_checkpoints():
+    get_checkpoint_store().close()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     """Handle chat requests."""
+    with bind_request(), request_budget():
+        return await _chat(request)
+
+async def _chat(request: ChatRequest):
     try:
-        logger.info(f"Processing message: {request.message}")
+        logger.info("Processing message (%d chars)", len(request.message))
         
         # Handle empty messages
         if not request.message or not request.message.strip():
-            return {
-                "response": "Hello! I can help you with Aviation Tech Summit 2025. Ask me about sessions, speakers, tracks, or rooms.",
-                "agent": "TriageAgent",
-                "current_agent": "TriageAgent",
-                "conversation_id": "initial",
-                "context": {"registration_id": request.registration_id},
-                "agents": [
-                    {"name": "TriageAgent", "description": "Routes requests", "handoffs": ["ConferenceAgent"], "tools": [], "input_guardrails": []},
-                    {"name": "ConferenceAgent", "description": "Conference queries", "handoffs": ["TriageAgent"], "tools": ["get_conference_sessions"], "input_guardrails": []}
-                ],
-                "events": [],
-                "guardrails": [{"id": "1", "name": "relevance", "input": "", "reasoning": "OK", "passed": True, "timestamp": "2024-01-01T00:00:00Z"}],
-                "customer_info": {
-                    "customer": {"name": "Conference Attendee", "registration_id": request.registration_id, "is_conference_attendee": True, "conference_name": "Aviation Tech Summit 2025"},
-                    "bookings": []
-                }
-            }
+            return chat_response(
+                "Hello! I can help you with Aviation Tech Summit 2025. Ask me about sessions, speakers, tracks, or rooms.",
+                "TriageAgent",
+                conversation_for(request),
+                {"registration_id": request.registration_id},
+                [],
+                GREETING_GUARDRAILS,
+                attendee_info(request.registration_id),
+            )
         
-        # Create context
-        ctx = await create_context(request.registration_id)
+        # Restore the conversation from its checkpoint (any worker may have served the last turn);
+        # the profile, bookings and businesses are reloaded every turn, only the conversation state is restored
+        conversation_id = conversation_for(request)
+        bind_conversation(conversation_id)
+        checkpoints = get_checkpoint_store()
+        checkpoint, ctx = await asyncio.gather(
+            run_blocking(checkpoints.load, conversation_id),
+            create_context(request.registration_id),
+        )
+        if checkpoint:
+            ctx = restore_conversation_state(ctx, checkpoint.context)
+            run_input = checkpoint.history + [{"role": "user", "content": request.message}]
+        else:
+            run_input = request.message
         
         # Route to agent
         selected_agent = route_request(request.message)
-        logger.info(f"Using agent: {selected_agent.name}")
+        logger.info("Using agent: %s", selected_agent.name)
         
-        # Get response from agent
-        response = await runner.run(selected_agent, request.message, context=ctx)
+        # Get response from agent; tool results are memoized for the conversation, and the
+        # sessions of the speakers the message names are read while the model thinks
+        # Each model call is guarded (llm_guard), so a failure lands between steps, never inside a tool
+        with conversation_scope(conversation_id) as memo, prefetch_scope(request.message, selected_agent):
+            memo.drain_writes()
+            try:
+                response = await runner.run(selected_agent, run_input, context=ctx, hooks=LEDGER_HOOKS,
+                                            run_config=GUARDED_RUN_CONFIG)
+            except Exception as e:
+                if not isinstance(e, CircuitOpenError) and not is_transient(e):
+                    raise
+                logger.warning("Model unavailable (%s); serving fallback", type(e).__name__)
+                response = interrupted_answer(memo.drain_writes()) or fallback_answer(request.message, selected_agent)
+            memo_hits = memo.drain_hits()
+        unsaved = None
+        if hasattr(response, "to_input_list"):
+            try:
+                await run_blocking(checkpoints.save, conversation_id, ctx, response.to_input_list(),
+                                   checkpoint.version if checkpoint else 0,
+                                   checkpoint.updated_at if checkpoint else None)
+            except CheckpointConflict as e:
+                # Another request moved the conversation on; this turn is answered but not remembered
+                logger.warning("Checkpoint not saved: %s", e)
+                unsaved = str(e)
         response_text = str(response) if response else "I'm sorry, I couldn't process that request."
         
-        return {
-            "response": response_text,
-            "agent": selected_agent.name,
-            "current_agent": selected_agent.name,
-            "conversation_id": f"conv_{request.registration_id or 'default'}",
-            "context": {"registration_id": ctx.registration_id},
-            "agents": [
-                {"name": "TriageAgent", "description": "Routes requests", "handoffs": ["ConferenceAgent"], "tools": [], "input_guardrails": []},
-                {"name": "ConferenceAgent", "description": "Conference queries", "handoffs": ["TriageAgent"], "tools": ["get_conference_sessions", "get_all_speakers", "get_all_tracks", "get_all_rooms"], "input_guardrails": []}
-            ],
-            "events": [
+        return chat_response(
+            response_text,
+            selected_agent.name,
+            conversation_id,
+            {"registration_id": ctx.registration_id},
+            [
                 {"id": "1", "type": "message", "agent": selected_agent.name, "content": f"Processed: {request.message[:30]}...", "timestamp": "2024-01-01T00:00:00Z", "metadata": {}}
-            ],
-            "guardrails": [
-                {"id": "1", "name": "relevance", "input": request.message, "reasoning": "Message is relevant", "passed": True, "timestamp": "2024-01-01T00:00:00Z"}
-            ],
-            "customer_info": {
-                "customer": {"name": "Conference Attendee", "registration_id": ctx.registration_id, "is_conference_attendee": True, "conference_name": "Aviation Tech Summit 2025"},
-                "bookings": []
-            }
-        }
+            ] + [
+                {"id": f"memo_{i}", "type": "info", "agent": selected_agent.name, "content": f"Reused {hit['tool_name']} result", "timestamp": "2024-01-01T00:00:00Z", "metadata": hit}
+                for i, hit in enumerate(memo_hits, 1)
+            ] + ([
+                {"id": "checkpoint", "type": "info", "agent": selected_agent.name, "content": "This turn was not saved to the conversation history because another request updated it at the same time", "timestamp": "2024-01-01T00:00:00Z", "metadata": {"reason": unsaved}}
+            ] if unsaved else []),
+            relevance_guardrails(request.message),
+            attendee_info(ctx.registration_id),
+        )
         
     except Exception as e:
-        logger.error(f"Error: {e}", exc_info=True)
-        return {
-            "response": "I'm sorry, there was an error. Please try again.",
-            "agent": "System",
-            "current_agent": "System", 
-            "conversation_id": "error",
-            "context": {},
-            "agents": [],
-            "events": [],
-            "guardrails": [],
-            "customer_info": None
-        }
+        logger.error("Error: %s", e, exc_info=True)
+        return error_response()
 
 @app.get("/user/{user_id}")
 async def get_user(user_id: str):
     """Get user by registration ID."""
     try:
-        from database import db_client
+        user = await resolve_user(user_id)
         
-        response = db_client.table("users").select("id, details").filter("details->>registration_id", "eq", str(user_id)).execute()
-        
-        if response.data:
-            user = response.data[0]
+        if user:
             return {
                 "user_id": user["id"],
                 "registration_id": str(user_id),
@@ -162,5 +256,45 @@ async def get_user(user_id: str):
             return {"error": "User not found"}, 404
             
     except Exception as e:
-        logger.error(f"Error in /user/{user_id}: {e}", exc_info=True)
-        return {"error": "Internal server error"}, 500
\ No newline at end of file
+        logger.error("Error in /user/%s: %s", user_id, e, exc_info=True)
+        return {"error": "Internal server error"}, 500
+
+def limit_booking_lookups(request: Request, count: int) -> None:
+    """Charge the client one token per confirmation number, so guessing them stays slow."""
+    retry_after = LOOKUP_LIMITER.acquire(request.client.host if request.client else "unknown", count)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many booking lookups",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+async def lookup_or_503(confirmation_numbers: List[str]):
+    """lookup_bookings, answering 503 with Retry-After while the bookings table is unreachable."""
+    try:
+        return await lookup_bookings(confirmation_numbers)
+    except Exception as e:
+        if not isinstance(e, CircuitOpenError) and not is_transient(e):
+            raise
+        logger.warning("Booking lookup unavailable: %s", type(e).__name__)
+        retry_after = max(1, math.ceil(get_breaker("db.bookings").retry_after()))
+        raise HTTPException(status_code=503, detail="Bookings are temporarily unavailable",
+                            headers={"Retry-After": str(retry_after)})
+
+@app.get("/booking/{confirmation_number}")
+async def get_booking(confirmation_number: str, request: Request):
+    """Get a booking with its flight and passenger name by confirmation number."""
+    limit_booking_lookups(request, 1)
+    booking = (await lookup_or_503([confirmation_number])).get(confirmation_number.strip())
+    if booking is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return public_booking(booking)
+
+@app.get("/bookings")
+async def get_bookings(request: Request, confirmation: List[str] = Query(...)):
+    """Get several bookings in one round trip: /bookings?confirmation=A&confirmation=B."""
+    if len(confirmation) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} confirmation numbers per request")
+    limit_booking_lookups(request, len(set(confirmation)))
+    bookings = await lookup_or_503(confirmation)
+    return {
+        "bookings": [public_booking(booking) for booking in bookings.values() if booking is not None],
+        "missing": [number for number, booking in bookings.items() if booking is None],
+    }
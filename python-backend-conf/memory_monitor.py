@@ -0,0 +1,147 @@
+import asyncio
+import gc
+import logging
+import os
+import resource
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+import metrics
+from tool_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+MEMORY_GAUGE_INTERVAL = float(os.getenv("MEMORY_GAUGE_INTERVAL_SECONDS", "30"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "1"))
+
+rss_bytes = metrics.gauge("process_resident_memory_bytes", "Resident set size of the worker")
+gc_pending = metrics.gauge("python_gc_generation_count", "Allocations pending collection per GC generation", ("generation",))
+gc_collections = metrics.gauge("python_gc_collections", "GC collections per generation", ("generation",))
+cache_bytes = metrics.gauge("cache_estimated_bytes", "Estimated bytes held by in-process caches", ("cache",))
+cache_entries = metrics.gauge("cache_entries", "Entries held by in-process caches", ("cache",))
+
+# -- RSS and GC gauges -------------------------------------------------------
+
+def current_rss() -> int:
+    """Current RSS in bytes (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def sample_gauges() -> None:
+    """Refresh the process, GC and cache gauges. Walks every cache; run it off the event loop."""
+    rss_bytes.set(current_rss())
+    counts = gc.get_count()
+    for generation, stats in enumerate(gc.get_stats()):
+        gc_pending.set(counts[generation], generation=generation)
+        gc_collections.set(stats["collections"], generation=generation)
+    for name, estimate in cache_estimates().items():
+        cache_bytes.set(estimate["bytes"], cache=name)
+        cache_entries.set(estimate["entries"], cache=name)
+
+async def run_memory_gauges(interval: float = MEMORY_GAUGE_INTERVAL) -> None:
+    """Background task: refresh memory gauges every interval seconds, sampling on the tool pool."""
+    while True:
+        try:
+            await run_blocking(sample_gauges)
+        except Exception as e:
+            logger.warning("Memory gauge sampling failed: %s", e)
+        await asyncio.sleep(interval)
+
+# -- cache size estimates ----------------------------------------------------
+
+_sized: Dict[str, Callable[[], Any]] = {}
+
+def register_cache(name: str, getter: Callable[[], Any]) -> None:
+    """Register a cache or session store for byte estimates; getter returns the container."""
+    _sized[name] = getter
+
+def deep_sizeof(obj: Any, limit: int = 200_000) -> int:
+    """Approximate retained size of obj by walking containers, pydantic models and __dict__s."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item, 0)
+        if isinstance(item, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+        elif hasattr(item, "__slots__"):
+            stack.extend(getattr(item, slot) for slot in item.__slots__ if hasattr(item, slot))
+    return total
+
+def cache_estimates() -> Dict[str, Dict[str, int]]:
+    """Byte and entry estimates for every registered cache.
+
+    Safe to call from a worker thread: a cache that changes size mid-walk is
+    left out of this round rather than failing the whole sample.
+    """
+    estimates = {}
+    for name, getter in list(_sized.items()):
+        container = getter()
+        try:
+            entries = len(container)
+        except TypeError:
+            entries = 0
+        try:
+            estimates[name] = {"entries": entries, "bytes": deep_sizeof(container)}
+        except RuntimeError as e:  # "changed size during iteration"
+            logger.debug("Skipped size estimate of %s: %s", name, e)
+    return estimates
+
+# -- tracemalloc snapshots ---------------------------------------------------
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+def take_baseline() -> Dict[str, Any]:
+    """Start tracing if needed and record the snapshot later diffs compare against."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    _baseline = tracemalloc.take_snapshot()
+    traced, peak = tracemalloc.get_traced_memory()
+    return {"tracing": True, "traced_bytes": traced, "peak_bytes": peak}
+
+def stop_tracing() -> None:
+    """Stop tracemalloc; tracing costs memory and CPU, so only run it while investigating."""
+    global _baseline
+    _baseline = None
+    tracemalloc.stop()
+
+def _module_of(filename: str) -> str:
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path):
+            relative = filename[len(path):].lstrip(os.sep)
+            return relative.rsplit(".", 1)[0].replace(os.sep, ".")
+    return filename
+
+def snapshot_diff(top: int = 25) -> List[Dict[str, Any]]:
+    """Allocation growth since the baseline, grouped by module, largest first."""
+    if _baseline is None:
+        raise RuntimeError("No baseline snapshot; call take_baseline() first")
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    grouped: Dict[str, Dict[str, int]] = {}
+    for stat in snapshot.compare_to(_baseline, "filename"):
+        module = _module_of(stat.traceback[0].filename)
+        entry = grouped.setdefault(module, {"size_diff": 0, "size": 0, "count_diff": 0})
+        entry["size_diff"] += stat.size_diff
+        entry["size"] += stat.size
+        entry["count_diff"] += stat.count_diff
+    ranked = sorted(grouped.items(), key=lambda item: item[1]["size_diff"], reverse=True)
+    return [{"module": module, **entry} for module, entry in ranked[:top]]
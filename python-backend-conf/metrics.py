@@ -0,0 +1,67 @@
+import threading
+from typing import Dict, List, Tuple
+
+LabelValues = Tuple[str, ...]
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.values.items()):
+            if key:
+                label_text = ",".join(f'{n}="{v}"' for n, v in zip(self.label_names, key))
+                lines.append(f"{self.name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{self.name} {value}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+_registry: Dict[str, _Metric] = {}
+
+def _register(metric_cls, name: str, documentation: str, labels: Tuple[str, ...]):
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = metric_cls(name, documentation, labels)
+    return metric
+
+def counter(name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+    """Get or create a counter."""
+    return _register(Counter, name, documentation, labels)
+
+def gauge(name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Gauge:
+    """Get or create a gauge."""
+    return _register(Gauge, name, documentation, labels)
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,15 +1,47 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 import logging
 from context import AirlineAgentContext, UserDetails, BusinessDetails
 from database import db_client
 from agents import function_tool
+from tool_memo import memoize_tool, invalidates_memo, idempotent_tool
+from tool_executor import run_blocking
+from business_store import BUSINESS_STORE
+from read_replica import note_write, replica_select
+from business_matching import BUSINESS_MATCHER
+from business_ingest import company_key
+from tool_output import is_compact, table
 
 logger = logging.getLogger(__name__)
 
+RECOMMENDATION_LIMIT = 10
+
+# Keep the recommendation matrix in step with the ib_businesses snapshot
+BUSINESS_STORE.subscribe(BUSINESS_MATCHER.apply_changes)
+
+def _format_businesses(businesses: List[Dict[str, Any]], shown: int = 3) -> str:
+    if is_compact():
+        rows = [((b.get("details") or {}).get("companyName"), (b.get("details") or {}).get("industrySector"),
+                 (b.get("users") or {}).get("user_name")) for b in businesses[:shown]]
+        more = f"\n{len(businesses) - shown} more not shown" if len(businesses) > shown else ""
+        return table(("company", "sector", "member"), rows) + more
+    result = f"Found {len(businesses)} businesses:\n"
+    for i, business in enumerate(businesses[:shown], 1):
+        details = business.get("details", {})
+        user_info = business.get("users", {})
+        result += (
+            f"{i}. {details.get('companyName', 'Unknown')} "
+            f"({details.get('industrySector', 'Unknown')}) - "
+            f"{user_info.get('user_name', 'Unknown')}\n"
+        )
+    if len(businesses) > shown:
+        result += f"...and {len(businesses) - shown} more."
+    return result
+
 @function_tool(
     name_override="search_businesses",
     description_override="Search for businesses with semantic and fuzzy matching."
 )
+@memoize_tool()
 async def search_businesses(
     industry_sector: Optional[str] = None,
     location: Optional[str] = None,
@@ -42,40 +74,34 @@ async def search_businesses(
             logger.warning("❌ No businesses found matching criteria")
             return "No businesses found matching the provided criteria."
         
-        result = f"Found {len(businesses)} businesses:\n"
-        for i, business in enumerate(businesses[:3], 1):
-            details = business.get("details", {})
-            user_info = business.get("users", {})
-            result += (
-                f"{i}. {details.get('companyName', 'Unknown')} "
-                f"({details.get('industrySector', 'Unknown')}) - "
-                f"{user_info.get('user_name', 'Unknown')}\n"
-            )
-        if len(businesses) > 3:
-            result += f"...and {len(businesses) - 3} more."
-        
-        logger.info(f"✅ Found {len(businesses)} businesses matching criteria")
-        return result
+        logger.info("✅ Found %s businesses matching criteria", len(businesses))
+        return _format_businesses(businesses)
     except Exception as e:
-        logger.error(f"❌ Error searching businesses: {e}", exc_info=True)
+        logger.error("❌ Error searching businesses: %s", e, exc_info=True)
         return f"Error searching businesses: {str(e)}"
 
 @function_tool(
     name_override="get_user_businesses",
     description_override="Get businesses for a user."
 )
+@memoize_tool(key_args=("user_id",))
 async def get_user_businesses(user_id: str, context: AirlineAgentContext) -> str:
     """Get businesses for a user."""
     try:
-        businesses = await db_client.query(
-            table_name="ib_businesses",
-            filters={"user_id": user_id}
-        )
+        businesses = replica_select("ib_businesses", {"user_id": user_id})
+        if businesses is None:
+            businesses = await db_client.query(
+                table_name="ib_businesses",
+                filters={"user_id": user_id}
+            )
         
         if not businesses:
-            logger.warning(f"❌ No businesses found for user_id: {user_id}")
+            logger.warning("❌ No businesses found for user_id: %s", user_id)
             return f"No businesses found for user {user_id}."
         
+        if is_compact():
+            return table(("company", "sector"), (((b.get("details") or {}).get("companyName"),
+                                                  (b.get("details") or {}).get("industrySector")) for b in businesses))
         result = f"Businesses for user {user_id}:\n"
         for i, business in enumerate(businesses, 1):
             details = business.get("details", {})
@@ -84,23 +110,48 @@ async def get_user_businesses(user_id: str, context: AirlineAgentContext) -> str
                 f"({details.get('industrySector', 'Unknown')})\n"
             )
         
-        logger.info(f"✅ Found {len(businesses)} businesses for user_id: {user_id}")
+        logger.info("✅ Found %s businesses for user_id: %s", len(businesses), user_id)
         return result
     except Exception as e:
-        logger.error(f"❌ Error fetching businesses for user {user_id}: {e}", exc_info=True)
+        logger.error("❌ Error fetching businesses for user %s: %s", user_id, e, exc_info=True)
         return f"Error fetching businesses: {str(e)}"
 
+def _apply_business_owner(business_details: BusinessDetails, organization_id: str, context: AirlineAgentContext) -> None:
+    """Update context.user_details with the contact given for a new business."""
+    if context.user_details:
+        context.user_details = UserDetails(
+            user_name=business_details.user_name,
+            registered_email=business_details.email,
+            registration_id=context.registration_id,
+            firstName=context.user_details.firstName,
+            lastName=context.user_details.lastName,
+            email=context.user_details.email
+        )
+    else:
+        context.user_details = UserDetails(
+            user_name=business_details.user_name,
+            registered_email=business_details.email,
+            registration_id=context.registration_id
+        )
+
+def _business_scope(arguments: Dict[str, Any]) -> str:
+    """add_business calls are recorded per company, so every business added in a run is remembered."""
+    details = arguments.get("business_details")
+    return company_key(getattr(details, "companyName", None) or "")
+
 @function_tool(
     name_override="add_business",
     description_override="Add a new business for the user."
 )
+@invalidates_memo("get_user_businesses", "search_businesses")
+@idempotent_tool(scope=_business_scope, on_replay=_apply_business_owner)
 async def add_business(business_details: BusinessDetails, organization_id: str, context: AirlineAgentContext) -> str:
     """Add a new business for the user."""
     try:
         required_fields = ["companyName", "industrySector", "location", "positionTitle"]
         missing_fields = [field for field in required_fields if getattr(business_details, field, None) is None]
         if missing_fields:
-            logger.warning(f"❌ Missing required fields: {missing_fields}")
+            logger.warning("❌ Missing required fields: %s", missing_fields)
             return f"Missing required fields: {', '.join(missing_fields)}"
         
         success = await db_client.query(
@@ -115,31 +166,67 @@ async def add_business(business_details: BusinessDetails, organization_id: str,
         )
         
         if success:
-            # Update context.user_details if needed
-            if context.user_details:
-                context.user_details = UserDetails(
-                    user_name=business_details.user_name,
-                    registered_email=business_details.email,
-                    registration_id=context.registration_id,
-                    firstName=context.user_details.firstName,
-                    lastName=context.user_details.lastName,
-                    email=context.user_details.email
-                )
+            note_write("ib_businesses")
+            # Score the new business in recommendations without waiting for a reload
+            inserted = [row for row in success if isinstance(row, dict) and "id" in row] if isinstance(success, list) else []
+            if inserted:
+                BUSINESS_STORE.apply_changes(inserted)
             else:
-                context.user_details = UserDetails(
-                    user_name=business_details.user_name,
-                    registered_email=business_details.email,
-                    registration_id=context.registration_id
-                )
-            logger.info(f"✅ Successfully added business {business_details.companyName}")
+                BUSINESS_STORE.invalidate()
+            _apply_business_owner(business_details, organization_id, context)
+            logger.info("✅ Successfully added business %s", business_details.companyName)
             return f"Successfully added business {business_details.companyName}."
         else:
             logger.warning("❌ Failed to add business")
             return "Failed to add business."
     except Exception as e:
-        logger.error(f"❌ Error adding business: {e}", exc_info=True)
+        logger.error("❌ Error adding business: %s", e, exc_info=True)
         return f"Error adding business: {str(e)}"
 
+@function_tool(
+    name_override="recommend_businesses",
+    description_override="Recommend businesses the user should meet, based on their business profile."
+)
+async def recommend_businesses(context: AirlineAgentContext, limit: int = 5) -> str:
+    """Rank ib_businesses by similarity to the user's business profile."""
+    try:
+        await BUSINESS_STORE.ensure_fresh()
+        if context.business_details:
+            profile = context.business_details.model_dump(exclude_none=True)
+        else:
+            own = [row for row in BUSINESS_STORE.rows.values() if context.user_id and row.get("user_id") == context.user_id]
+            if not own:
+                return "No business profile found for you. Add your business first to get recommendations."
+            profile = own[0].get("details") or {}
+
+        recommendations = await run_blocking(
+            BUSINESS_MATCHER.recommend, profile, max(1, min(limit, RECOMMENDATION_LIMIT)), context.user_id
+        )
+        if not recommendations:
+            return "No matching businesses found yet."
+
+        logger.info("✅ Recommended %s businesses for user_id: %s", len(recommendations), context.user_id)
+        return _format_recommendations(recommendations)
+    except Exception as e:
+        logger.error("❌ Error recommending businesses: %s", e, exc_info=True)
+        return f"Error recommending businesses: {str(e)}"
+
+def _format_recommendations(recommendations: List[Any]) -> str:
+    if is_compact():
+        return table(("company", "sector", "location", "why"), (
+            ((r.business.get("details") or {}).get("companyName"), (r.business.get("details") or {}).get("industrySector"),
+             (r.business.get("details") or {}).get("location"), "; ".join(r.reasons))
+            for r in recommendations))
+    result = "Businesses you should meet:\n"
+    for i, recommendation in enumerate(recommendations, 1):
+        details = recommendation.business.get("details") or {}
+        result += (
+            f"{i}. {details.get('companyName', 'Unknown')} "
+            f"({details.get('industrySector', 'Unknown')}, {details.get('location', 'Unknown')}) - "
+            f"{', '.join(recommendation.reasons) or 'similar profile'}\n"
+        )
+    return result
+
 @function_tool(
     name_override="display_business_form",
     description_override="Display the business registration form."
@@ -156,8 +243,8 @@ async def display_business_form(context: AirlineAgentContext) -> dict:
                 {"name": "positionTitle", "type": "text", "required": True}
             ]
         }
-        logger.info(f"✅ Retrieved business form for user_id: {context.user_id}")
+        logger.info("✅ Retrieved business form for user_id: %s", context.user_id)
         return form
     except Exception as e:
-        logger.error(f"❌ Error displaying business form: {e}", exc_info=True)
+        logger.error("❌ Error displaying business form: %s", e, exc_info=True)
         return {"error": f"Error displaying business form: {str(e)}"}
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Speculative reads launched when a message arrives, while the model is still thinking.
+
+Tool modules register a prefetcher per kind of entity: an extractor that
+finds keys in the user message and a loader that reads them. prefetch_scope
+starts every matching load before the agent run; tools call take() first and
+fall back to their own read when nothing (or a failure) was prefetched.
+Loads no tool consumed by the end of the request are counted as wasted.
+"""
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_PREFETCHES_PER_MESSAGE = int(os.getenv("MAX_PREFETCHES_PER_MESSAGE", "6"))
+
+_launched = metrics.counter("prefetch_launched_total", "Speculative reads started", ("kind",))
+_hits = metrics.counter("prefetch_hits_total", "Tool reads served by a prefetch", ("kind",))
+_wasted = metrics.counter("prefetch_wasted_total", "Prefetches no tool consumed", ("kind",))
+_failed = metrics.counter("prefetch_failed_total", "Prefetches that raised", ("kind",))
+
+class Prefetcher(NamedTuple):
+    extract: Callable[[str], Iterable[str]]
+    load: Callable[[str], Awaitable[Any]]
+    normalize: Callable[[str], str]
+    tool: str
+
+_prefetchers: Dict[str, Prefetcher] = {}
+
+def register_prefetch(kind: str, tool: str, extract: Callable[[str], Iterable[str]], load: Callable[[str], Awaitable[Any]],
+                      normalize: Callable[[str], str] = str.upper) -> None:
+    """Prefetch load(key) for every key extract(message) finds, when the agent has the tool that reads it.
+
+    The tool looks the result up with take(kind, key); normalize maps its
+    argument onto the form extract returns, so "ab12cd" finds "AB12CD".
+    """
+    _prefetchers[kind] = Prefetcher(extract, load, normalize, tool)
+
+def agent_tool_names(agent: Any) -> Set[str]:
+    """Tools of the agent and of the agents it can hand off to."""
+    names: Set[str] = set()
+    for candidate in [agent] + list(getattr(agent, "handoffs", None) or []):
+        target = getattr(candidate, "agent", candidate)  # Handoff objects wrap their agent
+        names.update(getattr(tool, "name", None) for tool in getattr(target, "tools", None) or [])
+    return names
+
+def extract_entities(message: str, tools: Optional[Set[str]] = None) -> Dict[str, List[str]]:
+    """Keys found in the message, by kind (kinds with no match, or whose tool is not in tools, are left out)."""
+    found = {}
+    for kind, prefetcher in _prefetchers.items():
+        if tools is not None and prefetcher.tool not in tools:
+            continue
+        try:
+            keys = list(prefetcher.extract(message))
+        except Exception as e:
+            logger.warning("Entity extraction for %s failed: %s", kind, e)
+            continue
+        if keys:
+            found[kind] = keys
+    return found
+
+class RequestPrefetch:
+    """The loads started for one request, by (kind, key)."""
+
+    def __init__(self):
+        self.tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.consumed: set = set()
+
+    def launch(self, entities: Dict[str, List[str]], limit: int = MAX_PREFETCHES_PER_MESSAGE) -> None:
+        for kind, keys in entities.items():
+            for key in keys:
+                if len(self.tasks) >= limit:
+                    return
+                if (kind, key) not in self.tasks:
+                    self.tasks[(kind, key)] = asyncio.ensure_future(_prefetchers[kind].load(key))
+                    _launched.inc(kind=kind)
+
+    async def take(self, kind: str, key: str) -> Tuple[bool, Any]:
+        task = self.tasks.get((kind, key))
+        if task is None:
+            return False, None
+        self.consumed.add((kind, key))
+        try:
+            value = await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _failed.inc(kind=kind)
+            logger.debug("Prefetch of %s %s failed, reading again: %s", kind, key, e)
+            return False, None
+        _hits.inc(kind=kind)
+        return True, value
+
+    def close(self) -> Dict[str, int]:
+        """Cancel what is still running and count what nobody used; returns wasted counts by kind."""
+        wasted: Dict[str, int] = {}
+        for (kind, key), task in self.tasks.items():
+            if (kind, key) in self.consumed:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is not None:
+                _failed.inc(kind=kind)
+            wasted[kind] = wasted.get(kind, 0) + 1
+            _wasted.inc(kind=kind)
+        return wasted
+
+_current_prefetch: ContextVar[Optional[RequestPrefetch]] = ContextVar("request_prefetch", default=None)
+
+@contextmanager
+def prefetch_scope(message: str, agent: Any = None):
+    """Start the speculative reads for a message; tools running inside the scope can take() them.
+
+    With an agent, only reads its tools (or its handoff targets' tools) could use are started.
+    """
+    prefetch = RequestPrefetch()
+    entities = extract_entities(message, agent_tool_names(agent) if agent is not None else None)
+    if entities:
+        prefetch.launch(entities)
+        logger.debug("Prefetching %s", entities)
+    token = _current_prefetch.set(prefetch)
+    try:
+        yield prefetch
+    finally:
+        _current_prefetch.reset(token)
+        prefetch.close()
+
+async def take(kind: str, key: Optional[str]) -> Tuple[bool, Any]:
+    """(True, value) when this request prefetched kind/key successfully, else (False, None)."""
+    prefetch = _current_prefetch.get()
+    if prefetch is None or key is None or kind not in _prefetchers:
+        return False, None
+    return await prefetch.take(kind, _prefetchers[kind].normalize(str(key).strip()))
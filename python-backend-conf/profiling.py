@@ -0,0 +1,139 @@
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+from memory_monitor import register_cache
+
+logger = logging.getLogger(__name__)
+
+class ProfilingConfig:
+    """Runtime-adjustable profiling settings (see POST /admin/profiling)."""
+
+    def __init__(self):
+        # Fraction of /chat requests sampled automatically; 0 disables auto-capture
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        # Auto-sampled profiles are kept only if the request was at least this slow
+        self.slow_threshold = float(os.getenv("PROFILE_SLOW_THRESHOLD_SECONDS", "5"))
+        self.interval = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+        self.max_profiles = int(os.getenv("PROFILE_MAX_STORED", "50"))
+
+config = ProfilingConfig()
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval into collapsed-stack counts.
+
+    The event loop serves every request on one thread, so concurrent requests
+    show up in the same profile; frames are attributed, not requests.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed format, ready for flamegraph.pl / speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+_profiles: Deque[Dict[str, Any]] = deque(maxlen=config.max_profiles)
+_ids = itertools.count(1)
+_active = threading.Semaphore(1)  # One sampler at a time keeps overhead bounded
+register_cache("profiles", lambda: _profiles)
+
+def should_profile(path: str, forced: bool) -> bool:
+    """Cheap per-request check; with sampling off and no header it is a couple of comparisons."""
+    if path != "/chat":
+        return False
+    if forced:
+        return True
+    return config.sample_rate > 0 and random.random() < config.sample_rate
+
+def start_profile() -> Optional[StackSampler]:
+    """Start sampling the calling thread, or None if another profile is running."""
+    if not _active.acquire(blocking=False):
+        return None
+    sampler = StackSampler(threading.get_ident(), config.interval)
+    sampler.start()
+    return sampler
+
+def finish_profile(sampler: StackSampler, path: str, duration: float, forced: bool) -> Optional[Dict[str, Any]]:
+    """Stop sampling and store the profile if it was requested or the request was slow."""
+    try:
+        sampler.stop()
+    finally:
+        _active.release()
+    if not forced and duration < config.slow_threshold:
+        return None
+    profile = {
+        "id": next(_ids),
+        "path": path,
+        "duration_seconds": round(duration, 4),
+        "samples": sampler.samples,
+        "captured_at": time.time(),
+        "forced": forced,
+        "collapsed": sampler.collapsed(),
+    }
+    _profiles.append(profile)
+    logger.info("Captured profile %d for %s (%.2fs, %d samples)", profile["id"], path, duration, sampler.samples)
+    return profile
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected /chat requests.
+
+    A request is profiled when it carries "X-Profile: 1" together with a valid
+    admin token, or when it is picked by the automatic sample rate.
+    """
+
+    def __init__(self, app, is_admin):
+        self.app = app
+        self.is_admin = is_admin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/chat":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        forced = headers.get(b"x-profile", b"").strip() == b"1" and self.is_admin(headers.get(b"x-admin-token", b"").decode() or None)
+        if not should_profile(scope["path"], forced):
+            return await self.app(scope, receive, send)
+        sampler = start_profile()
+        if sampler is None:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finish_profile(sampler, scope["path"], time.perf_counter() - started, forced)
+
+def list_profiles() -> List[Dict[str, Any]]:
+    return [{k: v for k, v in p.items() if k != "collapsed"} for p in _profiles]
+
+def get_profile(profile_id: int) -> Optional[Dict[str, Any]]:
+    return next((p for p in _profiles if p["id"] == profile_id), None)
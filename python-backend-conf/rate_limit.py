@@ -0,0 +1,32 @@
+"""Per-client token buckets for endpoints that must stay expensive to enumerate."""
+import time
+from typing import Hashable
+import metrics
+from cache_utils import LRUCache
+
+rate_limited = metrics.counter("rate_limited_total", "Requests refused by a rate limiter", ("limiter",))
+
+class RateLimiter:
+    """rate tokens per second up to burst per key; each request spends cost tokens.
+
+    Buckets live in an LRU, so the number of tracked clients stays bounded; an
+    evicted client starts again with a full bucket.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_clients: int = 10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._buckets = LRUCache(maxsize=max_clients)
+
+    def acquire(self, key: Hashable, cost: float = 1) -> float:
+        """Spend cost tokens and return 0, or return the seconds to wait before cost tokens are available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= cost:
+            self._buckets.set(key, (tokens - cost, now))
+            return 0.0
+        self._buckets.set(key, (tokens, now))
+        rate_limited.inc(limiter=self.name)
+        return (cost - tokens) / self.rate if self.rate > 0 else float("inf")
@@ -0,0 +1,286 @@
+"""Optional local SQLite replica of read-mostly tables, synced by updated_at watermark.
+
+Set READ_REPLICA_PATH to enable it (see sql/read_replica.sql for the
+updated_at columns it syncs on). Each node keeps the selected tables in one
+SQLite file, shared by its workers, with an expression index on every
+column the tools filter on. select() answers from the replica only while
+the table was synced within READ_REPLICA_MAX_STALENESS_SECONDS and has not
+been written through this process since; otherwise it returns None and the
+caller reads Supabase. Writes always go to Supabase.
+
+Changed rows are pulled with a keyset on (updated_at, id), re-reading a
+short overlap so rows from transactions that committed late are not
+missed. Hard deletes carry no updated_at, so the id lists are reconciled
+every READ_REPLICA_RECONCILE_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import metrics
+from change_feed import fetch_changes, overlap
+from tool_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PATH = os.getenv("READ_REPLICA_PATH")  # Unset: every read goes to Supabase
+REPLICA_TABLES = os.getenv("READ_REPLICA_TABLES", "flights,conference_schedules,ib_businesses")
+MAX_STALENESS_SECONDS = float(os.getenv("READ_REPLICA_MAX_STALENESS_SECONDS", "30"))
+SYNC_INTERVAL_SECONDS = float(os.getenv("READ_REPLICA_SYNC_SECONDS", "5"))
+RECONCILE_SECONDS = float(os.getenv("READ_REPLICA_RECONCILE_SECONDS", "300"))
+WATERMARK_OVERLAP_SECONDS = float(os.getenv("READ_REPLICA_WATERMARK_OVERLAP_SECONDS", "5"))
+SYNC_PAGE_SIZE = 1000  # PostgREST caps responses at 1000 rows by default
+
+# Tables that can be replicated, with the fields the tools filter on (JSON paths into the row)
+INDEXED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "flights": ("flight_number",),
+    "bookings": ("confirmation_number",),
+    "customers": ("email",),
+    "conference_schedules": ("speaker_name", "conference_date", "track_name", "conference_room_name"),
+    "ib_businesses": ("details.industrySector", "user_id"),
+}
+FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+_reads = metrics.counter("replica_reads_total", "Reads of replicable tables by where they were served", ("table", "source"))
+_synced_rows = metrics.counter("replica_synced_rows_total", "Rows upserted or deleted by replica syncs", ("table", "change"))
+_lag = metrics.gauge("replica_lag_seconds", "Seconds since the last complete sync", ("table",))
+
+STATE_SCHEMA = """
+create table if not exists replica_state (
+    table_name text primary key,
+    watermark text
+);
+"""
+
+def _expr(field: str) -> str:
+    if field == "id":
+        return "id"
+    if not FIELD_RE.match(field):
+        raise ValueError(f"Invalid replica field: {field!r}")
+    return f"json_extract(data, '$.{field}')"
+
+def _keyset_clause(order: Sequence[str], after: Sequence[Any]) -> Tuple[str, List[Any]]:
+    """Rows sorting after the keyset in (expr is null, expr) order, i.e. Postgres' default nulls last."""
+    terms, params, equal, equal_params = [], [], [], []
+    for field, value in zip(order, after):
+        expr = _expr(field)
+        if value is None:
+            equal.append(f"{expr} is null")
+            continue
+        terms.append("(" + " and ".join(equal + [f"({expr} > ? or {expr} is null)"]) + ")")
+        params.extend(equal_params + [value])
+        equal.append(f"{expr} = ?")
+        equal_params.append(value)
+    return "(" + (" or ".join(terms) or "0") + ")", params
+
+def _table_schema(table: str) -> str:
+    statements = [f'create table if not exists "{table}" (id primary key, updated_at text, data text not null);']
+    for field in INDEXED_FIELDS[table]:
+        statements.append(f'create index if not exists "{table}_{field.replace(".", "_")}_idx" on "{table}" ({_expr(field)});')
+    return "\n".join(statements)
+
+def fetch_ids(table: str) -> List[Any]:
+    from snapshot_store import fetch_all_rows
+
+    return [row["id"] for row in fetch_all_rows(table, "id")]
+
+class ReadReplica:
+    """Local copies of the replicated tables plus the freshness bookkeeping that gates reads."""
+
+    def __init__(self, path: str, tables: Iterable[str], max_staleness: float = MAX_STALENESS_SECONDS):
+        self.path = path
+        self.tables = []
+        for table in tables:
+            if table in INDEXED_FIELDS:
+                self.tables.append(table)
+            else:
+                logger.warning("Table %s cannot be replicated; reads stay on the primary", table)
+        self.max_staleness = max_staleness
+        self.synced_at: Dict[str, float] = {}  # Wall clock at the start of the last complete sync
+        self.written_at: Dict[str, float] = {}
+        self.reconciled_at: Dict[str, float] = {}
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(STATE_SCHEMA + "\n".join(_table_schema(table) for table in self.tables))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("pragma journal_mode=wal")
+        conn.execute("pragma synchronous=normal")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -- reads ---------------------------------------------------------------
+
+    def is_fresh(self, table: str) -> bool:
+        """Synced within the staleness bound, and after this process's last write to the table."""
+        synced = self.synced_at.get(table)
+        return (synced is not None and time.time() - synced <= self.max_staleness
+                and synced > self.written_at.get(table, 0.0))
+
+    def note_write(self, table: str) -> None:
+        """Route reads of table to the primary until a sync started after this write completes."""
+        self.written_at[table] = time.time()
+
+    def select(
+        self,
+        table: str,
+        equals: Optional[Dict[str, Any]] = None,
+        order: Sequence[str] = (),
+        after: Optional[Sequence[Any]] = None,
+        limit: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Matching rows from the replica, or None when the table must be read from the primary.
+
+        after is a keyset: rows whose order columns sort after these values,
+        with nulls last in every column as on the primary.
+        columns projects the rows the way a PostgREST select list would.
+        """
+        if table not in self.tables or not self.is_fresh(table):
+            _reads.inc(table=table, source="primary")
+            return None
+        clauses, params = [], []
+        for field, value in (equals or {}).items():
+            clauses.append(f"{_expr(field)} = ?")
+            params.append(value)
+        if after is not None:
+            clause, after_params = _keyset_clause(order, after)
+            clauses.append(clause)
+            params.extend(after_params)
+        sql = f'select data from "{table}"'
+        if clauses:
+            sql += " where " + " and ".join(clauses)
+        if order:
+            # SQLite sorts nulls first; match the primary, which sorts them last
+            sql += " order by " + ", ".join(f"{_expr(c)} is null, {_expr(c)}" for c in order)
+        if limit is not None:
+            sql += f" limit {int(limit)}"
+        rows = [json.loads(data) for (data,) in self._conn().execute(sql, params)]
+        if columns:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        _reads.inc(table=table, source="replica")
+        return rows
+
+    def get(self, table: str, field: str, value: Any) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(served, row): served is False when the primary must answer instead."""
+        rows = self.select(table, {field: value}, limit=1)
+        if rows is None:
+            return False, None
+        return True, rows[0] if rows else None
+
+    # -- sync ----------------------------------------------------------------
+
+    def sync_table(self, table: str) -> int:
+        """Pull rows changed since the watermark (and reconcile deletes when due); returns rows changed."""
+        with self._sync_lock:
+            started = time.time()
+            conn = self._conn()
+            state = conn.execute("select watermark from replica_state where table_name = ?", (table,)).fetchone()
+            watermark = state[0] if state else None
+            since = overlap(watermark, WATERMARK_OVERLAP_SECONDS)
+            changed, after = 0, None
+            while True:
+                rows = fetch_changes(table, since, after)
+                if rows:
+                    conn.execute("begin")
+                    try:
+                        conn.executemany(
+                            f'insert into "{table}" (id, updated_at, data) values (?, ?, ?) '
+                            f"on conflict (id) do update set updated_at = excluded.updated_at, data = excluded.data",
+                            [(row["id"], row.get("updated_at"), json.dumps(row, default=str)) for row in rows],
+                        )
+                        conn.execute("commit")
+                    except Exception:
+                        conn.execute("rollback")
+                        raise
+                    changed += len(rows)
+                    after = (rows[-1].get("updated_at"), rows[-1]["id"])
+                    if watermark is None or str(after[0]) > watermark:
+                        watermark = str(after[0])
+                if len(rows) < SYNC_PAGE_SIZE:
+                    break
+            _synced_rows.inc(changed, table=table, change="upsert")
+            if started - self.reconciled_at.get(table, 0.0) > RECONCILE_SECONDS:
+                changed += self._reconcile(conn, table)
+                self.reconciled_at[table] = started
+            conn.execute(
+                "insert into replica_state (table_name, watermark) values (?, ?) "
+                "on conflict (table_name) do update set watermark = excluded.watermark",
+                (table, watermark),
+            )
+            self.synced_at[table] = started
+            _lag.set(0, table=table)
+            return changed
+
+    def _reconcile(self, conn: sqlite3.Connection, table: str) -> int:
+        primary = {str(row_id) for row_id in fetch_ids(table)}
+        gone = [(row_id,) for (row_id,) in conn.execute(f'select id from "{table}"') if str(row_id) not in primary]
+        if gone:
+            conn.executemany(f'delete from "{table}" where id = ?', gone)
+            _synced_rows.inc(len(gone), table=table, change="delete")
+            logger.info("Replica %s: removed %d rows deleted on the primary", table, len(gone))
+        return len(gone)
+
+    async def sync(self) -> Dict[str, int]:
+        """Sync every replicated table; a failing table only keeps that table on the primary."""
+        changed = {}
+        for table in self.tables:
+            try:
+                changed[table] = await run_blocking(self.sync_table, table)
+            except Exception as e:
+                logger.warning("Replica sync of %s failed: %s", table, e)
+            if table in self.synced_at:
+                _lag.set(time.time() - self.synced_at[table], table=table)
+        return changed
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        now = time.time()
+        return {
+            table: {
+                "fresh": self.is_fresh(table),
+                "lag_seconds": round(now - self.synced_at[table], 3) if table in self.synced_at else None,
+                "rows": self._conn().execute(f'select count(*) from "{table}"').fetchone()[0],
+            }
+            for table in self.tables
+        }
+
+REPLICA: Optional[ReadReplica] = None
+if REPLICA_PATH:
+    REPLICA = ReadReplica(REPLICA_PATH, [t.strip() for t in REPLICA_TABLES.split(",") if t.strip()])
+
+def replica_select(table: str, equals: Optional[Dict[str, Any]] = None, **kwargs) -> Optional[List[Dict[str, Any]]]:
+    """REPLICA.select when the replica is enabled, else None (read the primary)."""
+    if REPLICA is None:
+        return None
+    return REPLICA.select(table, equals, **kwargs)
+
+def replica_get(table: str, field: str, value: Any) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    if REPLICA is None:
+        return False, None
+    return REPLICA.get(table, field, value)
+
+def note_write(*tables: str) -> None:
+    """Call after writing to the primary, so this process reads its own writes."""
+    if REPLICA is not None:
+        for table in tables:
+            REPLICA.note_write(table)
+
+async def run_replica_sync(interval: float = SYNC_INTERVAL_SECONDS) -> None:
+    """Keep the replica within its staleness bound; started at app startup when enabled."""
+    if REPLICA is None:
+        return
+    while True:
+        await REPLICA.sync()
+        await asyncio.sleep(interval)
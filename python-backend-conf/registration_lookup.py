@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional
+from pydantic import ValidationError
+from context import AirlineAgentContext, UserDetails, BusinessDetails
+from database import db_client
+from cache_utils import LRUCache
+from common_tools import build_customer_booking
+from resilience import guarded, DB_CALL_TIMEOUT
+from memory_monitor import register_cache
+from tool_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Lookups by details->>registration_id are backed by the expression index in
+# sql/registration_index.sql; resolved users are also kept in an in-process LRU.
+_users_by_registration = LRUCache(
+    maxsize=int(os.getenv("REGISTRATION_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("REGISTRATION_CACHE_TTL_SECONDS", "600")),
+)
+register_cache("users_by_registration", lambda: _users_by_registration._data)
+
+def _query_user(registration_id: str) -> Optional[Dict[str, Any]]:
+    response = db_client.table("users").select("id, details").filter("details->>registration_id", "eq", registration_id).limit(1).execute()
+    return response.data[0] if response.data else None
+
+def _query_businesses(registration_id: str) -> List[Dict[str, Any]]:
+    # Join through users so the lookup does not have to wait for the user row
+    response = db_client.table("ib_businesses").select("*, users!inner(id)").filter("users.details->>registration_id", "eq", registration_id).execute()
+    return response.data or []
+
+def _query_bookings(email: str) -> List[Dict[str, Any]]:
+    response = db_client.table("bookings").select("*, customers:customer_id!inner(*), flights:flight_id(*)").eq("customers.email", email).execute()
+    return response.data or []
+
+async def resolve_user(registration_id: str) -> Optional[Dict[str, Any]]:
+    """Resolve a registration ID to its users row ({"id", "details"})."""
+    registration_id = str(registration_id)
+    user = _users_by_registration.get(registration_id)
+    if user is not None:
+        return user
+    user = await guarded("db.users", lambda: run_blocking(_query_user, registration_id), timeout=DB_CALL_TIMEOUT, hedge=True)
+    if user:
+        _users_by_registration.set(registration_id, user)
+    return user
+
+def invalidate_registration(registration_id: str) -> bool:
+    """Forget a cached registration ID after the user's details change; True if it was cached.
+
+    Users rows are written by the registration system, not this service, which
+    calls POST /admin/registrations/{registration_id}/invalidate.
+    """
+    return _users_by_registration.pop(str(registration_id)) is not None
+
+def build_user_details(registration_id: str, user: Dict[str, Any]) -> UserDetails:
+    """Build UserDetails from a users row."""
+    details = user.get("details") or {}
+    return UserDetails(
+        user_id=str(user["id"]),
+        registration_id=str(registration_id),
+        organization_id=details.get("organization_id"),
+        user_name=details.get("user_name"),
+        firstName=details.get("firstName"),
+        lastName=details.get("lastName"),
+        email=details.get("email"),
+        registered_email=details.get("registered_email"),
+    )
+
+async def prefetch_user_context(ctx: AirlineAgentContext, registration_id: str) -> AirlineAgentContext:
+    """Load the user, their businesses and their bookings concurrently into ctx."""
+    registration_id = str(registration_id)
+    user_task = asyncio.ensure_future(resolve_user(registration_id))
+
+    async def load_bookings() -> List[Dict[str, Any]]:
+        user = await user_task
+        email = ((user or {}).get("details") or {}).get("email")
+        if not email:
+            return []
+        return await guarded("db.bookings", lambda: run_blocking(_query_bookings, email), timeout=DB_CALL_TIMEOUT, hedge=True)
+
+    user, businesses, bookings = await asyncio.gather(
+        user_task,
+        guarded("db.ib_businesses", lambda: run_blocking(_query_businesses, registration_id), timeout=DB_CALL_TIMEOUT, hedge=True),
+        load_bookings(),
+        return_exceptions=True,
+    )
+
+    ctx.registration_id = registration_id
+    if isinstance(user, dict):
+        details = user.get("details") or {}
+        ctx.user_id = str(user["id"])
+        ctx.organization_id = details.get("organization_id")
+        ctx.passenger_name = details.get("user_name") or f"{details.get('firstName', '')} {details.get('lastName', '')}".strip()
+        ctx.customer_email = details.get("email")
+        ctx.user_details = build_user_details(registration_id, user)
+    elif isinstance(user, Exception):
+        logger.warning("Could not resolve registration_id %s: %s", registration_id, user)
+
+    if isinstance(businesses, list):
+        for business in businesses:
+            try:
+                ctx.business_details = BusinessDetails(**(business.get("details") or {}))
+                break
+            except ValidationError:
+                continue
+    else:
+        logger.warning("Could not prefetch businesses for %s: %s", registration_id, businesses)
+
+    if isinstance(bookings, list):
+        ctx.customer_bookings = [build_customer_booking(booking) for booking in bookings]
+    else:
+        logger.warning("Could not prefetch bookings for %s: %s", registration_id, bookings)
+
+    return ctx
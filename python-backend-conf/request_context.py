@@ -0,0 +1,27 @@
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Identifiers of the request being served, visible to logging and tools on the same task
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+conversation_id_var: ContextVar[Optional[str]] = ContextVar("conversation_id", default=None)
+
+def new_request_id() -> str:
+    """Generate a short request ID."""
+    return uuid.uuid4().hex[:16]
+
+@contextmanager
+def bind_request(request_id: Optional[str] = None, conversation_id: Optional[str] = None):
+    """Bind request/conversation IDs for the duration of a request."""
+    request_token = request_id_var.set(request_id or new_request_id())
+    conversation_token = conversation_id_var.set(conversation_id)
+    try:
+        yield request_id_var.get()
+    finally:
+        conversation_id_var.reset(conversation_token)
+        request_id_var.reset(request_token)
+
+def bind_conversation(conversation_id: str) -> None:
+    """Attach the conversation ID once it is known (within an active bind_request)."""
+    conversation_id_var.set(conversation_id)
@@ -0,0 +1,321 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from memory_monitor import register_cache
+from tool_output import COMPACT, output_mode
+
+try:
+    import httpx
+except ImportError:  # Only needed to recognise its transport errors
+    httpx = None
+try:
+    import openai
+except ImportError:
+    openai = None
+
+logger = logging.getLogger(__name__)
+
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "20"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "15"))
+DB_CALL_TIMEOUT = float(os.getenv("DB_CALL_TIMEOUT_SECONDS", "3"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "0.5"))
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because its circuit breaker is open."""
+
+class BudgetExhaustedError(asyncio.TimeoutError):
+    """Raised when the request budget has no time left for another call."""
+
+# Failures that say the dependency is slow or down, as opposed to a bad request
+TRANSIENT_ERRORS: tuple = (asyncio.TimeoutError, TimeoutError, ConnectionError)
+if httpx is not None:
+    TRANSIENT_ERRORS += (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+if openai is not None:
+    TRANSIENT_ERRORS += (openai.APIConnectionError,)  # Includes APITimeoutError
+
+def is_transient(error: BaseException) -> bool:
+    """Timeouts, connection errors and 5xx responses; these trip breakers and earn fallbacks."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+# -- request budget ----------------------------------------------------------
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+@contextmanager
+def request_budget(seconds: float = REQUEST_BUDGET_SECONDS):
+    """Give the enclosed request an overall deadline that per-call timeouts are carved from."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request budget, or None outside a request."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def call_timeout(cap: Optional[float]) -> Optional[float]:
+    """Timeout for one call: the smaller of cap and what is left of the request budget."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return cap
+    if remaining <= 0:
+        raise BudgetExhaustedError("Request budget exhausted")
+    return remaining if cap is None else min(cap, remaining)
+
+# -- latency tracking and circuit breakers -----------------------------------
+
+class LatencyTracker:
+    """Rolling window of call latencies."""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+class CircuitBreaker:
+    """Consecutive-failure breaker; calls slower than slow_call_seconds count as failures.
+
+    Once reset_seconds have passed an open breaker goes half-open and lets a
+    single probe call through; its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        slow_call_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.latency = LatencyTracker()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker goes half-open (0 unless open)."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Closed breakers let calls through; half-open ones let one probe through at a time."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        now = time.monotonic()
+        # A probe whose outcome never arrived does not hold the breaker forever
+        if self.probe_started is not None and now - self.probe_started < self.reset_seconds:
+            return False
+        self.probe_started = now
+        return True
+
+    def release(self) -> None:
+        """End a call without an outcome (cancelled, or a non-transient error), freeing the probe slot."""
+        self.probe_started = None
+
+    def record_success(self, seconds: float) -> None:
+        self.latency.record(seconds)
+        if self.slow_call_seconds is not None and seconds > self.slow_call_seconds:
+            self.record_failure()
+            return
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_started = None
+        if self.state == "half_open" or (self.opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning("Circuit %s opened after %d failures", self.name, self.failures)
+            self.opened_at = time.monotonic()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Get or create the named breaker; kwargs only apply on creation."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+    return breaker
+
+def breaker_states() -> Dict[str, str]:
+    return {name: breaker.state for name, breaker in _breakers.items()}
+
+# -- guarded calls -----------------------------------------------------------
+
+async def _hedged(call: Callable[[], Awaitable[Any]], delay: float) -> Any:
+    """Run call; if it has not finished after delay, race a second attempt against it."""
+    first = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+    second = asyncio.ensure_future(call())
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # Both attempts failed; surface the primary's error
+        return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def guarded(
+    name: str,
+    call: Callable[[], Awaitable[Any]],
+    timeout: Optional[float] = None,
+    hedge: bool = False,
+    fallback: Optional[Callable[[], Any]] = None,
+    **breaker_kwargs,
+) -> Any:
+    """Run call() behind the named circuit breaker with a budget-derived deadline.
+
+    hedge=True is only for idempotent reads: a duplicate attempt is started once
+    the first exceeds the observed p95 latency. If the breaker is open, the
+    request budget is spent, or the call fails transiently (is_transient),
+    fallback() is returned when given; otherwise the error propagates. Other
+    errors propagate without counting against the breaker.
+    """
+    breaker = get_breaker(name, **breaker_kwargs)
+    if not breaker.allow():
+        if fallback is not None:
+            logger.info("Circuit %s open; serving fallback", name)
+            return fallback()
+        raise CircuitOpenError(f"Circuit {name} is open")
+
+    started = time.monotonic()
+    try:
+        deadline = call_timeout(timeout)
+        if hedge:
+            p95 = breaker.latency.percentile(0.95) if len(breaker.latency.samples) >= HEDGE_MIN_SAMPLES else None
+            awaitable = _hedged(call, p95 or HEDGE_DEFAULT_DELAY)
+        else:
+            awaitable = call()
+        result = await asyncio.wait_for(awaitable, timeout=deadline)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except BudgetExhaustedError:
+        breaker.release()  # Out of time before calling; says nothing about the dependency
+        if fallback is not None:
+            logger.warning("Request budget spent before %s; serving fallback", name)
+            return fallback()
+        raise
+    except Exception as e:
+        if not is_transient(e):
+            breaker.release()
+            raise
+        breaker.record_failure()
+        if fallback is not None:
+            logger.warning("Call %s failed (%s); serving fallback", name, type(e).__name__)
+            return fallback()
+        raise
+    breaker.record_success(time.monotonic() - started)
+    return result
+
+# -- last known good results -------------------------------------------------
+
+LAST_GOOD_MAX_ENTRIES = 512
+_last_good: Dict[str, Any] = {}
+# Sync tools settle on tool-pool threads (offload_blocking wraps serve_last_good)
+_last_good_lock = threading.Lock()
+register_cache("last_good_results", lambda: _last_good)
+
+def _last_good_key(base_key: str, extras: Dict[str, Any]) -> str:
+    return base_key if not extras else f"{base_key}:{json.dumps(extras, sort_keys=True, default=str)}"
+
+def recall(name: str, **extras: Any) -> Any:
+    """Last successful result recorded under name for these arguments (default: none), or None."""
+    with _last_good_lock:
+        return _last_good.get(_last_good_key(name, extras))
+
+def forget_last_good(*names: str) -> int:
+    """Drop the remembered results of the named tools, for every argument set."""
+    with _last_good_lock:
+        stale = [key for key in _last_good if key.split(":", 1)[0] in names]
+        for key in stale:
+            del _last_good[key]
+    return len(stale)
+
+def serve_last_good(name: Optional[str] = None):
+    """Remember a tool's last successful result per argument set and return it instead of an error string."""
+    def decorator(func):
+        base_key = name or func.__name__
+        sig = inspect.signature(func)
+
+        def _key(args: tuple, kwargs: dict) -> str:
+            arguments = sig.bind_partial(*args, **kwargs).arguments
+            extras = {k: v for k, v in arguments.items() if k != "context" and v is not None}
+            if output_mode() == COMPACT:
+                extras["output_mode"] = COMPACT
+            return _last_good_key(base_key, extras)
+
+        def _settle(key: str, result):
+            if isinstance(result, str) and result.startswith("Error"):
+                with _last_good_lock:
+                    stale = _last_good.get(key)
+                if stale is not None:
+                    logger.warning("Serving last good %s result after error", key)
+                    return stale
+                return result
+            with _last_good_lock:
+                _last_good.pop(key, None)
+                _last_good[key] = result
+                if len(_last_good) > LAST_GOOD_MAX_ENTRIES:
+                    _last_good.pop(next(iter(_last_good)))
+            return result
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return _settle(_key(args, kwargs), await func(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            return _settle(_key(args, kwargs), func(*args, **kwargs))
+        return sync_wrapper
+    return decorator
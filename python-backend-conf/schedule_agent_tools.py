@@ -1,108 +1,369 @@
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
 import logging
 from context import AirlineAgentContext
-from database import db_client
 from agents import function_tool
+from tool_memo import memoize_tool
+from resilience import serve_last_good
+from tool_executor import offload_blocking
+from schedule_queries import fetch_session_page, fetch_facet_page, FACETS, InvalidCursor
+from schedule_store import SCHEDULE_STORE
+from session_search import SESSION_INDEX
+from schedule_timeline import SCHEDULE_TIMELINE, conference_now, parse_date, parse_time
+from keyword_matcher import KeywordMatcher
+from prefetch import register_prefetch, take
+from tool_output import is_compact, table
 
 logger = logging.getLogger(__name__)
 
+SESSIONS_PAGE_SIZE = 5
+SEARCH_RESULT_LIMIT = 10
+FACET_PAGE_SIZE = 20
+ALTERNATIVES_PER_CONFLICT = 3
+
+# Keep the in-memory indexes in step with the schedule snapshot
+SCHEDULE_STORE.subscribe(SESSION_INDEX.apply_changes)
+SCHEDULE_STORE.subscribe(SCHEDULE_TIMELINE.apply_changes)
+
+# Compact session rows carry the id so sessions can be added to the agenda
+SESSION_COLUMNS = ("id", "topic", "speaker", "date", "time", "room")
+SEARCH_COLUMNS = ("id", "topic", "speaker", "track", "date", "time", "room")
+
+def _session_row(session: Dict[str, Any]) -> List[Any]:
+    return [session.get("id"), session.get("topic"), session.get("speaker_name"), session.get("conference_date"),
+            session.get("start_time"), session.get("conference_room_name")]
+
+def _next_page_hint(next_cursor: Optional[str], noun: str) -> str:
+    if not next_cursor:
+        return ""
+    return f"\nMore {noun} available. To see the next page, call again with cursor=\"{next_cursor}\"."
+
+def _format_sessions(sessions: List[Dict[str, Any]], next_cursor: Optional[str] = None) -> str:
+    if is_compact():
+        return table(SESSION_COLUMNS, map(_session_row, sessions), more=next_cursor)
+    result = f"**Aviation Tech Summit 2025 Sessions** ({len(sessions)} shown):\n\n"
+    for i, session in enumerate(sessions, 1):
+        result += (
+            f"**{i}. {session.get('topic', 'TBA')}**\n"
+            f"   👤 Speaker: {session.get('speaker_name', 'TBA')}\n"
+            f"   📅 Date: {session.get('conference_date', 'TBA')}\n"
+            f"   🕐 Time: {session.get('start_time', 'TBA')}\n"
+            f"   📍 Room: {session.get('conference_room_name', 'TBA')}\n\n"
+        )
+    return result + _next_page_hint(next_cursor, "sessions")
+
 @function_tool(
     name_override="get_conference_sessions",
-    description_override="Get conference sessions"
+    description_override="Get conference sessions in schedule order. Pass the returned cursor to get the next page."
 )
-def get_conference_sessions(context: AirlineAgentContext) -> str:
-    """Fetch conference sessions."""
+@memoize_tool()
+@offload_blocking()
+@serve_last_good()
+def get_conference_sessions(context: AirlineAgentContext, cursor: Optional[str] = None) -> str:
+    """Fetch one page of conference sessions."""
     try:
-        # Use synchronous query - remove await
-        sessions = db_client.table("conference_schedules").select("*").limit(5).execute()
+        page = fetch_session_page(cursor=cursor, limit=SESSIONS_PAGE_SIZE)
         
-        if not sessions.data:
+        if not page.items:
             return "No conference sessions found."
         
-        result = f"**Aviation Tech Summit 2025 Sessions** ({len(sessions.data)} found):\n\n"
-        for i, session in enumerate(sessions.data, 1):
-            result += (
-                f"**{i}. {session.get('topic', 'TBA')}**\n"
-                f"   👤 Speaker: {session.get('speaker_name', 'TBA')}\n"
-                f"   📅 Date: {session.get('conference_date', 'TBA')}\n"
-                f"   🕐 Time: {session.get('start_time', 'TBA')}\n"
-                f"   📍 Room: {session.get('conference_room_name', 'TBA')}\n\n"
-            )
+        result = _format_sessions(page.items, page.next_cursor)
         
-        logger.info(f"✅ Found {len(sessions.data)} conference sessions")
+        logger.info("✅ Found %s conference sessions", len(page.items))
         return result
+    except InvalidCursor:
+        return "That page cursor is not valid. Call again without a cursor to start from the first page."
     except Exception as e:
-        logger.error(f"❌ Error fetching conference sessions: {e}", exc_info=True)
+        logger.error("❌ Error fetching conference sessions: %s", e, exc_info=True)
         return "Error fetching conference sessions. Please try again."
 
+def _format_facet(facet: str, title: str, noun: str, items: List[Dict[str, Any]], next_cursor: Optional[str]) -> str:
+    column = FACETS[facet][1]
+    if is_compact():
+        return table((facet[:-1], "sessions"), ((item[column], item["session_count"]) for item in items), more=next_cursor)
+    result = f"**Aviation Tech Summit 2025 {title}** ({len(items)} shown):\n\n"
+    for i, item in enumerate(items, 1):
+        result += f"{i}. {item[column]} ({item['session_count']} sessions)\n"
+    return result + _next_page_hint(next_cursor, noun)
+
+def _facet_listing(facet: str, title: str, noun: str, cursor: Optional[str]) -> str:
+    """Format one page of a speakers/tracks/rooms facet with session counts."""
+    page = fetch_facet_page(facet, cursor=cursor, limit=FACET_PAGE_SIZE)
+    if not page.items:
+        return f"No {noun} found."
+    return _format_facet(facet, title, noun, page.items, page.next_cursor)
+
 @function_tool(
     name_override="get_all_speakers",
-    description_override="Get all speakers"
+    description_override="Get speakers with their session counts. Pass the returned cursor to get the next page."
 )
-def get_all_speakers(context: AirlineAgentContext) -> str:
-    """Get all unique speakers."""
+@memoize_tool()
+@offload_blocking()
+@serve_last_good()
+def get_all_speakers(context: AirlineAgentContext, cursor: Optional[str] = None) -> str:
+    """Get one page of unique speakers."""
     try:
-        speakers = db_client.table("conference_schedules").select("speaker_name").execute()
-        
-        if not speakers.data:
-            return "No speakers found."
-        
-        unique_speakers = sorted(set(item["speaker_name"] for item in speakers.data if item.get("speaker_name")))
-        
-        result = f"**Aviation Tech Summit 2025 Speakers** ({len(unique_speakers)} total):\n\n"
-        for i, speaker in enumerate(unique_speakers[:10], 1):
-            result += f"{i}. {speaker}\n"
-        
-        if len(unique_speakers) > 10:
-            result += f"\n...and {len(unique_speakers) - 10} more speakers."
-        
-        return result
+        return _facet_listing("speakers", "Speakers", "speakers", cursor)
+    except InvalidCursor:
+        return "That page cursor is not valid. Call again without a cursor to start from the first page."
     except Exception as e:
-        logger.error(f"❌ Error fetching speakers: {e}", exc_info=True)
+        logger.error("❌ Error fetching speakers: %s", e, exc_info=True)
         return "Error fetching speakers. Please try again."
 
 @function_tool(
     name_override="get_all_tracks",
-    description_override="Get all tracks"
+    description_override="Get tracks with their session counts. Pass the returned cursor to get the next page."
 )
-def get_all_tracks(context: AirlineAgentContext) -> str:
-    """Get all unique tracks."""
+@memoize_tool()
+@offload_blocking()
+@serve_last_good()
+def get_all_tracks(context: AirlineAgentContext, cursor: Optional[str] = None) -> str:
+    """Get one page of unique tracks."""
     try:
-        tracks = db_client.table("conference_schedules").select("track_name").execute()
-        
-        if not tracks.data:
-            return "No tracks found."
-        
-        unique_tracks = sorted(set(item["track_name"] for item in tracks.data if item.get("track_name")))
-        
-        result = f"**Aviation Tech Summit 2025 Tracks** ({len(unique_tracks)} total):\n\n"
-        for i, track in enumerate(unique_tracks, 1):
-            result += f"{i}. {track}\n"
-        
-        return result
+        return _facet_listing("tracks", "Tracks", "tracks", cursor)
+    except InvalidCursor:
+        return "That page cursor is not valid. Call again without a cursor to start from the first page."
     except Exception as e:
-        logger.error(f"❌ Error fetching tracks: {e}", exc_info=True)
+        logger.error("❌ Error fetching tracks: %s", e, exc_info=True)
         return "Error fetching tracks. Please try again."
 
 @function_tool(
     name_override="get_all_rooms",
-    description_override="Get all rooms"
+    description_override="Get rooms with their session counts. Pass the returned cursor to get the next page."
 )
-def get_all_rooms(context: AirlineAgentContext) -> str:
-    """Get all unique rooms."""
+@memoize_tool()
+@offload_blocking()
+@serve_last_good()
+def get_all_rooms(context: AirlineAgentContext, cursor: Optional[str] = None) -> str:
+    """Get one page of unique rooms."""
     try:
-        rooms = db_client.table("conference_schedules").select("conference_room_name").execute()
-        
-        if not rooms.data:
-            return "No rooms found."
-        
-        unique_rooms = sorted(set(item["conference_room_name"] for item in rooms.data if item.get("conference_room_name")))
-        
-        result = f"**Aviation Tech Summit 2025 Rooms** ({len(unique_rooms)} total):\n\n"
-        for i, room in enumerate(unique_rooms, 1):
-            result += f"{i}. {room}\n"
-        
-        return result
+        return _facet_listing("rooms", "Rooms", "rooms", cursor)
+    except InvalidCursor:
+        return "That page cursor is not valid. Call again without a cursor to start from the first page."
     except Exception as e:
-        logger.error(f"❌ Error fetching rooms: {e}", exc_info=True)
-        return "Error fetching rooms. Please try again."
\ No newline at end of file
+        logger.error("❌ Error fetching rooms: %s", e, exc_info=True)
+        return "Error fetching rooms. Please try again."
+
+async def _load_schedule() -> bool:
+    """Refresh the schedule snapshot; False only if there is no snapshot to fall back on."""
+    try:
+        await SCHEDULE_STORE.ensure_fresh()
+    except Exception as e:
+        if not SCHEDULE_STORE.rows:
+            logger.error("❌ Error loading conference schedule: %s", e, exc_info=True)
+            return False
+        logger.warning("Schedule refresh failed, using the previous snapshot: %s", e)
+    return True
+
+_speaker_matcher: Tuple[int, Optional[KeywordMatcher]] = (-1, None)
+
+def extract_speakers(message: str) -> List[str]:
+    """Speakers of the loaded schedule named in the message, by full name or unambiguous surname."""
+    global _speaker_matcher
+    version, matcher = _speaker_matcher
+    if matcher is None or version != SCHEDULE_STORE.version:
+        names = {str(row.get("speaker_name") or "").strip().lower() for row in SCHEDULE_STORE.rows.values()}
+        names.discard("")
+        surnames: Dict[str, List[str]] = {}
+        for name in names:
+            if " " in name and len(name.rsplit(" ", 1)[1]) >= 4:
+                surnames.setdefault(name.rsplit(" ", 1)[1], []).append(name)
+        aliases = {name: [name] for name in names}
+        for surname, owners in surnames.items():
+            if len(owners) == 1 and surname not in names:
+                aliases[owners[0]].append(surname)
+        matcher = KeywordMatcher(aliases) if aliases else None
+        _speaker_matcher = (SCHEDULE_STORE.version, matcher)
+    if matcher is None:
+        return []
+    return list(dict.fromkeys(hit.category for hit in matcher.match(message).hits))
+
+async def _speaker_sessions(speaker: str) -> List[Any]:
+    if not await _load_schedule():
+        raise RuntimeError("conference schedule unavailable")
+    return SESSION_INDEX.search(speaker, limit=SEARCH_RESULT_LIMIT)
+
+register_prefetch("speaker_sessions", "search_sessions", extract_speakers, _speaker_sessions, normalize=str.lower)
+
+def _session_line(session: Dict[str, Any]) -> str:
+    return (
+        f"**{session.get('topic', 'TBA')}** (#{session.get('id')}) — 👤 {session.get('speaker_name', 'TBA')}, "
+        f"📅 {session.get('conference_date', 'TBA')} 🕐 {session.get('start_time', 'TBA')}, "
+        f"📍 {session.get('conference_room_name', 'TBA')}"
+    )
+
+def _format_search(query: str, hits: List[Any]) -> str:
+    if is_compact():
+        return table(SEARCH_COLUMNS, ([s.get("id"), s.get("topic"), s.get("speaker_name"), s.get("track_name"), s.get("conference_date"),
+                                       s.get("start_time"), s.get("conference_room_name")] for s in (hit.session for hit in hits)))
+    result = f"**Sessions matching \"{query}\"** ({len(hits)} shown):\n\n"
+    for i, hit in enumerate(hits, 1):
+        session = hit.session
+        result += (
+            f"**{i}. {session.get('topic', 'TBA')}** (#{session.get('id')})\n"
+            f"   👤 Speaker: {session.get('speaker_name', 'TBA')}\n"
+            f"   🏷️ Track: {session.get('track_name', 'TBA')}\n"
+            f"   📅 Date: {session.get('conference_date', 'TBA')}\n"
+            f"   🕐 Time: {session.get('start_time', 'TBA')}\n"
+            f"   📍 Room: {session.get('conference_room_name', 'TBA')}\n\n"
+        )
+    return result
+
+@function_tool(
+    name_override="search_sessions",
+    description_override="Search conference sessions by topic, speaker, track or room keywords, optionally filtered by date (YYYY-MM-DD), room or track."
+)
+@memoize_tool()
+async def search_sessions(
+    context: AirlineAgentContext,
+    query: str,
+    date: Optional[str] = None,
+    room: Optional[str] = None,
+    track: Optional[str] = None,
+    limit: int = SESSIONS_PAGE_SIZE,
+) -> str:
+    """Rank sessions against the in-memory schedule index."""
+    limit = max(1, min(limit, SEARCH_RESULT_LIMIT))
+    found, hits = await take("speaker_sessions", query) if not (date or room or track) else (False, None)
+    if found:
+        hits = hits[:limit]
+    else:
+        if not await _load_schedule():
+            return "Error searching conference sessions. Please try again."
+        hits = SESSION_INDEX.search(query, limit=limit, conference_date=date, conference_room_name=room, track_name=track)
+    if not hits:
+        return f"No conference sessions match \"{query}\"."
+
+    logger.info("✅ Session search returned %s results", len(hits))
+    return _format_search(query, hits)
+
+@function_tool(
+    name_override="whats_on",
+    description_override="Sessions running now and starting next, optionally in one room. Pass at (YYYY-MM-DD HH:MM) to ask about another time."
+)
+async def whats_on(context: AirlineAgentContext, room: Optional[str] = None, at: Optional[str] = None) -> str:
+    """Current and upcoming sessions from the schedule time index."""
+    if not await _load_schedule():
+        return "Error fetching the conference schedule. Please try again."
+    if at:
+        day, clock = parse_date(at[:10]), parse_time(at[10:].strip() or "00:00")
+        if day is None or clock is None:
+            return "Please give the time as YYYY-MM-DD HH:MM."
+        moment = datetime.combine(day, clock)
+    else:
+        moment = conference_now()
+
+    where = f" in {room}" if room else ""
+    current = SCHEDULE_TIMELINE.happening_at(moment, room=room)
+    upcoming = SCHEDULE_TIMELINE.next_sessions(moment + timedelta(minutes=1), room=room, limit=SESSIONS_PAGE_SIZE)
+    if is_compact():
+        return table(("when",) + SESSION_COLUMNS,
+                     [["now"] + _session_row(s) for s in current[:SEARCH_RESULT_LIMIT]] + [["next"] + _session_row(s) for s in upcoming])
+    result = f"**On now{where}** ({moment:%Y-%m-%d %H:%M}):\n"
+    result += "".join(f"- {_session_line(s)}\n" for s in current[:SEARCH_RESULT_LIMIT]) or "- Nothing is running.\n"
+    result += f"\n**Up next{where}:**\n"
+    result += "".join(f"- {_session_line(s)}\n" for s in upcoming) or "- No more sessions scheduled.\n"
+    return result
+
+@function_tool(
+    name_override="find_free_slots",
+    description_override="Free time between two times on a date (YYYY-MM-DD, HH:MM). With a room, gaps in that room's schedule; otherwise gaps in the attendee's agenda."
+)
+async def find_free_slots(
+    context: AirlineAgentContext,
+    date: str,
+    start_time: str,
+    end_time: str,
+    room: Optional[str] = None,
+) -> str:
+    """Gaps in a room's schedule or in the attendee's agenda."""
+    if not await _load_schedule():
+        return "Error fetching the conference schedule. Please try again."
+    day, start, end = parse_date(date), parse_time(start_time), parse_time(end_time)
+    if day is None or start is None or end is None or end <= start:
+        return "Please give a date as YYYY-MM-DD and a start time before the end time (HH:MM)."
+
+    agenda = None if room else context.agenda_session_ids
+    slots = SCHEDULE_TIMELINE.free_slots(datetime.combine(day, start), datetime.combine(day, end), room=room, agenda=agenda)
+    whose = f"{room}" if room else "your agenda"
+    if not slots:
+        return f"No free slots in {whose} between {start:%H:%M} and {end:%H:%M} on {day}."
+    if is_compact():
+        return table(("start", "end"), ((f"{slot.start:%H:%M}", f"{slot.end:%H:%M}") for slot in slots))
+    return f"**Free in {whose} on {day}:**\n" + "".join(f"- {slot.start:%H:%M} – {slot.end:%H:%M}\n" for slot in slots)
+
+def _compact_agenda_report(conflicts: List[Any], agenda: List[int], listed: Iterable[int]) -> str:
+    """Conflicts as id rows, followed by the sessions they mention that are not listed already."""
+    rows, mentioned = [], {}
+    for conflict in conflicts:
+        alternatives = SCHEDULE_TIMELINE.alternatives(conflict.second["id"], agenda, limit=ALTERNATIVES_PER_CONFLICT)
+        rows.append((conflict.first["id"], conflict.second["id"], [a["id"] for a in alternatives]))
+        for session in [conflict.first, conflict.second] + alternatives:
+            mentioned.setdefault(session["id"], session)
+    shown = set(listed)
+    extra = [session for session_id, session in mentioned.items() if session_id not in shown]
+    result = table(("session", "overlaps", "alternatives"), rows)
+    return result + ("\n\n" + table(SESSION_COLUMNS, map(_session_row, extra)) if extra else "")
+
+def _agenda_report(agenda: List[int], listed: Iterable[int] = ()) -> str:
+    """Agenda conflicts with same-track alternatives that fit around the rest of the agenda."""
+    conflicts = SCHEDULE_TIMELINE.agenda_conflicts(agenda)
+    if not conflicts:
+        return "No conflicts." if is_compact() else "✅ No conflicts in your agenda."
+    if is_compact():
+        return _compact_agenda_report(conflicts, agenda, listed)
+    result = f"⚠️ {len(conflicts)} conflict(s):\n"
+    for conflict in conflicts:
+        result += f"- {_session_line(conflict.first)}\n  overlaps {_session_line(conflict.second)}\n"
+        alternatives = SCHEDULE_TIMELINE.alternatives(conflict.second["id"], agenda, limit=ALTERNATIVES_PER_CONFLICT)
+        for alternative in alternatives:
+            result += f"  ↪ Alternative: {_session_line(alternative)}\n"
+    return result
+
+@function_tool(
+    name_override="add_to_agenda",
+    description_override="Bookmark a session (by its # id) in the attendee's agenda and report any time conflicts with alternatives."
+)
+async def add_to_agenda(context: AirlineAgentContext, session_id: int) -> str:
+    """Add a session to the personal agenda."""
+    if not await _load_schedule():
+        return "Error fetching the conference schedule. Please try again."
+    session = SCHEDULE_TIMELINE.sessions.get(session_id)
+    if session is None:
+        return f"No session with id {session_id} on the schedule."
+    agenda = context.agenda_session_ids
+    if session_id not in agenda:
+        agenda.append(session_id)
+    if is_compact():
+        return f"Added session {session_id}.\n\n" + _agenda_report(agenda)
+    return f"Added {_session_line(session)} to your agenda.\n\n" + _agenda_report(agenda)
+
+@function_tool(
+    name_override="remove_from_agenda",
+    description_override="Remove a session (by its # id) from the attendee's agenda."
+)
+async def remove_from_agenda(context: AirlineAgentContext, session_id: int) -> str:
+    """Remove a session from the personal agenda."""
+    agenda = context.agenda_session_ids
+    if session_id not in agenda:
+        return f"Session {session_id} is not in your agenda."
+    agenda.remove(session_id)
+    return f"Removed session {session_id} from your agenda."
+
+@function_tool(
+    name_override="review_agenda",
+    description_override="Show the attendee's agenda in time order with conflicts and non-overlapping alternatives."
+)
+async def review_agenda(context: AirlineAgentContext) -> str:
+    """List the personal agenda and its conflicts."""
+    if not await _load_schedule():
+        return "Error fetching the conference schedule. Please try again."
+    agenda = context.agenda_session_ids
+    sessions = [SCHEDULE_TIMELINE.sessions[sid] for sid in agenda if sid in SCHEDULE_TIMELINE.sessions]
+    if not sessions:
+        return "Your agenda is empty. Search for sessions and add them by id."
+    sessions.sort(key=lambda s: SCHEDULE_TIMELINE.spans[s["id"]])
+    if is_compact():
+        return table(SESSION_COLUMNS, map(_session_row, sessions)) + "\n\n" + _agenda_report(agenda, listed=agenda)
+    result = f"**Your agenda** ({len(sessions)} sessions):\n" + "".join(f"- {_session_line(s)}\n" for s in sessions)
+    return result + "\n" + _agenda_report(agenda)
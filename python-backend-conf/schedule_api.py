@@ -0,0 +1,234 @@
+import asyncio
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from cache_utils import LRUCache
+from memory_monitor import register_cache
+from schedule_queries import FACETS, SESSION_ORDER, InvalidCursor, decode_cursor, encode_cursor
+from schedule_store import SCHEDULE_STORE
+from tool_executor import run_blocking
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CACHE_CONTROL = os.getenv("SCHEDULE_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+MIN_COMPRESS_BYTES = 1024
+MAX_PAGE_SIZE = 200
+SESSION_FILTERS = ("conference_date", "track_name", "conference_room_name", "speaker_name")
+
+# Encoded bodies keyed by (snapshot fingerprint, path, query, encoding)
+_bodies = LRUCache(maxsize=int(os.getenv("SCHEDULE_RESPONSE_CACHE_SIZE", "512")))
+register_cache("schedule_responses", lambda: _bodies._data)
+
+def _nulls_last(value: Any) -> Tuple[bool, str]:
+    return value is None, "" if value is None else str(value)
+
+def _sort_key(session: Dict[str, Any]) -> Tuple[Tuple[bool, str], Tuple[bool, str], Any]:
+    """(date, start time, id), with nulls last as in the database and the schedule tools."""
+    return _nulls_last(session.get("conference_date")), _nulls_last(session.get("start_time")), session.get("id")
+
+def _cursor_key(view: "ScheduleView", cursor: str) -> Tuple[Tuple[bool, str], Tuple[bool, str], Any]:
+    """The sort key a session cursor resumes after; InvalidCursor unless its values can be compared."""
+    last = decode_cursor(cursor)
+    date, start, session_id = (last.get(c) for c in SESSION_ORDER)
+    id_type = type(view.keys[0][2]) if view.keys else int
+    if not all(v is None or isinstance(v, str) for v in (date, start)) or type(session_id) is not id_type:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return _nulls_last(date), _nulls_last(start), session_id
+
+class ScheduleView:
+    """Sorted sessions, per-filter lists and facet counts for one snapshot version."""
+
+    def __init__(self, rows: Dict[Any, Dict[str, Any]]):
+        self.sessions = sorted(rows.values(), key=_sort_key)
+        self.keys = [_sort_key(session) for session in self.sessions]
+        self.by_value: Dict[str, Dict[str, List[int]]] = {field: defaultdict(list) for field in SESSION_FILTERS}
+        for position, session in enumerate(self.sessions):
+            for field in SESSION_FILTERS:
+                self.by_value[field][str(session.get(field) or "").lower()].append(position)
+        self.facets: Dict[str, List[Dict[str, Any]]] = {}
+        for facet, (_, column) in FACETS.items():
+            counts = Counter(session.get(column) for session in self.sessions if session.get(column))
+            self.facets[facet] = [{column: value, "session_count": count} for value, count in sorted(counts.items())]
+        # Content hash, so every instance serving the same data hands out the same ETags
+        digest = hashlib.sha256()
+        for session in self.sessions:
+            digest.update(json.dumps(session, sort_keys=True, default=str).encode())
+        self.fingerprint = digest.hexdigest()[:16]
+
+_view: Tuple[int, Optional[ScheduleView]] = (-1, None)
+_view_lock: Optional[asyncio.Lock] = None
+
+async def current_view() -> ScheduleView:
+    """The view for the current snapshot, rebuilt off the event loop only when the schedule version changes."""
+    global _view, _view_lock
+    try:
+        await SCHEDULE_STORE.ensure_fresh()
+    except Exception as e:
+        if not SCHEDULE_STORE.rows:
+            logger.error("❌ Error loading conference schedule: %s", e, exc_info=True)
+            raise HTTPException(status_code=503, detail="Schedule unavailable")
+        logger.warning("Schedule refresh failed, serving the previous snapshot: %s", e)
+    if _view[1] is not None and _view[0] == SCHEDULE_STORE.version:
+        return _view[1]
+    if _view_lock is None:
+        _view_lock = asyncio.Lock()
+    async with _view_lock:
+        version = SCHEDULE_STORE.version
+        if _view[1] is None or _view[0] != version:
+            # Copy on the loop so the feed can keep applying changes while the worker sorts and hashes
+            _view = (version, await run_blocking(ScheduleView, dict(SCHEDULE_STORE.rows)))
+        return _view[1]
+
+def session_page(view: ScheduleView, filters: Dict[str, Optional[str]], cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    """One keyset page of sessions, with the same cursor format as the schedule tools."""
+    start_key = _cursor_key(view, cursor) if cursor else None
+    active = [(field, value.lower()) for field, value in filters.items() if value]
+    if active:
+        # Walk the shortest matching list and check the other filters per row
+        field, value = min(active, key=lambda item: len(view.by_value[item[0]].get(item[1], ())))
+        positions = view.by_value[field].get(value, [])
+        others = [item for item in active if item != (field, value)]
+        if start_key is not None:
+            positions = positions[bisect.bisect_right([view.keys[p] for p in positions], start_key):]
+        matches = (view.sessions[p] for p in positions)
+        matches = (s for s in matches if all(str(s.get(f) or "").lower() == v for f, v in others))
+    else:
+        begin = bisect.bisect_right(view.keys, start_key) if start_key is not None else 0
+        matches = iter(view.sessions[begin:begin + limit + 1])
+    items = []
+    for session in matches:
+        items.append(session)
+        if len(items) > limit:
+            break
+    if len(items) <= limit:
+        return {"items": items, "next_cursor": None}
+    items = items[:limit]
+    return {"items": items, "next_cursor": encode_cursor({c: items[-1].get(c) for c in SESSION_ORDER})}
+
+def facet_page(view: ScheduleView, facet: str, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    column = FACETS[facet][1]
+    entries = view.facets[facet]
+    begin = 0
+    if cursor:
+        after = decode_cursor(cursor).get(column)
+        if not isinstance(after, str):
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+        begin = bisect.bisect_right([entry[column] for entry in entries], after)
+    items = entries[begin:begin + limit]
+    more = begin + limit < len(entries)
+    return {"items": items, "next_cursor": encode_cursor({column: items[-1][column]}) if more and items else None}
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported content coding the client accepts (ignores anything with q=0)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def _compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+def _matches(if_none_match: Optional[str], base_tag: str) -> bool:
+    """Weak comparison, as If-None-Match requires; the encoding suffix is ignored."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        candidate = candidate.removeprefix("W/").strip('"')
+        for suffix in ("-br", "-gzip"):
+            candidate = candidate.removesuffix(suffix)
+        if candidate == base_tag:
+            return True
+    return False
+
+async def cached_json(request: Request, build) -> Response:
+    """Serve build(view) as JSON with a strong ETag, 304s, Cache-Control and compression."""
+    view = await current_view()
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    base_tag = f"{view.fingerprint}-{hashlib.sha1(f'{request.url.path}?{query}'.encode()).hexdigest()[:12]}"
+    headers = {"Cache-Control": SCHEDULE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    cache_key = (base_tag, encoding)
+    cached = _bodies.get(cache_key)
+    if cached is None:
+        # Built even for a 304, so its ETag carries the same encoding decision as the 200
+        body = json.dumps(build(view), separators=(",", ":"), default=str).encode()
+        if len(body) < MIN_COMPRESS_BYTES:
+            encoding = None
+        cached = (_compress(body, encoding), encoding)
+        _bodies.set(cache_key, cached)
+    body, encoding = cached
+    headers["ETag"] = f'"{base_tag}-{encoding}"' if encoding else f'"{base_tag}"'
+    if _matches(request.headers.get("if-none-match"), base_tag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+router = APIRouter(prefix="/schedule", tags=["schedule"])
+
+@router.get("/sessions")
+async def list_sessions(
+    request: Request,
+    date: Optional[str] = None,
+    track: Optional[str] = None,
+    room: Optional[str] = None,
+    speaker: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Sessions in (date, start time, id) order; pass next_cursor back to page."""
+    filters = {"conference_date": date, "track_name": track, "conference_room_name": room, "speaker_name": speaker}
+    try:
+        return await cached_json(request, lambda view: session_page(view, filters, cursor, limit))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _facet(request: Request, facet: str, cursor: Optional[str], limit: int) -> Response:
+    try:
+        return await cached_json(request, lambda view: facet_page(view, facet, cursor, limit))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/speakers")
+async def list_speakers(request: Request, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)):
+    """Speakers with their session counts, by name."""
+    return await _facet(request, "speakers", cursor, limit)
+
+@router.get("/tracks")
+async def list_tracks(request: Request, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)):
+    """Tracks with their session counts, by name."""
+    return await _facet(request, "tracks", cursor, limit)
+
+@router.get("/rooms")
+async def list_rooms(request: Request, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)):
+    """Rooms with their session counts, by name."""
+    return await _facet(request, "rooms", cursor, limit)
@@ -0,0 +1,140 @@
+"""Stream a conference agenda export into conference_schedules.
+
+Usage: python schedule_ingest.py agenda.csv [--batch-size 500] [--concurrency 4] [--dry-run]
+                                 [--rejects rejects.jsonl] [--notify-url http://localhost:8000]
+
+Accepts CSV, a JSON array or JSON lines. Rows are validated and normalized in
+batches and upserted on (conference_date, start_time, conference_room_name),
+see sql/schedule_ingest.sql. --notify-url asks a running server to drop its
+schedule caches afterwards (needs ADMIN_TOKEN).
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import date, time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, TypeAdapter, field_validator, model_validator
+from semantic_mappings import get_canonical_key, get_canonical_value
+from schedule_timeline import parse_time
+from bulk_ingest import MalformedInput, format_report, notify_server, read_records, run_pipeline, IngestReport
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CONFLICT_COLUMNS = "conference_date,start_time,conference_room_name"
+CONFLICT_FIELDS = tuple(SCHEDULE_CONFLICT_COLUMNS.split(","))
+# Export headers seen in organizer files that KEY_MAPPINGS does not cover
+HEADER_ALIASES = {"date": "conference_date", "day": "conference_date", "time": "start_time", "start": "start_time",
+                  "title": "topic", "room_name": "conference_room_name"}
+NORMALIZED_FIELDS = ("speaker_name", "conference_room_name", "track_name")
+
+class ScheduleRecord(BaseModel):
+    id: Optional[int] = None
+    topic: str = Field(min_length=1)
+    speaker_name: str = Field(min_length=1)
+    conference_date: date
+    start_time: time
+    conference_room_name: str = Field(min_length=1)
+    track_name: Optional[str] = None
+
+    class Config:
+        extra = "ignore"  # Exports carry columns the table does not have
+        str_strip_whitespace = True
+
+    @model_validator(mode="before")
+    @classmethod
+    def canonical_headers(cls, data: Any) -> Any:
+        if not isinstance(data, dict):
+            return data
+        renamed = {}
+        for key, value in data.items():
+            if key is None:
+                continue  # Extra CSV cells without a header
+            name = str(key).strip().lower().replace(" ", "_")
+            name = HEADER_ALIASES.get(name, get_canonical_key(name))
+            renamed[name] = None if value == "" else value
+        return renamed
+
+    @field_validator("start_time", mode="before")
+    @classmethod
+    def clock_time(cls, value: Any) -> Any:
+        return parse_time(value) or value
+
+SCHEDULE_ADAPTER = TypeAdapter(List[ScheduleRecord])
+
+@lru_cache(maxsize=4096)
+def _canonical(field: str, value: str) -> str:
+    return get_canonical_value(field, value) or value
+
+def conflict_key(row: Dict[str, Any]) -> tuple:
+    """The upsert's conflict columns; Postgres rejects a batch that updates the same row twice."""
+    return tuple(row.get(field) for field in CONFLICT_FIELDS)
+
+def to_row(record: ScheduleRecord) -> Dict[str, Any]:
+    """Table row with speaker, room and track names normalized."""
+    row = record.model_dump(mode="json", exclude_none=True)
+    for field in NORMALIZED_FIELDS:
+        if row.get(field):
+            row[field] = _canonical(field, row[field])
+    return row
+
+async def upsert_sessions(rows: List[Dict[str, Any]]) -> int:
+    # Imported here so --dry-run works without database credentials
+    from database import db_client
+    from tool_executor import run_blocking
+
+    def _upsert() -> int:
+        result = db_client.table("conference_schedules").upsert(rows, on_conflict=SCHEDULE_CONFLICT_COLUMNS).execute()
+        return len(result.data or rows)
+    return await run_blocking(_upsert)
+
+async def ingest_schedule(
+    path: str,
+    batch_size: int = 500,
+    concurrency: int = 4,
+    dry_run: bool = False,
+    rejects_path: Optional[str] = None,
+    fmt: Optional[str] = None,
+) -> IngestReport:
+    """Stream an export into conference_schedules (or only validate it, with dry_run)."""
+    rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    try:
+        return await run_pipeline(
+            read_records(path, fmt),
+            SCHEDULE_ADAPTER,
+            None if dry_run else upsert_sessions,
+            transform=to_row,
+            dedupe_key=conflict_key,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            rejects=rejects,
+        )
+    finally:
+        if rejects:
+            rejects.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream an agenda export into conference_schedules.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "json"), help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="Validate and normalize only")
+    parser.add_argument("--rejects", help="Write rejected records as JSON lines to this file")
+    parser.add_argument("--notify-url", help="Backend base URL whose schedule caches to invalidate afterwards")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        report = asyncio.run(ingest_schedule(args.path, args.batch_size, args.concurrency, args.dry_run, args.rejects, args.format))
+    except MalformedInput as e:
+        print(f"Import stopped: {e}", file=sys.stderr)
+        return 2
+    print(format_report(report, args.dry_run))
+    if args.notify_url and not args.dry_run and report.written:
+        print(f"Server caches invalidated: {notify_server(args.notify_url, '/admin/schedule/invalidate')}")
+    return 1 if report.failed_batches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
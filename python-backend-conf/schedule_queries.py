@@ -0,0 +1,110 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from read_replica import replica_select
+
+# Columns the schedule tools and endpoints actually use
+SESSION_COLUMNS = "id, topic, speaker_name, conference_date, start_time, conference_room_name, track_name"
+SESSION_ORDER = ("conference_date", "start_time", "id")
+
+# Aggregated views from sql/schedule_views.sql
+FACETS = {
+    "speakers": ("schedule_speakers", "speaker_name"),
+    "tracks": ("schedule_tracks", "track_name"),
+    "rooms": ("schedule_rooms", "conference_room_name"),
+}
+
+class Page(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that were not produced by this module."""
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Opaque, URL-safe cursor holding the sort key of the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, dict):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return values
+
+def _quote(value: Any) -> str:
+    """Quote a value for a PostgREST or=(...) filter (times contain ':')."""
+    if value is None:
+        raise ValueError("null has no quoted form; filter it with is.null")
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+def _keyset_filter(columns, values) -> str:
+    """PostgREST or=(...) body for rows sorting after values, with Postgres' default nulls-last order.
+
+    The last column is the unique tiebreaker and is never null.
+    """
+    terms, equal = [], []
+    for position, (column, value) in enumerate(zip(columns, values)):
+        if value is not None:
+            after = [f"{column}.gt.{_quote(value)}"]
+            if position < len(columns) - 1:
+                after.append(f"{column}.is.null")  # nulls sort after every value
+            terms.extend(f"and({','.join(equal + [term])})" if equal else term for term in after)
+            equal.append(f"{column}.eq.{_quote(value)}")
+        else:
+            equal.append(f"{column}.is.null")
+    return ",".join(terms)
+
+def _page(rows: List[Dict[str, Any]], limit: int, key_columns) -> Page:
+    if len(rows) <= limit:
+        return Page(items=rows)
+    rows = rows[:limit]
+    return Page(items=rows, next_cursor=encode_cursor({c: rows[-1].get(c) for c in key_columns}))
+
+def fetch_facet_page(facet: str, cursor: Optional[str] = None, limit: int = 20) -> Page:
+    """One page of distinct speakers/tracks/rooms with their session counts."""
+    view, column = FACETS[facet]
+    after = decode_cursor(cursor).get(column) if cursor else None
+    if cursor and not isinstance(after, str):
+        # Well-formed, but from another facet or the session list
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    from database import db_client
+
+    query = db_client.table(view).select(f"{column}, session_count").order(column).limit(limit + 1)
+    if cursor:
+        query = query.gt(column, after)
+    return _page(query.execute().data or [], limit, (column,))
+
+def fetch_session_page(
+    cursor: Optional[str] = None,
+    limit: int = 5,
+    conference_date: Optional[str] = None,
+    track_name: Optional[str] = None,
+    conference_room_name: Optional[str] = None,
+    speaker_name: Optional[str] = None,
+) -> Page:
+    """One page of sessions in (date, start time, id) order, optionally filtered."""
+    filters = {column: value for column, value in (("conference_date", conference_date), ("track_name", track_name),
+               ("conference_room_name", conference_room_name), ("speaker_name", speaker_name)) if value}
+    last = decode_cursor(cursor) if cursor else None
+    after = [last.get(c) for c in SESSION_ORDER] if last else None
+    if last is not None and after[-1] is None:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    rows = replica_select("conference_schedules", filters, order=SESSION_ORDER, limit=limit + 1, after=after,
+                          columns=[c.strip() for c in SESSION_COLUMNS.split(",")])
+    if rows is not None:
+        return _page(rows, limit, SESSION_ORDER)
+    from database import db_client
+
+    query = db_client.table("conference_schedules").select(SESSION_COLUMNS)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    if last:
+        query = query.or_(_keyset_filter(SESSION_ORDER, after))
+    for column in SESSION_ORDER:
+        query = query.order(column)
+    return _page(query.limit(limit + 1).execute().data or [], limit, SESSION_ORDER)
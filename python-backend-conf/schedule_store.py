@@ -0,0 +1,35 @@
+import os
+from schedule_queries import SESSION_COLUMNS
+from snapshot_store import SnapshotStore, read_all_rows
+from change_feed import change_feed
+from memory_monitor import register_cache
+from tool_memo import invalidate_everywhere
+from resilience import forget_last_good
+from read_replica import note_write
+
+SCHEDULE_REFRESH_SECONDS = float(os.getenv("SCHEDULE_REFRESH_SECONDS", "300"))
+# Tools whose memoized or last-good results are derived from conference_schedules
+SCHEDULE_TOOLS = ("get_conference_sessions", "get_all_speakers", "get_all_tracks", "get_all_rooms", "search_sessions")
+
+# Shared by the session search and time indexes
+SCHEDULE_STORE = SnapshotStore(
+    "Schedule",
+    lambda: read_all_rows("conference_schedules", SESSION_COLUMNS),
+    SCHEDULE_REFRESH_SECONDS,
+    feed=change_feed("conference_schedules", SESSION_COLUMNS),
+)
+register_cache("schedule_store", lambda: SCHEDULE_STORE.rows)
+
+def invalidate_schedule_caches() -> dict:
+    """Forget everything derived from conference_schedules after a bulk change.
+
+    The snapshot reloads on the next schedule tool call and its diff updates the
+    search and time indexes incrementally.
+    """
+    SCHEDULE_STORE.invalidate()
+    note_write("conference_schedules")
+    return {
+        "memo_entries": invalidate_everywhere(*SCHEDULE_TOOLS),
+        "last_good_entries": forget_last_good(*SCHEDULE_TOOLS),
+        "snapshot_version": SCHEDULE_STORE.version,
+    }
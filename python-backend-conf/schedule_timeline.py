@@ -0,0 +1,298 @@
+import bisect
+import logging
+import os
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from zoneinfo import ZoneInfo
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# conference_schedules has no end time; sessions without one are assumed to run this long
+DEFAULT_SESSION_MINUTES = int(os.getenv("DEFAULT_SESSION_MINUTES", "45"))
+CONFERENCE_TIMEZONE = os.getenv("CONFERENCE_TIMEZONE", "UTC")
+EPOCH = datetime(2000, 1, 1)
+BULK_LOAD_THRESHOLD = 1000  # Change batches larger than this rebuild the arrays
+ALTERNATIVE_SCAN_LIMIT = 500  # Track sessions examined per alternatives() call
+TIME_FORMATS = ("%H:%M:%S", "%H:%M", "%I:%M %p", "%I:%M%p", "%I %p")
+
+def conference_now() -> datetime:
+    """Current wall-clock time at the venue, naive like the schedule rows."""
+    return datetime.now(ZoneInfo(CONFERENCE_TIMEZONE)).replace(tzinfo=None, second=0, microsecond=0)
+
+def to_minutes(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds() // 60)
+
+def from_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
+
+def parse_time(value: Any) -> Optional[time]:
+    if isinstance(value, time):
+        return value
+    text = str(value or "").strip().upper()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+def parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def session_span(session: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """(start, end) in minutes for a schedule row, or None if its date/time can't be read."""
+    day, start = parse_date(session.get("conference_date")), parse_time(session.get("start_time"))
+    if day is None or start is None:
+        return None
+    begin = to_minutes(datetime.combine(day, start))
+    end_time = parse_time(session.get("end_time"))
+    end = to_minutes(datetime.combine(day, end_time)) if end_time else begin + DEFAULT_SESSION_MINUTES
+    return begin, max(end, begin + 1)
+
+class Slot(NamedTuple):
+    start: datetime
+    end: datetime
+
+class Conflict(NamedTuple):
+    first: Dict[str, Any]
+    second: Dict[str, Any]
+
+class SortedSpans:
+    """Sessions in (start, id) order in parallel bisect-searchable arrays.
+
+    Overlap queries look back at most max_duration from the window start, so
+    they cost O(log n + k) for schedules whose sessions have bounded length.
+    """
+
+    def __init__(self):
+        self.keys: List[Tuple[int, Any]] = []
+        self.ends: List[int] = []
+        self._durations: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def max_duration(self) -> int:
+        return max(self._durations) if self._durations else 0
+
+    def load(self, spans: Iterable[Tuple[int, int, Any]]) -> None:
+        """Replace the contents with (start, end, id) spans in one sort."""
+        ordered = sorted(spans, key=lambda span: (span[0], span[2]))
+        self.keys = [(start, session_id) for start, _, session_id in ordered]
+        self.ends = [end for _, end, _ in ordered]
+        self._durations = Counter(end - start for start, end, _ in ordered)
+
+    def insert(self, session_id: Any, start: int, end: int) -> None:
+        position = bisect.bisect_left(self.keys, (start, session_id))
+        self.keys.insert(position, (start, session_id))
+        self.ends.insert(position, end)
+        self._durations[end - start] += 1
+
+    def delete(self, session_id: Any, start: int, end: int) -> None:
+        position = bisect.bisect_left(self.keys, (start, session_id))
+        if position < len(self.keys) and self.keys[position] == (start, session_id):
+            del self.keys[position]
+            del self.ends[position]
+            self._durations[end - start] -= 1
+            if not self._durations[end - start]:
+                del self._durations[end - start]
+
+    def overlapping(self, start: int, end: int) -> Iterable[Tuple[int, int, Any]]:
+        """(start, end, id) of sessions intersecting [start, end), in start order."""
+        low = bisect.bisect_left(self.keys, (start - self.max_duration,))
+        high = bisect.bisect_left(self.keys, (end,))
+        for position in range(low, high):
+            if self.ends[position] > start:
+                session_start, session_id = self.keys[position]
+                yield session_start, self.ends[position], session_id
+
+    def starting_from(self, start: int) -> Iterable[Tuple[int, int, Any]]:
+        """(start, end, id) of sessions starting at or after start, in start order."""
+        for position in range(bisect.bisect_left(self.keys, (start,)), len(self.keys)):
+            session_start, session_id = self.keys[position]
+            yield session_start, self.ends[position], session_id
+
+    def starting_before(self, start: int) -> Iterable[Tuple[int, int, Any]]:
+        """(start, end, id) of sessions starting before start, latest first."""
+        for position in range(bisect.bisect_left(self.keys, (start,)) - 1, -1, -1):
+            session_start, session_id = self.keys[position]
+            yield session_start, self.ends[position], session_id
+
+def free_gaps(start: int, end: int, busy: Iterable[Tuple[int, int, Any]], min_minutes: int) -> List[Tuple[int, int]]:
+    """Gaps of at least min_minutes inside [start, end) not covered by busy spans (in start order)."""
+    gaps = []
+    cursor = start
+    for busy_start, busy_end, _ in busy:
+        if busy_start - cursor >= min_minutes:
+            gaps.append((cursor, min(busy_start, end)))
+        cursor = max(cursor, busy_end)
+        if cursor >= end:
+            break
+    if end - cursor >= min_minutes:
+        gaps.append((cursor, end))
+    return gaps
+
+class ScheduleTimeline:
+    """Time index over the schedule: what's on, what's next, free slots and agenda conflicts.
+
+    Kept current by SCHEDULE_STORE change notifications; per-room and per-track
+    arrays let room and alternative-session queries skip unrelated sessions.
+    """
+
+    def __init__(self):
+        self.sessions: Dict[Any, Dict[str, Any]] = {}
+        self.spans: Dict[Any, Tuple[int, int]] = {}
+        self.all = SortedSpans()
+        self.rooms: Dict[str, SortedSpans] = defaultdict(SortedSpans)
+        self.tracks: Dict[str, SortedSpans] = defaultdict(SortedSpans)
+
+    @staticmethod
+    def _key(value: Any) -> str:
+        return str(value or "").strip().lower()
+
+    def _indexes(self, session: Dict[str, Any]) -> List[SortedSpans]:
+        return [self.all, self.rooms[self._key(session.get("conference_room_name"))],
+                self.tracks[self._key(session.get("track_name"))]]
+
+    def add(self, session: Dict[str, Any]) -> None:
+        session_id = session["id"]
+        self.remove(session_id)
+        span = session_span(session)
+        if span is None:
+            logger.debug("Session %s has no readable date/time; not in the timeline", session_id)
+            return
+        self.sessions[session_id] = session
+        self.spans[session_id] = span
+        for index in self._indexes(session):
+            index.insert(session_id, *span)
+
+    def remove(self, session_id: Any) -> None:
+        if session_id not in self.sessions:
+            return
+        session = self.sessions.pop(session_id)
+        span = self.spans.pop(session_id)
+        for index in self._indexes(session):
+            index.delete(session_id, *span)
+
+    def apply_changes(self, upserts: List[Dict[str, Any]], deletes: List[Any]) -> None:
+        """SCHEDULE_STORE listener: re-place only the changed sessions."""
+        for session_id in deletes:
+            self.remove(session_id)
+        if len(upserts) <= BULK_LOAD_THRESHOLD:
+            for session in upserts:
+                self.add(session)
+            return
+        # Large batches (the initial load): one sort beats thousands of list inserts
+        for session in upserts:
+            span = session_span(session)
+            self.sessions.pop(session["id"], None)
+            self.spans.pop(session["id"], None)
+            if span is not None:
+                self.sessions[session["id"]] = session
+                self.spans[session["id"]] = span
+        self._reload()
+
+    def _reload(self) -> None:
+        grouped: Dict[int, List[Tuple[int, int, Any]]] = defaultdict(list)
+        self.rooms.clear()
+        self.tracks.clear()
+        for session_id, (start, end) in self.spans.items():
+            for index in self._indexes(self.sessions[session_id]):
+                grouped[id(index)].append((start, end, session_id))
+        for index in [self.all, *self.rooms.values(), *self.tracks.values()]:
+            index.load(grouped[id(index)])
+
+    def _scope(self, room: Optional[str]) -> SortedSpans:
+        if not room:
+            return self.all
+        return self.rooms.get(self._key(room)) or SortedSpans()
+
+    def happening_at(self, moment: datetime, room: Optional[str] = None) -> List[Dict[str, Any]]:
+        minutes = to_minutes(moment)
+        return [self.sessions[sid] for _, _, sid in self._scope(room).overlapping(minutes, minutes + 1)]
+
+    def next_sessions(self, after: datetime, room: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Sessions starting at or after a moment; the earliest start time first."""
+        result = []
+        for _, _, sid in self._scope(room).starting_from(to_minutes(after)):
+            if len(result) >= limit:
+                break
+            result.append(self.sessions[sid])
+        return result
+
+    def overlapping(self, start: datetime, end: datetime, room: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [self.sessions[sid] for _, _, sid in self._scope(room).overlapping(to_minutes(start), to_minutes(end))]
+
+    def free_slots(self, start: datetime, end: datetime, room: Optional[str] = None,
+                   agenda: Optional[Iterable[Any]] = None, min_minutes: int = 15) -> List[Slot]:
+        """Gaps in [start, end): in a room's schedule, or in an attendee's agenda when given."""
+        lo, hi = to_minutes(start), to_minutes(end)
+        if agenda is not None:
+            busy = sorted((*self.spans[sid], sid) for sid in agenda if sid in self.spans)
+            busy = [span for span in busy if span[1] > lo and span[0] < hi]
+        else:
+            busy = self._scope(room).overlapping(lo, hi)
+        return [Slot(from_minutes(a), from_minutes(b)) for a, b in free_gaps(lo, hi, busy, min_minutes)]
+
+    def agenda_conflicts(self, agenda: Iterable[Any]) -> List[Conflict]:
+        """Pairs of agenda sessions that overlap, found with one sweep in start order."""
+        ordered = sorted((*self.spans[sid], sid) for sid in set(agenda) if sid in self.spans)
+        conflicts = []
+        running: List[Tuple[int, Any]] = []  # (end, id) of sessions still in progress
+        for start, end, sid in ordered:
+            running = [(other_end, other) for other_end, other in running if other_end > start]
+            conflicts.extend(Conflict(self.sessions[other], self.sessions[sid]) for _, other in running)
+            running.append((end, sid))
+        return conflicts
+
+    def overlapping_agenda(self, agenda: Iterable[Any], room: Optional[str] = None) -> Dict[Any, List[Dict[str, Any]]]:
+        """For each agenda session, the other sessions running at the same time."""
+        agenda_ids = set(agenda)
+        result = {}
+        for sid in agenda_ids:
+            if sid in self.spans:
+                result[sid] = [self.sessions[other] for _, _, other in self._scope(room).overlapping(*self.spans[sid])
+                               if other not in agenda_ids]
+        return result
+
+    def alternatives(self, session_id: Any, agenda: Iterable[Any], limit: int = 3) -> List[Dict[str, Any]]:
+        """Sessions on the same track as session_id, closest in time first, that fit around the rest of the agenda."""
+        if session_id not in self.sessions:
+            return []
+        session = self.sessions[session_id]
+        busy = sorted(self.spans[sid] for sid in set(agenda) if sid in self.spans and sid != session_id)
+        busy_ends = list(accumulate((end for _, end in busy), max))
+        track = self.tracks.get(self._key(session.get("track_name")))
+        if track is None:
+            return []
+
+        def fits(start: int, end: int) -> bool:
+            position = bisect.bisect_left(busy, (end,))
+            return position == 0 or busy_ends[position - 1] <= start
+
+        origin = self.spans[session_id][0]
+        later = (item for item in track.starting_from(origin) if item[2] != session_id)
+        earlier = track.starting_before(origin)
+        result: List[Dict[str, Any]] = []
+        next_later, next_earlier = next(later, None), next(earlier, None)
+        for _ in range(ALTERNATIVE_SCAN_LIMIT):
+            if len(result) >= limit or not (next_later or next_earlier):
+                break
+            # Walk outward from the conflicting session, nearest start first
+            if next_earlier is None or (next_later is not None and next_later[0] - origin <= origin - next_earlier[0]):
+                candidate, next_later = next_later, next(later, None)
+            else:
+                candidate, next_earlier = next_earlier, next(earlier, None)
+            if fits(candidate[0], candidate[1]):
+                result.append(self.sessions[candidate[2]])
+        return result
+
+SCHEDULE_TIMELINE = ScheduleTimeline()
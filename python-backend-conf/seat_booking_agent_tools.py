@@ -4,13 +4,24 @@ from context import AirlineAgentContext, CustomerBooking
 from database import db_client
 from agents import function_tool
 from common_tools import get_booking_details
+from tool_memo import memoize_tool, invalidates_memo, idempotent_tool
+from booking_lookup import invalidate_booking
 
 logger = logging.getLogger(__name__)
 
+def _apply_seat(confirmation_number: str, new_seat: str, context: AirlineAgentContext) -> None:
+    context.seat_number = new_seat
+    # Update customer_bookings if booking exists in context
+    for booking in context.customer_bookings:
+        if booking.confirmation_number == confirmation_number:
+            booking.seat_number = new_seat
+
 @function_tool(
     name_override="update_seat",
     description_override="Update the seat number for a booking."
 )
+@invalidates_memo("get_booking_details", "display_seat_map", match_args=("confirmation_number",))
+@idempotent_tool(scope_args=("confirmation_number",), on_replay=_apply_seat)
 async def update_seat(confirmation_number: str, new_seat: str, context: AirlineAgentContext) -> str:
     """Update the seat number for a booking."""
     try:
@@ -20,7 +31,7 @@ async def update_seat(confirmation_number: str, new_seat: str, context: AirlineA
             single=True
         )
         if not booking:
-            logger.warning(f"❌ No booking found for confirmation number: {confirmation_number}")
+            logger.warning("❌ No booking found for confirmation number: %s", confirmation_number)
             return f"No booking found for confirmation number {confirmation_number}"
         
         updated = await db_client.query(
@@ -30,24 +41,22 @@ async def update_seat(confirmation_number: str, new_seat: str, context: AirlineA
         )
         
         if updated:
-            context.seat_number = new_seat
-            # Update customer_bookings if booking exists in context
-            for booking in context.customer_bookings:
-                if booking.confirmation_number == confirmation_number:
-                    booking.seat_number = new_seat
-            logger.info(f"✅ Successfully updated seat to {new_seat} for confirmation {confirmation_number}")
+            invalidate_booking(confirmation_number)
+            _apply_seat(confirmation_number, new_seat, context)
+            logger.info("✅ Successfully updated seat to %s for confirmation %s", new_seat, confirmation_number)
             return f"Seat updated to {new_seat} for confirmation number {confirmation_number}"
         else:
-            logger.warning(f"❌ Failed to update seat for confirmation {confirmation_number}")
+            logger.warning("❌ Failed to update seat for confirmation %s", confirmation_number)
             return f"Failed to update seat for confirmation {confirmation_number}"
     except Exception as e:
-        logger.error(f"❌ Error updating seat for {confirmation_number}: {e}", exc_info=True)
+        logger.error("❌ Error updating seat for %s: %s", confirmation_number, e, exc_info=True)
         return f"Error updating seat: {str(e)}"
 
 @function_tool(
     name_override="display_seat_map",
     description_override="Display the seat map for a flight."
 )
+@memoize_tool(key_args=("confirmation_number",))
 async def display_seat_map(confirmation_number: str, context: AirlineAgentContext) -> Dict[str, Any]:
     """Display the seat map for a flight (placeholder implementation)."""
     try:
@@ -58,13 +67,13 @@ async def display_seat_map(confirmation_number: str, context: AirlineAgentContex
             single=True
         )
         if not booking:
-            logger.warning(f"❌ No booking found for confirmation number: {confirmation_number}")
+            logger.warning("❌ No booking found for confirmation number: %s", confirmation_number)
             return {"error": f"No booking found for confirmation number {confirmation_number}"}
         
         # Placeholder seat map logic
         seat_map = {"flight_number": booking.get("flights", {}).get("flight_number"), "seats": ["1A", "1B", "2A", "2B"]}
-        logger.info(f"✅ Retrieved seat map for {confirmation_number}")
+        logger.info("✅ Retrieved seat map for %s", confirmation_number)
         return seat_map
     except Exception as e:
-        logger.error(f"❌ Error displaying seat map: {e}", exc_info=True)
+        logger.error("❌ Error displaying seat map: %s", e, exc_info=True)
         return {"error": f"Error displaying seat map: {str(e)}"}
\ No newline at end of file
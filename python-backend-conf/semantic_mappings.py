@@ -23,6 +23,15 @@ SEMANTIC_MAPPINGS = {
     # }
 }
 
+# Keyword sets checked by the input guardrails
+GUARDRAIL_KEYWORDS = {
+    "relevant": [
+        "flight", "seat", "booking", "cancel", "status", "baggage", "luggage",
+        "conference", "session", "speaker", "track", "room", "networking", "business"
+    ],
+    "jailbreak": ["ignore instructions", "bypass", "system prompt", "hack"]
+}
+
 # Fields that support fuzzy matching in database queries
 FUZZY_FIELDS = {
     "customers": ["name", "email"],
@@ -0,0 +1,286 @@
+import bisect
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from semantic_mappings import VALUE_MAPPINGS, get_canonical_value
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # Fuzzy term matching is optional
+    process = None
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Field weights for BM25F-style term frequencies
+FIELD_WEIGHTS = {
+    "topic": 1.0,
+    "speaker_name": 1.5,
+    "track_name": 1.0,
+    "conference_room_name": 0.5,
+}
+FILTER_FIELDS = ("conference_date", "conference_room_name", "track_name")
+# Query words that say "find me a session" rather than what it is about
+STOPWORDS = frozenset({
+    "a", "an", "and", "any", "about", "are", "at", "by", "for", "from", "in", "is", "of", "on", "or",
+    "the", "to", "with", "talk", "talks", "session", "sessions", "there", "what", "which", "who",
+})
+K1 = 1.2
+B = 0.75
+PREFIX_MIN_LENGTH = 3
+PREFIX_MAX_EXPANSIONS = 20
+FUZZY_MIN_LENGTH = 4
+FUZZY_SCORE_CUTOFF = 80.0
+# Candidate sets up to this size are scored exhaustively; larger ones use threshold pruning
+EXHAUSTIVE_SCORE_LIMIT = 256
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+def _track_aliases() -> Dict[str, List[str]]:
+    """Query token -> canonical track tokens, e.g. "ai" -> ["artificial", "intelligence"]."""
+    return {alias: tokenize(track) for alias, track in VALUE_MAPPINGS.get("track_name", {}).items()}
+
+class SearchHit(NamedTuple):
+    score: float
+    session: Dict[str, Any]
+
+class SessionSearchIndex:
+    """Inverted index over conference_schedules with BM25 ranking.
+
+    Per-posting BM25 impacts are precomputed, so a query only combines idf and
+    impacts. Sessions must match every query word (any expansion of it); if
+    that yields fewer than limit hits, the rest are filled from sessions
+    matching any word. Top-k over large posting lists walks impact-sorted
+    postings and stops once no unseen session can beat the current k-th score.
+
+    Sessions are added and removed incrementally; impacts of untouched sessions
+    keep the average length they were computed with until rebuild(), which only
+    shifts scores slightly. Unknown words fall back to prefix matches, then to
+    rapidfuzz matches, against the vocabulary.
+    """
+
+    def __init__(self):
+        self.docs: Dict[Any, Dict[str, Any]] = {}
+        self.doc_terms: Dict[Any, Dict[str, float]] = {}
+        self.doc_lengths: Dict[Any, float] = {}
+        self.postings: Dict[str, Dict[Any, float]] = defaultdict(dict)
+        self.vocabulary: List[str] = []  # Sorted, for prefix lookups
+        self.filters: Dict[str, Dict[str, Set[Any]]] = {field: defaultdict(set) for field in FILTER_FIELDS}
+        self.total_length = 0.0
+        self.aliases = _track_aliases()
+        self._by_impact: Dict[str, List[Tuple[float, Any]]] = {}
+        self._expansions: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+
+    # -- maintenance ---------------------------------------------------------
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / len(self.docs) if self.docs else 1.0
+
+    def _impact(self, tf: float, length: float) -> float:
+        return tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / self.avg_length))
+
+    def add(self, session: Dict[str, Any]) -> None:
+        doc_id = session["id"]
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        terms: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(session.get(field)):
+                terms[token] += weight
+        length = sum(terms.values())
+        self.docs[doc_id] = session
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        for field in FILTER_FIELDS:
+            self.filters[field][str(session.get(field) or "").lower()].add(doc_id)
+        for term, tf in terms.items():
+            postings = self.postings[term]
+            if not postings:
+                bisect.insort(self.vocabulary, term)
+                self._expansions.clear()
+            postings[doc_id] = self._impact(tf, length)
+            self._by_impact.pop(term, None)
+
+    def remove(self, doc_id: Any) -> None:
+        if doc_id not in self.docs:
+            return
+        session = self.docs.pop(doc_id)
+        for field in FILTER_FIELDS:
+            value = str(session.get(field) or "").lower()
+            self.filters[field][value].discard(doc_id)
+            if not self.filters[field][value]:
+                del self.filters[field][value]
+        for term in self.doc_terms.pop(doc_id):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            self._by_impact.pop(term, None)
+            if not postings:
+                del self.postings[term]
+                position = bisect.bisect_left(self.vocabulary, term)
+                if position < len(self.vocabulary) and self.vocabulary[position] == term:
+                    del self.vocabulary[position]
+                self._expansions.clear()
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def apply_changes(self, upserts: List[Dict[str, Any]], deletes: List[Any]) -> None:
+        """SCHEDULE_STORE listener: index only the changed sessions."""
+        for doc_id in deletes:
+            self.remove(doc_id)
+        for session in upserts:
+            self.add(session)
+        if len(upserts) > len(self.docs) // 2:
+            # Bulk loads skew the average length the earlier impacts were built on
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        """Recompute every impact against the current average document length."""
+        for doc_id, terms in self.doc_terms.items():
+            length = self.doc_lengths[doc_id]
+            for term, tf in terms.items():
+                self.postings[term][doc_id] = self._impact(tf, length)
+        self._by_impact.clear()
+
+    # -- querying ------------------------------------------------------------
+
+    def _expand(self, token: str) -> Tuple[Tuple[str, float], ...]:
+        """Index terms for a query token with a match-quality factor."""
+        cached = self._expansions.get(token)
+        if cached is not None:
+            return cached
+        expansions: Tuple[Tuple[str, float], ...] = ()
+        if token in self.postings:
+            expansions = ((token, 1.0),)
+        elif len(token) >= PREFIX_MIN_LENGTH:
+            start = bisect.bisect_left(self.vocabulary, token)
+            expansions = tuple((term, 0.9) for term in self.vocabulary[start:start + PREFIX_MAX_EXPANSIONS]
+                               if term.startswith(token))
+        if not expansions and process is not None and len(token) >= FUZZY_MIN_LENGTH and self.vocabulary:
+            matches = process.extract(token, self.vocabulary, scorer=fuzz.ratio, score_cutoff=FUZZY_SCORE_CUTOFF, limit=3)
+            expansions = tuple((term, 0.7 * score / 100) for term, score, _ in matches)
+        self._expansions[token] = expansions
+        return expansions
+
+    def _query_groups(self, query: str) -> List[Dict[str, float]]:
+        """One {term: factor} group per meaningful query word; aliases join the word's group."""
+        groups = []
+        for token in tokenize(query):
+            if token in STOPWORDS:
+                continue
+            group: Dict[str, float] = dict(self._expand(token))
+            for alias_token in self.aliases.get(token, []):
+                for term, factor in self._expand(alias_token):
+                    group[term] = max(group.get(term, 0.0), factor)
+            if group:
+                groups.append(group)
+        return groups
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings[term])
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def _sorted_postings(self, term: str) -> List[Tuple[float, Any]]:
+        ranked = self._by_impact.get(term)
+        if ranked is None:
+            ranked = self._by_impact[term] = sorted(((impact, doc_id) for doc_id, impact in self.postings[term].items()),
+                                                    key=lambda posting: posting[0], reverse=True)
+        return ranked
+
+    def _score(self, doc_id: Any, weights: Dict[str, float]) -> float:
+        return sum(weight * self.postings[term].get(doc_id, 0.0) for term, weight in weights.items())
+
+    def _top_k(self, weights: Dict[str, float], limit: int, allowed: Optional[Set[Any]],
+               exclude: Iterable[Any] = ()) -> List[Tuple[float, Any]]:
+        """Best limit docs by summed weighted impact, restricted to allowed when given."""
+        if allowed is not None and len(allowed) <= EXHAUSTIVE_SCORE_LIMIT:
+            excluded = set(exclude)
+            scored = ((self._score(doc_id, weights), doc_id) for doc_id in allowed if doc_id not in excluded)
+            return heapq.nlargest(limit, (item for item in scored if item[0] > 0), key=lambda item: item[0])
+
+        # Threshold algorithm: walk the impact-sorted lists in lockstep; a doc not
+        # yet seen scores at most the sum of the impacts at the current depth.
+        lists = [(weight, self._sorted_postings(term)) for term, weight in weights.items()]
+        seen = set(exclude)
+        best: List[Tuple[float, int, Any]] = []
+        depth = 0
+        while True:
+            threshold = 0.0
+            exhausted = True
+            for weight, ranked in lists:
+                if depth >= len(ranked):
+                    continue
+                exhausted = False
+                impact, doc_id = ranked[depth]
+                threshold += weight * impact
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                entry = (self._score(doc_id, weights), -len(seen), doc_id)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            if exhausted or (len(best) == limit and best[0][0] >= threshold):
+                break
+            depth += 1
+        return [(score, doc_id) for score, _, doc_id in sorted(best, reverse=True)]
+
+    def _matching_all(self, groups: List[Dict[str, float]], filtered: Optional[Set[Any]]) -> Set[Any]:
+        """Docs matching every group (and the filters), intersecting smallest first."""
+        sides = [self.postings[next(iter(group))].keys() if len(group) == 1
+                 else set().union(*(self.postings[term].keys() for term in group)) for group in groups]
+        if filtered is not None:
+            sides.append(filtered)
+        sides.sort(key=len)
+        matching = set(sides[0])
+        for side in sides[1:]:
+            matching &= side
+        return matching
+
+    def _filtered_ids(self, filters: Dict[str, Optional[str]]) -> Optional[Set[Any]]:
+        selected = None
+        for field, value in filters.items():
+            if not value:
+                continue
+            ids = self.filters[field].get(value.lower(), set())
+            selected = ids if selected is None else selected & ids
+        return selected
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        conference_date: Optional[str] = None,
+        conference_room_name: Optional[str] = None,
+        track_name: Optional[str] = None,
+    ) -> List[SearchHit]:
+        """Top sessions for query, optionally restricted by date, room and track."""
+        if track_name:
+            track_name = get_canonical_value("track_name", track_name)
+        filtered = self._filtered_ids({"conference_date": conference_date,
+                                       "conference_room_name": conference_room_name, "track_name": track_name})
+        groups = self._query_groups(query)
+        if not groups:
+            if filtered is None:
+                return []
+            # Filters only: schedule order
+            ordered = sorted(filtered, key=lambda d: (str(self.docs[d].get("conference_date")),
+                                                      str(self.docs[d].get("start_time"))))
+            return [SearchHit(0.0, self.docs[d]) for d in ordered[:limit]]
+
+        weights: Dict[str, float] = {}
+        for group in groups:
+            for term, factor in group.items():
+                weights[term] = max(weights.get(term, 0.0), self._idf(term) * factor)
+
+        ranked = self._top_k(weights, limit, self._matching_all(groups, filtered))
+        if len(ranked) < limit and len(groups) > 1:
+            ranked += self._top_k(weights, limit - len(ranked), filtered, exclude=(doc_id for _, doc_id in ranked))
+        return [SearchHit(score, self.docs[doc_id]) for score, doc_id in ranked]
+
+SESSION_INDEX = SessionSearchIndex()
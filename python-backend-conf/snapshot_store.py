@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from tool_executor import run_blocking
+from read_replica import replica_select
+from change_feed import ChangeFeed
+
+logger = logging.getLogger(__name__)
+
+FETCH_PAGE_SIZE = 1000  # PostgREST caps responses at 1000 rows by default
+
+# listener(upserts, deleted_ids) is called after every change with the changed rows only
+ChangeListener = Callable[[List[Dict[str, Any]], List[Any]], None]
+
+def fetch_all_rows(table: str, columns: str = "*", order: str = "id") -> List[Dict[str, Any]]:
+    """Read a whole table, one PostgREST page at a time."""
+    # Imported here so the module loads without database credentials
+    from database import db_client
+
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        batch = db_client.table(table).select(columns).order(order).range(start, start + FETCH_PAGE_SIZE - 1).execute().data or []
+        rows.extend(batch)
+        if len(batch) < FETCH_PAGE_SIZE:
+            return rows
+        start += FETCH_PAGE_SIZE
+
+def read_all_rows(table: str, columns: str = "*", order: str = "id") -> List[Dict[str, Any]]:
+    """fetch_all_rows, served from the local read replica while it is fresh."""
+    selected = None if columns.strip() == "*" else [column.strip() for column in columns.split(",")]
+    rows = replica_select(table, order=(order,), columns=selected)
+    return rows if rows is not None else fetch_all_rows(table, columns, order)
+
+class SnapshotStore:
+    """In-process snapshot of a table shared by the indexes built over it.
+
+    Reloads are diffed against the current snapshot, and only changed rows are
+    passed to listeners, so indexes update incrementally. With a change feed,
+    refreshes fetch only the rows changed since the last one instead of the
+    whole table. version increases on every change and is what downstream
+    caches (ETags, memo keys) key on.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[], List[Dict[str, Any]]], refresh_seconds: float,
+                 feed: Optional[ChangeFeed] = None):
+        self.name = name
+        self.fetch = fetch
+        self.feed = feed
+        # A change feed only reads what changed, so it can poll far more often than a reload
+        self.refresh_seconds = feed.poll_seconds if feed is not None else refresh_seconds
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self._listeners: List[ChangeListener] = []
+        self._lock: Optional[asyncio.Lock] = None
+        if feed is not None:
+            feed.subscribe(self._apply_feed)
+
+    def subscribe(self, listener: ChangeListener) -> None:
+        """Register a listener and replay the current snapshot into it."""
+        self._listeners.append(listener)
+        if self.rows:
+            listener(list(self.rows.values()), [])
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    def invalidate(self) -> None:
+        """Force a reload (or a feed poll that also checks for deletes) on the next ensure_fresh()."""
+        self.loaded_at = None
+        if self.feed is not None:
+            self.feed.reconcile_soon()
+
+    async def ensure_fresh(self) -> "SnapshotStore":
+        """Reload from the database if the snapshot is older than refresh_seconds."""
+        if not self.is_stale():
+            return self
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.is_stale():
+                if self.feed is not None:
+                    # Read on a worker thread, apply here: listeners mutate indexes the loop reads without locks
+                    upserts, deletes = await run_blocking(self.feed.collect)
+                    self.feed.push(upserts, deletes)
+                else:
+                    rows = await run_blocking(self.fetch)
+                    self.apply_snapshot(rows)
+                self.loaded_at = time.monotonic()
+        return self
+
+    def apply_snapshot(self, rows: Iterable[Dict[str, Any]]) -> bool:
+        """Replace the snapshot, notifying listeners of the difference. Returns True if anything changed."""
+        incoming = {row["id"]: row for row in rows}
+        upserts = [row for row_id, row in incoming.items() if self.rows.get(row_id) != row]
+        deletes = [row_id for row_id in self.rows if row_id not in incoming]
+        return self.apply_changes(upserts, deletes)
+
+    def _unchanged(self, row: Dict[str, Any]) -> bool:
+        """Every column of the feed row matches the stored row (which may carry more, e.g. from an insert)."""
+        current = self.rows.get(row["id"])
+        return current is not None and all(current.get(column) == value for column, value in row.items())
+
+    def _apply_feed(self, upserts: List[Dict[str, Any]], deletes: List[Any]) -> None:
+        # Rows written through this process (apply_changes after an insert) come back from the feed unchanged
+        self.apply_changes([row for row in upserts if not self._unchanged(row)], deletes)
+
+    def apply_changes(self, upserts: List[Dict[str, Any]], deletes: Iterable[Any] = ()) -> bool:
+        """Apply inserted/updated rows and deleted ids, notifying listeners."""
+        deletes = [row_id for row_id in deletes if row_id in self.rows]
+        if not upserts and not deletes:
+            return False
+        for row_id in deletes:
+            del self.rows[row_id]
+        for row in upserts:
+            self.rows[row["id"]] = row
+        self.version += 1
+        for listener in self._listeners:
+            try:
+                listener(upserts, deletes)
+            except Exception as e:
+                logger.error("%s listener %s failed: %s", self.name, listener, e, exc_info=True)
+        logger.info("%s v%d: %d upserts, %d deletes", self.name, self.version, len(upserts), len(deletes))
+        return True
@@ -0,0 +1,79 @@
+"""Soak test: push thousands of stubbed conversations through the /chat handler and
+check that memory stays flat once caches have warmed up.
+
+The agent run and the database-backed context load are replaced with local stubs,
+so this needs no network, model or Supabase access.
+
+Usage: python soak.py [--conversations 5000] [--distinct 500] [--max-growth-mb 16]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tracemalloc
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "soak-test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main
+from context import AirlineAgentContext, CustomerBooking
+from memory_monitor import current_rss, cache_estimates
+
+async def stub_create_context(registration_id=None) -> AirlineAgentContext:
+    ctx = AirlineAgentContext(registration_id=registration_id, passenger_name="Soak Tester")
+    ctx.customer_bookings = [
+        CustomerBooking(id=i, confirmation_number=f"SK{i:04d}", flight_number=f"FL{i}", seat_number="12A")
+        for i in range(5)
+    ]
+    return ctx
+
+async def stub_run(agent, message, context=None, **kwargs):
+    # Touch the context the way tools do and return a result-sized string
+    context.seat_number = "14C"
+    return f"{agent.name} handled: {message} " + "x" * 512
+
+async def run_conversations(count: int, distinct: int) -> None:
+    for i in range(count):
+        request = main.ChatRequest(message=f"Which sessions are in room {i % 7}?", registration_id=str(i % distinct))
+        await main.chat(request)
+
+async def soak(conversations: int, distinct: int, max_growth_mb: float) -> int:
+    main.runner.run = stub_run
+    main.create_context = stub_create_context
+
+    # Warm up so bounded caches reach steady state before measuring
+    await run_conversations(max(distinct * 2, conversations // 5), distinct)
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    rss_before = current_rss()
+
+    await run_conversations(conversations, distinct)
+    gc.collect()
+    rss_after = current_rss()
+    snapshot = tracemalloc.take_snapshot()
+    traced_growth = sum(stat.size_diff for stat in snapshot.compare_to(baseline, "filename"))
+
+    print(f"conversations: {conversations} ({distinct} distinct)")
+    print(f"RSS: {rss_before / 2**20:.1f} MiB -> {rss_after / 2**20:.1f} MiB")
+    print(f"traced heap growth: {traced_growth / 2**20:.2f} MiB")
+    for stat in snapshot.compare_to(baseline, "lineno")[:5]:
+        print(f"  {stat}")
+    for name, estimate in cache_estimates().items():
+        print(f"  cache {name}: {estimate['entries']} entries, ~{estimate['bytes'] / 1024:.0f} KiB")
+
+    if traced_growth > max_growth_mb * 2**20:
+        print(f"FAIL: heap grew more than {max_growth_mb} MiB")
+        return 1
+    print("OK: memory stayed flat")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--distinct", type=int, default=500, help="Distinct registration IDs (conversation ids)")
+    parser.add_argument("--max-growth-mb", type=float, default=16.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(soak(args.conversations, args.distinct, args.max_growth_mb)))
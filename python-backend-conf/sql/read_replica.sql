@@ -0,0 +1,33 @@
+-- Watermark columns for read_replica.py (READ_REPLICA_PATH).
+-- The replica pulls rows with updated_at at or after its last watermark, so every
+-- replicated table needs updated_at maintained on insert and update, plus an index
+-- for the (updated_at, id) keyset it pages with.
+create or replace function set_updated_at() returns trigger as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$ language plpgsql;
+
+alter table flights add column if not exists updated_at timestamptz not null default now();
+alter table conference_schedules add column if not exists updated_at timestamptz not null default now();
+alter table ib_businesses add column if not exists updated_at timestamptz not null default now();
+alter table bookings add column if not exists updated_at timestamptz not null default now();
+alter table customers add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists flights_updated_at on flights;
+create trigger flights_updated_at before update on flights for each row execute function set_updated_at();
+drop trigger if exists conference_schedules_updated_at on conference_schedules;
+create trigger conference_schedules_updated_at before update on conference_schedules for each row execute function set_updated_at();
+drop trigger if exists ib_businesses_updated_at on ib_businesses;
+create trigger ib_businesses_updated_at before update on ib_businesses for each row execute function set_updated_at();
+drop trigger if exists bookings_updated_at on bookings;
+create trigger bookings_updated_at before update on bookings for each row execute function set_updated_at();
+drop trigger if exists customers_updated_at on customers;
+create trigger customers_updated_at before update on customers for each row execute function set_updated_at();
+
+create index concurrently if not exists flights_updated_at_idx on flights (updated_at, id);
+create index concurrently if not exists conference_schedules_updated_at_idx on conference_schedules (updated_at, id);
+create index concurrently if not exists ib_businesses_updated_at_idx on ib_businesses (updated_at, id);
+create index concurrently if not exists bookings_updated_at_idx on bookings (updated_at, id);
+create index concurrently if not exists customers_updated_at_idx on customers (updated_at, id);
@@ -0,0 +1,9 @@
+-- Expression index backing users lookups by registration id.
+-- PostgREST renders filter("details->>registration_id", ...) as details->>'registration_id',
+-- so this index is picked up without changing any query.
+create index concurrently if not exists users_registration_id_idx
+    on users ((details->>'registration_id'));
+
+-- Bookings are matched to users through the customer email.
+create index concurrently if not exists customers_email_idx on customers (email);
+create index concurrently if not exists ib_businesses_user_id_idx on ib_businesses (user_id);
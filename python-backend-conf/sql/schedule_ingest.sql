@@ -0,0 +1,4 @@
+-- Natural key for schedule imports: one session per room and start time.
+-- schedule_ingest.py upserts on these columns, so re-running an import updates rows in place.
+create unique index if not exists conference_schedules_slot_key
+    on conference_schedules (conference_date, start_time, conference_room_name);
@@ -0,0 +1,33 @@
+-- Speaker / track / room facets aggregated in the database.
+-- With the btree indexes below, a keyset page
+--   select ... from schedule_speakers where speaker_name > $cursor order by speaker_name limit $n
+-- runs as an ordered index scan feeding a streaming GroupAggregate that stops after
+-- $n groups, so its cost does not grow with the size of conference_schedules.
+
+create index concurrently if not exists conference_schedules_speaker_idx
+    on conference_schedules (speaker_name);
+create index concurrently if not exists conference_schedules_track_idx
+    on conference_schedules (track_name);
+create index concurrently if not exists conference_schedules_room_idx
+    on conference_schedules (conference_room_name);
+-- Keyset order for session listings
+create index concurrently if not exists conference_schedules_start_idx
+    on conference_schedules (conference_date, start_time, id);
+
+create or replace view schedule_speakers as
+    select speaker_name, count(*) as session_count
+    from conference_schedules
+    where speaker_name is not null
+    group by speaker_name;
+
+create or replace view schedule_tracks as
+    select track_name, count(*) as session_count
+    from conference_schedules
+    where track_name is not null
+    group by track_name;
+
+create or replace view schedule_rooms as
+    select conference_room_name, count(*) as session_count
+    from conference_schedules
+    where conference_room_name is not null
+    group by conference_room_name;
@@ -0,0 +1,63 @@
+import asyncio
+import io
+import json
+from typing import Any, Dict, List
+
+import pytest
+from pydantic import TypeAdapter
+
+import bulk_ingest
+from bulk_ingest import MalformedInput, Unparsable, _iter_json
+
+ROWS = [{"id": i, "name": f"row {i}", "tags": ["a", "b"] * (i % 3)} for i in range(200)]
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Elements straddle chunk boundaries all the time
+    monkeypatch.setattr(bulk_ingest, "JSON_CHUNK_SIZE", 37)
+
+@pytest.mark.parametrize("text", [
+    json.dumps(ROWS),
+    json.dumps(ROWS, indent=2),
+    "\n  " + json.dumps(ROWS) + "\n",
+    "\n".join(json.dumps(row) for row in ROWS) + "\n",
+    "\n\n".join(json.dumps(row) for row in ROWS),
+])
+def test_reads_arrays_and_json_lines(text):
+    assert list(_iter_json(io.StringIO(text))) == ROWS
+
+def test_empty_input():
+    assert list(_iter_json(io.StringIO(""))) == []
+    assert list(_iter_json(io.StringIO(" [ ] "))) == []
+
+def test_bad_json_line_is_isolated():
+    lines = [json.dumps(row) for row in ROWS[:5]]
+    lines[2] = '{"id": 2, "name": '
+    values = list(_iter_json(io.StringIO("\n".join(lines))))
+    assert len(values) == 5
+    assert isinstance(values[2], Unparsable) and "invalid JSON" in values[2].reason
+    assert values[:2] + values[3:] == ROWS[:2] + ROWS[3:5]
+
+def test_bad_array_element_stops_within_the_cap(monkeypatch):
+    monkeypatch.setattr(bulk_ingest, "MAX_JSON_RECORD_SIZE", 500)
+    fp = io.StringIO("[" + json.dumps(ROWS[0]) + ", {oops}, " + json.dumps(ROWS * 50)[1:])
+    values = _iter_json(fp)
+    assert next(values) == ROWS[0]
+    with pytest.raises(MalformedInput, match="Record 2"):
+        next(values)
+    assert fp.tell() < 1000  # Gave up instead of buffering the rest of the file
+
+def test_pipeline_rejects_unparsable_lines_and_carries_on(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text("\n".join([json.dumps(ROWS[0]), "{broken", json.dumps(ROWS[1])]))
+    written = []
+
+    async def write(items):
+        written.extend(items)
+        return len(items)
+
+    report = asyncio.run(bulk_ingest.run_pipeline(bulk_ingest.read_records(str(path)), TypeAdapter(List[Dict[str, Any]]),
+                                                  write, batch_size=2))
+    assert written == ROWS[:2]
+    assert (report.read, report.written, report.rejected) == (3, 2, 1)
+    assert report.reject_samples[0]["record"] == 2
@@ -0,0 +1,159 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from change_feed import ChangeFeed, PostgrestSource, SQLiteSource, overlap
+from snapshot_store import SnapshotStore
+
+class Table:
+    """A local SQLite table whose writes stamp updated_at from a controllable clock."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.execute("create table sessions (id integer primary key, topic text, updated_at text)")
+        self.now = datetime(2025, 6, 1, 9, tzinfo=timezone.utc)
+
+    def stamp(self, seconds_ago: float = 0) -> str:
+        self.now += timedelta(milliseconds=10)
+        return (self.now - timedelta(seconds=seconds_ago)).isoformat()
+
+    def insert(self, row_id: int, topic: str, seconds_ago: float = 0) -> None:
+        self.conn.execute("insert into sessions values (?, ?, ?)", (row_id, topic, self.stamp(seconds_ago)))
+
+    def update(self, row_id: int, topic: str) -> None:
+        self.conn.execute("update sessions set topic = ?, updated_at = ? where id = ?", (topic, self.stamp(), row_id))
+
+    def delete(self, row_id: int) -> None:
+        self.conn.execute("delete from sessions where id = ?", (row_id,))
+
+    def rows(self):
+        return {row_id: {"id": row_id, "topic": topic, "updated_at": stamp}
+                for row_id, topic, stamp in self.conn.execute("select * from sessions")}
+
+@pytest.fixture
+def table():
+    return Table()
+
+def feed_for(table: Table, **kwargs) -> ChangeFeed:
+    feed = ChangeFeed("sessions", SQLiteSource(table.conn, "sessions"), **kwargs)
+    feed.received = []
+    feed.subscribe(lambda upserts, deletes: feed.received.append(([row["id"] for row in upserts], list(deletes))))
+    return feed
+
+def test_first_poll_reads_the_whole_table_across_pages(table):
+    for row_id in range(1, 8):
+        table.insert(row_id, f"topic {row_id}")
+    feed = feed_for(table, page_size=3)
+    upserts, deletes = feed.poll()
+    assert sorted(row["id"] for row in upserts) == list(range(1, 8))
+    assert deletes == []
+    assert feed.watermark == max(row["updated_at"] for row in table.rows().values())
+
+def test_polls_pass_on_only_inserts_and_updates(table):
+    table.insert(1, "a")
+    table.insert(2, "b")
+    feed = feed_for(table)
+    feed.poll()
+    version = feed.version
+    assert feed.poll() == ([], [])
+    assert feed.version == version
+    table.update(2, "b2")
+    table.insert(3, "c")
+    upserts, _ = feed.poll()
+    assert {row["id"]: row["topic"] for row in upserts} == {2: "b2", 3: "c"}
+    assert feed.version == version + 1
+
+def test_rows_in_the_overlap_are_not_passed_on_twice(table):
+    table.insert(1, "a")
+    feed = feed_for(table, reconcile_seconds=3600)
+    feed.poll()
+    table.insert(2, "b")
+    feed.poll()
+    # Both rows are within the re-read overlap of the watermark, and neither changed
+    assert overlap(feed.watermark) < min(row["updated_at"] for row in table.rows().values())
+    assert feed.poll() == ([], [])
+    assert feed.received == [([1], []), ([2], [])]
+
+def test_late_commits_behind_the_watermark_are_picked_up(table):
+    table.insert(1, "a")
+    feed = feed_for(table)
+    feed.poll()
+    # A transaction that started earlier commits after the poll, stamped before the watermark
+    table.insert(2, "late", seconds_ago=2)
+    assert table.rows()[2]["updated_at"] < feed.watermark
+    upserts, _ = feed.poll()
+    assert [row["id"] for row in upserts] == [2]
+
+def test_commits_older_than_the_overlap_are_only_seen_by_a_full_read(table):
+    table.insert(1, "a")
+    feed = feed_for(table)
+    feed.poll()
+    table.insert(2, "very late", seconds_ago=60)
+    assert feed.poll() == ([], [])
+
+def test_deletes_are_found_by_reconciling_ids(table):
+    for row_id in (1, 2, 3):
+        table.insert(row_id, str(row_id))
+    feed = feed_for(table, reconcile_seconds=3600)
+    feed.poll()
+    table.delete(2)
+    assert feed.poll() == ([], [])  # Not due yet
+    feed.reconcile_soon()
+    assert feed.poll() == ([], [2])
+    assert 2 not in feed.seen
+
+def test_collect_does_not_notify_until_pushed(table):
+    table.insert(1, "a")
+    feed = feed_for(table)
+    upserts, deletes = feed.collect()
+    assert feed.received == [] and feed.version == 0
+    assert feed.push(upserts, deletes)
+    assert feed.received == [([1], [])]
+
+def test_keyset_columns_added_for_the_feed_are_stripped():
+    source = PostgrestSource("ib_businesses", "id, details")
+    assert source.columns == "id, details, updated_at"
+    feed = ChangeFeed("ib_businesses", source)
+    received = []
+    feed.subscribe(lambda upserts, deletes: received.extend(upserts))
+    feed.push([{"id": 1, "details": {}, "updated_at": "2025-06-01T09:00:00"}])
+    assert received == [{"id": 1, "details": {}}]
+    assert feed.seen == {1: "2025-06-01T09:00:00"}
+
+def test_snapshot_store_follows_the_table_under_churn(table):
+    for row_id in range(1, 21):
+        table.insert(row_id, f"topic {row_id}")
+    feed = feed_for(table, page_size=7)
+    store = SnapshotStore("sessions", lambda: list(table.rows().values()), 0, feed=feed)
+    applied_on = []
+    store.subscribe(lambda upserts, deletes: applied_on.append(threading.current_thread()))
+
+    async def refresh():
+        store.invalidate()
+        await store.ensure_fresh()
+        return threading.current_thread()
+
+    for round_ in range(5):
+        for row_id in range(1 + round_, 21, 4):
+            table.update(row_id, f"topic {row_id} v{round_}")
+        table.insert(100 + round_, "new", seconds_ago=1)
+        table.delete(20 - round_)
+        loop_thread = asyncio.run(refresh())
+        assert store.rows == table.rows()
+        assert set(applied_on) == {loop_thread}
+
+def test_rows_written_through_the_store_are_not_reapplied(table):
+    table.insert(1, "a")
+    feed = feed_for(table)
+    store = SnapshotStore("sessions", lambda: [], 0, feed=feed)
+    stored = dict(table.rows()[1], created_at="2025-06-01")  # An insert returns more columns than the feed reads
+    store.apply_changes([stored])
+    version = store.version
+    feed.poll()
+    assert store.version == version
+    table.update(1, "b")
+    feed.poll()
+    assert store.version == version + 1 and store.rows[1]["topic"] == "b"
@@ -0,0 +1,111 @@
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+from pydantic import BaseModel
+
+from checkpoint_store import SCHEMA, CheckpointConflict, CheckpointStore
+
+class Ctx(BaseModel):
+    seat_number: str = ""
+
+HISTORY = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "checkpoints.db")
+
+@pytest.fixture
+def store(path):
+    # A long flush interval so tests decide when rows are written
+    store = CheckpointStore(path, flush_interval=60)
+    yield store
+    store.close()
+
+def flush_now(store):
+    with closing(store._connect()) as conn:
+        store._flush(conn)
+
+def stored_row(path, conversation_id):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute("select version, context from checkpoints where conversation_id = ?",
+                            (conversation_id,)).fetchone()
+
+def test_save_is_buffered_until_flush(store, path):
+    store.save("c1", Ctx(seat_number="1A"), HISTORY, 0)
+    assert store.load("c1").version == 1
+    assert stored_row(path, "c1") is None
+    flush_now(store)
+    assert stored_row(path, "c1") == (1, Ctx(seat_number="1A").model_dump_json())
+    assert store.load("c1").history == HISTORY
+
+def test_close_flushes_outstanding_writes(path):
+    store = CheckpointStore(path, flush_interval=60)
+    store.save("c1", Ctx(), HISTORY, 0)
+    store.close()
+    assert stored_row(path, "c1")[0] == 1
+
+def test_stale_save_raises_conflict(store):
+    store.save("c1", Ctx(), HISTORY, 0)
+    with pytest.raises(CheckpointConflict):
+        store.save("c1", Ctx(), HISTORY, 0)
+    flush_now(store)
+    with pytest.raises(CheckpointConflict):
+        store.save("c1", Ctx(), HISTORY, 0)
+    assert store.save("c1", Ctx(), HISTORY, 1).version == 2
+
+def test_write_lost_to_another_worker_is_seen_by_the_loser(path):
+    winner = CheckpointStore(path, flush_interval=60)
+    loser = CheckpointStore(path, flush_interval=60)
+    try:
+        # Both workers loaded version 0 and saved version 1 before either flushed
+        winner.save("c1", Ctx(seat_number="1A"), HISTORY, 0)
+        lost = loser.save("c1", Ctx(seat_number="2B"), HISTORY, 0)
+        flush_now(winner)
+        flush_now(loser)
+        assert stored_row(path, "c1") == (1, Ctx(seat_number="1A").model_dump_json())
+
+        # The loser now loads the winner's row, and cannot build on its own lost turn
+        current = loser.load("c1")
+        assert current.context == Ctx(seat_number="1A").model_dump_json()
+        with pytest.raises(CheckpointConflict):
+            loser.save("c1", Ctx(), HISTORY, lost.version, lost.updated_at)
+        assert loser.save("c1", Ctx(), HISTORY, current.version, current.updated_at).version == 2
+        assert "c1" not in loser._lost
+    finally:
+        winner.close()
+        loser.close()
+
+def test_failed_flush_requeues_the_batch(store, path):
+    store.save("c1", Ctx(seat_number="1A"), HISTORY, 0)
+    store.save("c2", Ctx(), HISTORY, 0)
+    broken = sqlite3.connect(path, isolation_level=None)
+    broken.execute("drop table checkpoints")
+    store._flush(broken)
+    broken.close()
+    assert set(store._pending) == {"c1", "c2"}
+
+    with closing(store._connect()) as conn:
+        conn.executescript(SCHEMA)
+    flush_now(store)
+    assert stored_row(path, "c1")[0] == 1
+    assert stored_row(path, "c2")[0] == 1
+
+def test_sweep_deletes_expired_checkpoints(path):
+    store = CheckpointStore(path, ttl=60, flush_interval=60)
+    try:
+        store.save("old", Ctx(), HISTORY, 0)
+        store.save("new", Ctx(), HISTORY, 0)
+        store._pending["old"] = store._pending["old"].model_copy(update={"updated_at": time.time() - 120})
+        flush_now(store)
+        # Expired rows are invisible before the sweep removes them
+        assert store.load("old") is None
+        assert store.save("old", Ctx(), HISTORY, 0).version == 1
+        store._pending.pop("old")
+        with closing(store._connect()) as conn:
+            store._sweep(conn)
+        assert stored_row(path, "old") is None
+        assert stored_row(path, "new")[0] == 1
+    finally:
+        store.close()
@@ -0,0 +1,26 @@
+import logging
+import queue
+
+import pytest
+
+from logging_config import LazyQueueHandler, redact
+
+@pytest.mark.parametrize("text, expected", [
+    ("seat for AB12CD", "seat for <confirmation>"),
+    ("booking 1A2B3C", "booking <confirmation>"),
+    ("mail jane.doe+x@example.com", "mail <email>"),
+    ("status of FL1234 and BA249", "status of FL1234 and BA249"),
+    ("registration 100042, session ABCDEF", "registration 100042, session ABCDEF"),
+])
+def test_redact(text, expected):
+    assert redact(text) == expected
+
+def test_queued_record_keeps_the_arguments_it_was_logged_with():
+    records = queue.SimpleQueue()
+    logger = logging.getLogger("test_logging_config.lazy")
+    logger.propagate = False
+    logger.addHandler(LazyQueueHandler(records))
+    seats = ["12A"]
+    logger.warning("seats %s", seats)
+    seats.append("14C")  # Mutated before a listener thread would render it
+    assert records.get_nowait().getMessage() == "seats ['12A']"
@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+from prefetch import prefetch_scope, register_prefetch, take
+
+loads = []
+
+async def load_speaker(name):
+    loads.append(name)
+    return [f"talk by {name}"]
+
+def extract_speakers(message):
+    return [name for name in ("ana airbus", "bo boeing") if name in message.lower()]
+
+register_prefetch("test_speaker", "test_search_sessions", extract_speakers, load_speaker, normalize=str.lower)
+
+def agent(*tools, handoffs=()):
+    return SimpleNamespace(tools=[SimpleNamespace(name=tool) for tool in tools], handoffs=list(handoffs))
+
+def test_tool_takes_what_the_message_prefetched():
+    async def turn():
+        with prefetch_scope("When does Ana Airbus speak?", agent("test_search_sessions")) as prefetch:
+            hit = await take("test_speaker", "  Ana Airbus ")
+            miss = await take("test_speaker", "Bo Boeing")
+        return hit, miss, prefetch.close()
+
+    loads.clear()
+    hit, miss, wasted = asyncio.run(turn())
+    assert hit == (True, ["talk by ana airbus"])
+    assert miss == (False, None)
+    assert loads == ["ana airbus"] and wasted == {}
+
+def test_prefetch_follows_handoff_targets():
+    async def turn():
+        with prefetch_scope("Ana Airbus?", agent(handoffs=[agent("test_search_sessions")])):
+            return await take("test_speaker", "ana airbus")
+
+    assert asyncio.run(turn())[0]
+
+def test_nothing_is_prefetched_for_an_agent_without_the_tool():
+    async def turn():
+        with prefetch_scope("When does Ana Airbus speak?", agent("get_all_tracks")) as prefetch:
+            return prefetch.tasks, await take("test_speaker", "ana airbus")
+
+    loads.clear()
+    tasks, taken = asyncio.run(turn())
+    assert tasks == {} and taken == (False, None) and loads == []
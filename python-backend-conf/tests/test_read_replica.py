@@ -0,0 +1,62 @@
+import json
+import random
+import time
+
+import pytest
+
+from read_replica import ReadReplica
+
+ORDER = ("conference_date", "start_time", "id")
+
+def nulls_last(row):
+    return tuple((row[c] is None, row[c] or "") if c != "id" else (False, row[c]) for c in ORDER)
+
+@pytest.fixture(scope="module")
+def replica(tmp_path_factory):
+    replica = ReadReplica(str(tmp_path_factory.mktemp("replica") / "replica.db"), ["conference_schedules"])
+    rng = random.Random(7)
+    rows = [{
+        "id": i,
+        "conference_date": rng.choice(["2025-06-01", "2025-06-02", None]),
+        "start_time": rng.choice(["09:00", "10:30", "14:00", None]),
+        "track_name": rng.choice(["AI", "Web"]),
+    } for i in range(1, 301)]
+    replica._conn().executemany(
+        'insert into "conference_schedules" (id, updated_at, data) values (?, ?, ?)',
+        [(row["id"], None, json.dumps(row)) for row in rows],
+    )
+    replica.synced_at["conference_schedules"] = time.time()
+    yield replica, rows
+    replica._conn().close()
+
+def pages(replica, limit, equals=None):
+    seen, after = [], None
+    while True:
+        rows = replica.select("conference_schedules", equals, order=ORDER, after=after, limit=limit)
+        seen.extend(rows)
+        if len(rows) < limit:
+            return seen
+        after = [rows[-1][c] for c in ORDER]
+
+def test_order_puts_nulls_last(replica):
+    replica, rows = replica
+    got = replica.select("conference_schedules", order=ORDER)
+    assert [r["id"] for r in got] == [r["id"] for r in sorted(rows, key=nulls_last)]
+
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_keyset_pages_cover_every_row_once(replica, limit):
+    replica, rows = replica
+    assert [r["id"] for r in pages(replica, limit)] == [r["id"] for r in sorted(rows, key=nulls_last)]
+
+def test_keyset_pages_with_filter(replica):
+    replica, rows = replica
+    expected = sorted((r for r in rows if r["track_name"] == "AI"), key=nulls_last)
+    assert [r["id"] for r in pages(replica, 9, {"track_name": "AI"})] == [r["id"] for r in expected]
+
+def test_stale_replica_defers_to_primary(replica):
+    replica, _ = replica
+    replica.note_write("conference_schedules")
+    try:
+        assert replica.select("conference_schedules", order=ORDER) is None
+    finally:
+        del replica.written_at["conference_schedules"]
@@ -0,0 +1,239 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from resilience import (
+    BudgetExhaustedError,
+    CircuitBreaker,
+    CircuitOpenError,
+    _hedged,
+    call_timeout,
+    get_breaker,
+    guarded,
+    recall,
+    remaining_budget,
+    request_budget,
+    serve_last_good,
+)
+from tool_output import COMPACT, output_mode_scope
+
+_names = itertools.count()
+
+def unique(prefix: str) -> str:
+    return f"{prefix}-{next(_names)}"
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def failing(error: BaseException):
+    async def call():
+        raise error
+    return call
+
+def slow(seconds: float, value="slow"):
+    async def call():
+        await asyncio.sleep(seconds)
+        return value
+    return call
+
+async def ok(value="ok"):
+    return value
+
+# -- CircuitBreaker ----------------------------------------------------------
+
+def open_breaker(reset_seconds: float = 0.02) -> CircuitBreaker:
+    breaker = CircuitBreaker(unique("breaker"), failure_threshold=2, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker(unique("breaker"), failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.01)  # Resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_retry_after_counts_down_while_open():
+    breaker = CircuitBreaker(unique("breaker"), failure_threshold=1, reset_seconds=60)
+    assert breaker.retry_after() == 0
+    breaker.record_failure()
+    assert 59 < breaker.retry_after() <= 60
+    breaker.record_success(0.01)
+    assert breaker.retry_after() == 0
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = open_breaker()
+    time.sleep(0.03)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success(0.01)
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_probe_reopens_and_released_probe_frees_the_slot():
+    breaker = open_breaker()
+    time.sleep(0.03)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(unique("breaker"), failure_threshold=2, reset_seconds=60, slow_call_seconds=0.1)
+    breaker.record_success(0.5)
+    breaker.record_success(0.5)
+    assert breaker.state == "open"
+
+# -- request_budget ----------------------------------------------------------
+
+def test_request_budget_caps_call_timeouts():
+    assert remaining_budget() is None
+    assert call_timeout(3) == 3
+    with request_budget(1):
+        assert 0 < remaining_budget() <= 1
+        assert call_timeout(3) <= 1
+        assert call_timeout(0.5) == 0.5
+    assert remaining_budget() is None
+
+def test_spent_budget_raises():
+    with request_budget(0):
+        with pytest.raises(BudgetExhaustedError):
+            call_timeout(3)
+
+# -- guarded -----------------------------------------------------------------
+
+def test_guarded_times_out_slow_calls_and_serves_fallback():
+    name = unique("slow")
+    result = asyncio.run(guarded(name, slow(1), timeout=0.02, fallback=lambda: "fallback"))
+    assert result == "fallback"
+    assert get_breaker(name).failures == 1
+
+def test_guarded_counts_connection_errors_and_5xx():
+    name = unique("flaky")
+    for error in (ConnectionError("refused"), FakeStatusError(503)):
+        assert asyncio.run(guarded(name, failing(error), fallback=lambda: "fallback")) == "fallback"
+    assert get_breaker(name).failures == 2
+
+def test_guarded_propagates_other_errors_without_tripping():
+    name = unique("bad-request")
+    for error in (ValueError("bad input"), FakeStatusError(400)):
+        with pytest.raises(type(error)):
+            asyncio.run(guarded(name, failing(error), fallback=lambda: "fallback"))
+    assert get_breaker(name).failures == 0
+
+def test_guarded_serves_fallback_when_the_budget_is_spent():
+    name = unique("late")
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "ok"
+
+    async def run():
+        with request_budget(0):
+            return await guarded(name, call, timeout=1, fallback=lambda: "fallback")
+
+    assert asyncio.run(run()) == "fallback"
+    assert calls == []
+    assert get_breaker(name).failures == 0
+
+def test_guarded_refuses_calls_while_open():
+    name = unique("down")
+    get_breaker(name, failure_threshold=1, reset_seconds=60)
+    asyncio.run(guarded(name, failing(ConnectionError()), fallback=lambda: None))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guarded(name, ok))
+    assert asyncio.run(guarded(name, ok, fallback=lambda: "fallback")) == "fallback"
+
+def test_guarded_half_open_probe_closes_the_breaker():
+    name = unique("recovering")
+    breaker = get_breaker(name, failure_threshold=1, reset_seconds=0.02)
+    asyncio.run(guarded(name, failing(ConnectionError()), fallback=lambda: None))
+    time.sleep(0.03)
+
+    async def run():
+        probe = asyncio.ensure_future(guarded(name, slow(0.05, "probe")))
+        await asyncio.sleep(0)
+        rejected = await guarded(name, ok, fallback=lambda: "fallback")
+        return await probe, rejected
+
+    assert asyncio.run(run()) == ("probe", "fallback")
+    assert breaker.state == "closed"
+
+# -- _hedged -----------------------------------------------------------------
+
+def attempts(*behaviours):
+    """A call whose nth attempt follows behaviours[n]: (delay, value or exception)."""
+    started = []
+
+    async def call():
+        delay, outcome = behaviours[len(started)]
+        started.append(outcome)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    return call, started
+
+def test_hedge_not_started_when_the_first_attempt_is_fast():
+    call, started = attempts((0, "first"), (0, "second"))
+    assert asyncio.run(_hedged(call, 0.05)) == "first"
+    assert started == ["first"]
+
+def test_hedge_wins_when_the_first_attempt_stalls():
+    call, started = attempts((1, "first"), (0, "second"))
+    began = time.monotonic()
+    assert asyncio.run(_hedged(call, 0.02)) == "second"
+    assert time.monotonic() - began < 0.5
+    assert len(started) == 2
+
+def test_hedge_falls_back_to_the_surviving_attempt():
+    call, _ = attempts((0.05, "first"), (0, ConnectionError("second failed")))
+    assert asyncio.run(_hedged(call, 0.01)) == "first"
+
+def test_hedge_raises_the_primary_error_when_both_fail():
+    call, _ = attempts((0.03, ConnectionError("first")), (0, ConnectionError("second")))
+    with pytest.raises(ConnectionError, match="first"):
+        asyncio.run(_hedged(call, 0.01))
+
+# -- serve_last_good ---------------------------------------------------------
+
+def test_serve_last_good_replaces_errors_with_the_last_result():
+    name = unique("tool")
+    responses = iter(["sessions v1", "Error fetching sessions", "sessions v2"])
+
+    @serve_last_good(name)
+    def tool(context=None, day=None):
+        return next(responses)
+
+    assert tool(day="mon") == "sessions v1"
+    assert tool(day="mon") == "sessions v1"
+    assert tool(day="mon") == "sessions v2"
+    assert recall(name, day="mon") == "sessions v2"
+
+def test_serve_last_good_keeps_arguments_and_output_modes_apart():
+    name = unique("tool")
+
+    @serve_last_good(name)
+    async def tool(context=None, day=None, fail=False):
+        return "Error: unavailable" if fail else f"{day} in {'compact' if day == 'tue' else 'verbose'}"
+
+    assert asyncio.run(tool(day="mon")) == "mon in verbose"
+    assert asyncio.run(tool(day="sun", fail=True)) == "Error: unavailable"
+    with output_mode_scope(COMPACT):
+        assert asyncio.run(tool(day="tue")) == "tue in compact"
+    assert recall(name, day="tue") is None
+    assert recall(name, day="tue", output_mode=COMPACT) == "tue in compact"
@@ -0,0 +1,39 @@
+import asyncio
+import io
+import json
+
+from bulk_ingest import run_pipeline
+from schedule_ingest import SCHEDULE_ADAPTER, conflict_key, to_row
+
+def record(number, topic, start="09:00", room="Hall A", day="2025-06-10"):
+    return number, {"topic": topic, "speaker_name": "Ana Airbus", "conference_date": day,
+                    "start_time": start, "conference_room_name": room}
+
+def ingest(records, batch_size):
+    batches = []
+
+    async def write(rows):
+        batches.append(rows)
+        return len(rows)
+
+    rejects = io.StringIO()
+    report = asyncio.run(run_pipeline(records, SCHEDULE_ADAPTER, write, transform=to_row, dedupe_key=conflict_key,
+                                      batch_size=batch_size, rejects=rejects))
+    return report, batches, [json.loads(line) for line in rejects.getvalue().splitlines()]
+
+def test_rows_sharing_a_conflict_key_are_written_once_per_batch():
+    records = [record(1, "First draft"), record(2, "Other slot", start="10:00"), record(3, "Second draft"),
+               record(4, "Final"), record(5, "Other room", room="Hall B")]
+    report, batches, rejects = ingest(records, batch_size=10)
+    (rows,) = batches
+    assert [row["topic"] for row in rows] == ["Other slot", "Final", "Other room"]
+    assert len({conflict_key(row) for row in rows}) == len(rows)
+    assert [reject["record"] for reject in rejects] == [1, 3]
+    assert "superseded by record 3" in rejects[0]["reason"]
+    assert (report.read, report.written, report.rejected) == (5, 3, 2)
+
+def test_duplicates_in_different_batches_are_left_to_the_upsert():
+    records = [record(1, "Draft"), record(2, "Final")]
+    report, batches, rejects = ingest(records, batch_size=1)
+    assert [[row["topic"] for row in rows] for rows in batches] == [["Draft"], ["Final"]]
+    assert rejects == [] and report.written == 2
@@ -0,0 +1,16 @@
+import pytest
+
+from schedule_queries import InvalidCursor, encode_cursor, fetch_facet_page
+
+@pytest.mark.parametrize("values", [
+    {"speaker_name": "Ada"},
+    {"conference_date": "2025-06-01", "start_time": "09:00", "id": 1},
+    {"track_name": None},
+])
+def test_facet_page_rejects_cursors_from_elsewhere(values):
+    with pytest.raises(InvalidCursor):
+        fetch_facet_page("tracks", cursor=encode_cursor(values))
+
+def test_facet_page_rejects_garbage_cursor():
+    with pytest.raises(InvalidCursor):
+        fetch_facet_page("rooms", cursor="not-a-cursor")
@@ -0,0 +1,160 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from schedule_timeline import ScheduleTimeline, from_minutes, session_span, to_minutes
+
+TRACKS = ["Artificial Intelligence", "Machine Learning", "Internet of Things", "Blockchain Technology", "Operations"]
+
+def synthetic_schedule(count: int = 50000, rooms: int = 400, days: int = 5, seed: int = 11):
+    """Sessions back to back in each room, 30-90 minutes long with 0-30 minute gaps."""
+    rng = random.Random(seed)
+    sessions, room, day, minute = [], 0, 0, 8 * 60
+    for i in range(count):
+        length = rng.choice((30, 45, 60, 90))
+        if minute + length > 20 * 60:
+            room, minute = room + 1, 8 * 60
+            if room == rooms:
+                room, day = 0, (day + 1) % days
+        sessions.append({
+            "id": i,
+            "topic": f"Session {i}",
+            "conference_date": f"2025-06-{10 + day}",
+            "start_time": f"{minute // 60:02d}:{minute % 60:02d}:00",
+            "end_time": f"{(minute + length) // 60:02d}:{(minute + length) % 60:02d}:00",
+            "conference_room_name": f"Room {room}",
+            "track_name": rng.choice(TRACKS),
+        })
+        minute += length + rng.choice((0, 0, 15, 30))
+    return sessions
+
+class LinearScan:
+    """The same queries answered by scanning every session."""
+
+    def __init__(self, sessions):
+        self.sessions = {s["id"]: s for s in sessions}
+        self.spans = {s["id"]: session_span(s) for s in sessions}
+
+    def in_room(self, sid, room):
+        return room is None or self.sessions[sid]["conference_room_name"].lower() == room.lower()
+
+    def overlapping(self, lo, hi, room=None):
+        return sorted(sid for sid, (start, end) in self.spans.items() if start < hi and end > lo and self.in_room(sid, room))
+
+    def next_sessions(self, after, room=None, limit=5):
+        return [sid for _, sid in sorted((start, sid) for sid, (start, _) in self.spans.items()
+                                         if start >= after and self.in_room(sid, room))[:limit]]
+
+    def conflicts(self, agenda):
+        return {frozenset((a, b)) for a in agenda for b in agenda
+                if a != b and self.spans[a][0] < self.spans[b][1] and self.spans[b][0] < self.spans[a][1]}
+
+    def free_minutes(self, lo, hi, room):
+        busy = set()
+        for sid in self.overlapping(lo, hi, room):
+            start, end = self.spans[sid]
+            busy.update(range(max(start, lo), min(end, hi)))
+        return set(range(lo, hi)) - busy
+
+def ids(sessions):
+    return sorted(s["id"] for s in sessions)
+
+@pytest.fixture(scope="module")
+def schedule():
+    sessions = synthetic_schedule()
+    timeline = ScheduleTimeline()
+    timeline.apply_changes(sessions, [])
+    return sessions, timeline, LinearScan(sessions)
+
+MOMENTS = [datetime(2025, 6, 11, 14, 20), datetime(2025, 6, 10, 8, 0), datetime(2025, 6, 14, 19, 59),
+           datetime(2025, 6, 12, 9, 30), datetime(2025, 6, 9, 12, 0)]
+
+@pytest.mark.parametrize("moment", MOMENTS)
+def test_happening_at_matches_a_linear_scan(schedule, moment):
+    _, timeline, scan = schedule
+    minutes = to_minutes(moment)
+    assert ids(timeline.happening_at(moment)) == scan.overlapping(minutes, minutes + 1)
+    assert ids(timeline.happening_at(moment, room="room 7")) == scan.overlapping(minutes, minutes + 1, "Room 7")
+
+def test_session_ending_at_a_moment_is_not_running(schedule):
+    sessions, timeline, _ = schedule
+    session = sessions[1234]
+    start, end = session_span(session)
+    assert session["id"] in ids(timeline.happening_at(from_minutes(start)))
+    assert session["id"] not in ids(timeline.happening_at(from_minutes(end)))
+
+@pytest.mark.parametrize("moment", MOMENTS)
+def test_next_sessions_match_a_linear_scan(schedule, moment):
+    _, timeline, scan = schedule
+    minutes = to_minutes(moment)
+    assert [s["id"] for s in timeline.next_sessions(moment, limit=20)] == scan.next_sessions(minutes, limit=20)
+    assert [s["id"] for s in timeline.next_sessions(moment, room="Room 7")] == scan.next_sessions(minutes, "Room 7")
+
+def test_overlapping_window_matches_a_linear_scan(schedule):
+    _, timeline, scan = schedule
+    start, end = datetime(2025, 6, 11, 14), datetime(2025, 6, 11, 16)
+    assert ids(timeline.overlapping(start, end)) == scan.overlapping(to_minutes(start), to_minutes(end))
+
+@pytest.mark.parametrize("room", ["Room 7", "Room 123", "Room 399"])
+def test_free_slots_cover_exactly_the_free_minutes(schedule, room):
+    _, timeline, scan = schedule
+    start, end = datetime(2025, 6, 11, 8), datetime(2025, 6, 11, 20)
+    lo, hi = to_minutes(start), to_minutes(end)
+    slots = timeline.free_slots(start, end, room=room, min_minutes=1)
+    covered = set()
+    for slot in slots:
+        covered.update(range(to_minutes(slot.start), to_minutes(slot.end)))
+    assert covered == scan.free_minutes(lo, hi, room)
+    for slot in timeline.free_slots(start, end, room=room, min_minutes=15):
+        assert to_minutes(slot.end) - to_minutes(slot.start) >= 15
+
+def test_agenda_conflicts_match_all_pairs(schedule):
+    _, timeline, scan = schedule
+    rng = random.Random(3)
+    moment = to_minutes(datetime(2025, 6, 11, 14, 20))
+    agenda = rng.sample(sorted(scan.spans), 40) + scan.overlapping(moment, moment + 1)[:3]
+    found = {frozenset((c.first["id"], c.second["id"])) for c in timeline.agenda_conflicts(agenda)}
+    assert found == scan.conflicts(agenda)
+    assert found  # The three sessions running at the same moment conflict
+
+def test_alternatives_fit_around_the_rest_of_the_agenda(schedule):
+    _, timeline, scan = schedule
+    moment = to_minutes(datetime(2025, 6, 11, 14, 20))
+    agenda = scan.overlapping(moment, moment + 1)[:5]
+    conflicting = agenda[-1]
+    others = [scan.spans[sid] for sid in agenda if sid != conflicting]
+    alternatives = timeline.alternatives(conflicting, agenda)
+    assert alternatives
+    for alternative in alternatives:
+        start, end = session_span(alternative)
+        assert alternative["track_name"] == scan.sessions[conflicting]["track_name"]
+        assert alternative["id"] != conflicting
+        assert all(end <= o_start or o_end <= start for o_start, o_end in others)
+
+def test_incremental_changes_match_a_rebuilt_timeline():
+    sessions = synthetic_schedule(5000, rooms=40, days=2)
+    incremental = ScheduleTimeline()
+    incremental.apply_changes(sessions, [])
+    rng = random.Random(5)
+    moved = [dict(s, start_time="07:00:00", end_time="07:45:00", conference_room_name="Room 1")
+             for s in rng.sample(sessions, 200)]
+    deleted = [s["id"] for s in rng.sample(sessions, 100) if s["id"] not in {m["id"] for m in moved}]
+    for start in range(0, len(moved), 50):  # Small batches take the per-session path
+        incremental.apply_changes(moved[start:start + 50], deleted if start == 0 else [])
+
+    current = {s["id"]: s for s in sessions}
+    current.update({m["id"]: m for m in moved})
+    for sid in deleted:
+        del current[sid]
+    rebuilt = ScheduleTimeline()
+    rebuilt.apply_changes(list(current.values()), [])
+    scan = LinearScan(list(current.values()))
+
+    for moment in (datetime(2025, 6, 10, 7, 10), datetime(2025, 6, 11, 13, 0)):
+        minutes = to_minutes(moment)
+        for room in (None, "Room 1"):
+            expected = scan.overlapping(minutes, minutes + 1, room)
+            assert ids(incremental.happening_at(moment, room=room)) == expected
+            assert ids(rebuilt.happening_at(moment, room=room)) == expected
+            assert [s["id"] for s in incremental.next_sessions(moment, room=room)] == scan.next_sessions(minutes, room)
@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TOOL_THREADS = int(os.getenv("TOOL_THREADS", "16"))
+DEFAULT_TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "8"))
+
+tool_calls = metrics.counter("tool_calls_total", "Tool invocations", ("tool",))
+tool_seconds = metrics.counter("tool_seconds_total", "Wall time spent in tools", ("tool",))
+tool_queue_seconds = metrics.counter("tool_queue_seconds_total", "Time tools waited for a concurrency slot", ("tool",))
+
+# Dedicated pool so blocking DB clients never compete with asyncio's default executor
+_pool = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the tool pool, keeping the caller's contextvars."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_pool, functools.partial(ctx.run, func, *args, **kwargs))
+
+def is_blocking(func: Callable[..., Any]) -> bool:
+    """Plain (non-async) tool functions block the event loop when called directly."""
+    return not inspect.iscoroutinefunction(func)
+
+def offload_blocking(max_concurrency: int = DEFAULT_TOOL_CONCURRENCY, name: Optional[str] = None):
+    """Turn a blocking tool into a coroutine that runs on the tool pool.
+
+    Apply below @function_tool (and below @memoize_tool, which then runs on the
+    loop). The agents runner gathers the tool calls of one model turn, so
+    offloaded tools fan out instead of running back to back. At most
+    max_concurrency calls of the same tool run at once; timings go to metrics.
+    Async functions are returned unchanged.
+    """
+    def decorator(func):
+        if not is_blocking(func):
+            return func
+        tool_name = name or func.__name__
+        semaphores: Dict[int, asyncio.Semaphore] = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            loop_id = id(asyncio.get_running_loop())
+            semaphore = semaphores.get(loop_id)
+            if semaphore is None:
+                semaphore = semaphores[loop_id] = asyncio.Semaphore(max_concurrency)
+            queued = time.perf_counter()
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    return await run_blocking(func, *args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    tool_calls.inc(tool=tool_name)
+                    tool_seconds.inc(elapsed, tool=tool_name)
+                    tool_queue_seconds.inc(started - queued, tool=tool_name)
+                    logger.debug("Tool %s took %.1f ms", tool_name, elapsed * 1000)
+        return wrapper
+    return decorator
@@ -0,0 +1,393 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from agents import custom_span
+import metrics
+from cache_utils import LRUCache
+from memory_monitor import register_cache
+from request_context import conversation_id_var
+from tool_output import COMPACT, output_mode
+
+logger = logging.getLogger(__name__)
+
+# Memo entries live for one conversation; the registry keeps the most recent ones
+MEMO_TTL_SECONDS = float(os.getenv("TOOL_MEMO_TTL_SECONDS", "300"))
+MAX_CONVERSATIONS = int(os.getenv("TOOL_MEMO_MAX_CONVERSATIONS", "1000"))
+MAX_ENTRIES_PER_CONVERSATION = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", "256"))
+# Results of mutating tools, replayed when a retried run repeats the same call
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "900"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+MemoKey = Tuple[Tuple[str, Any], ...]
+
+def _freeze(value: Any) -> Any:
+    """Turn tool arguments into something hashable."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if hasattr(value, "model_dump"):
+        return _freeze(value.model_dump())
+    return value
+
+def _completed_write(result: Any) -> bool:
+    """Only record writes that went through; a "Failed ..." result should be retried for real."""
+    return _is_cacheable(result) and not (isinstance(result, str) and result.startswith("Failed"))
+
+def _is_cacheable(result: Any) -> bool:
+    """Tools report failures as "Error ..." strings or {"error": ...} dicts; never memoize those."""
+    if result is None:
+        return False
+    if isinstance(result, str) and result.startswith("Error"):
+        return False
+    if isinstance(result, dict) and "error" in result:
+        return False
+    return True
+
+class ToolMemo:
+    """Tool results for a single conversation, keyed by tool name and cacheable args."""
+
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.entries: "OrderedDict[Tuple[str, MemoKey], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.hit_log: List[Dict[str, Any]] = []
+        # Results of mutating tools (run or replayed) in the current run, see idempotent_tool
+        self.writes: List[Tuple[str, Any]] = []
+
+    def get(self, tool_name: str, key: MemoKey) -> Tuple[bool, Any]:
+        entry = self.entries.get((tool_name, key))
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[(tool_name, key)]
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end((tool_name, key))
+        self.hits += 1
+        return True, value
+
+    def set(self, tool_name: str, key: MemoKey, value: Any, ttl: float = MEMO_TTL_SECONDS) -> None:
+        self.entries[(tool_name, key)] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end((tool_name, key))
+        while len(self.entries) > MAX_ENTRIES_PER_CONVERSATION:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, tool_name: str, match: Optional[Dict[str, Any]] = None) -> int:
+        """Drop entries of tool_name whose cached args agree with match (all entries if match is empty)."""
+        match = match or {}
+        dropped = 0
+        for entry_tool, key in list(self.entries):
+            if entry_tool != tool_name:
+                continue
+            args = dict(key)
+            if all(args.get(name) == value for name, value in match.items() if name in args):
+                del self.entries[(entry_tool, key)]
+                dropped += 1
+        return dropped
+
+    def drain_hits(self) -> List[Dict[str, Any]]:
+        """Return and clear the hits recorded since the last drain."""
+        hits, self.hit_log = self.hit_log, []
+        return hits
+
+    def drain_writes(self) -> List[Tuple[str, Any]]:
+        """Return and clear the (tool name, result) of mutating calls since the last drain."""
+        writes, self.writes = self.writes, []
+        return writes
+
+_registry: "OrderedDict[str, ToolMemo]" = OrderedDict()
+_current_memo: ContextVar[Optional[ToolMemo]] = ContextVar("tool_memo", default=None)
+register_cache("tool_memo", lambda: _registry)
+
+def get_memo(conversation_id: str) -> ToolMemo:
+    """Get or create the memo for a conversation, evicting the least recently used ones."""
+    memo = _registry.get(conversation_id)
+    if memo is None:
+        memo = ToolMemo(conversation_id)
+        _registry[conversation_id] = memo
+        while len(_registry) > MAX_CONVERSATIONS:
+            _registry.popitem(last=False)
+    else:
+        _registry.move_to_end(conversation_id)
+    return memo
+
+def invalidate_everywhere(*tool_names: str) -> int:
+    """Drop every conversation's entries for tool_names, e.g. after a bulk data change."""
+    return sum(memo.invalidate(tool_name) for memo in list(_registry.values()) for tool_name in tool_names)
+
+def current_memo() -> Optional[ToolMemo]:
+    """Memo bound to the running conversation, if any."""
+    return _current_memo.get()
+
+@contextmanager
+def conversation_scope(conversation_id: str):
+    """Bind the conversation's memo for the duration of an agent run."""
+    memo = get_memo(conversation_id)
+    token = _current_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _current_memo.reset(token)
+
+def _bind_args(sig: inspect.Signature, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    bound = sig.bind_partial(*args, **kwargs)
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+def memoize_tool(
+    name: Optional[str] = None,
+    key_args: Optional[Iterable[str]] = None,
+    ttl: float = MEMO_TTL_SECONDS,
+    cache_if: Callable[[Any], bool] = _is_cacheable,
+    per_output_mode: bool = True,
+):
+    """Memoize a read-only tool for the current conversation.
+
+    Apply below @function_tool. key_args names the arguments that identify a result;
+    by default every argument except the agent context is used. Compact and verbose
+    results are kept apart unless per_output_mode is False (for helpers returning data).
+    """
+    def decorator(func):
+        tool_name = name or func.__name__
+        sig = inspect.signature(func)
+        names = tuple(key_args) if key_args is not None else tuple(p for p in sig.parameters if p != "context")
+
+        def _key(args: tuple, kwargs: dict) -> MemoKey:
+            arguments = _bind_args(sig, args, kwargs)
+            key = tuple((n, _freeze(arguments.get(n))) for n in names)
+            if per_output_mode and output_mode() == COMPACT:
+                key += (("output_mode", COMPACT),)
+            return key
+
+        def _lookup(memo: ToolMemo, key: MemoKey) -> Tuple[bool, Any]:
+            found, value = memo.get(tool_name, key)
+            if found:
+                memo.hit_log.append({"tool_name": tool_name, "tool_args": dict(key)})
+                with custom_span("tool_memo_hit", data={"tool": tool_name, "conversation_id": memo.conversation_id}):
+                    logger.debug("Memo hit for %s %s in %s", tool_name, key, memo.conversation_id)
+            return found, value
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                memo = _current_memo.get()
+                if memo is None:
+                    return await func(*args, **kwargs)
+                key = _key(args, kwargs)
+                found, value = _lookup(memo, key)
+                if found:
+                    return value
+                result = await func(*args, **kwargs)
+                if cache_if(result):
+                    memo.set(tool_name, key, result, ttl)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            memo = _current_memo.get()
+            if memo is None:
+                return func(*args, **kwargs)
+            key = _key(args, kwargs)
+            found, value = _lookup(memo, key)
+            if found:
+                return value
+            result = func(*args, **kwargs)
+            if cache_if(result):
+                memo.set(tool_name, key, result, ttl)
+            return result
+        return sync_wrapper
+    return decorator
+
+def invalidates_memo(*tool_names: str, match_args: Iterable[str] = ()):
+    """Mark a mutating tool; after it runs, matching memo entries of tool_names are dropped.
+
+    match_args names arguments of the mutating tool that must equal the cached args
+    of the same name; with no match_args every entry of those tools is dropped.
+    """
+    match_args = tuple(match_args)
+
+    def decorator(func):
+        sig = inspect.signature(func)
+
+        def _invalidate(args: tuple, kwargs: dict) -> None:
+            memo = _current_memo.get()
+            if memo is None:
+                return
+            arguments = _bind_args(sig, args, kwargs)
+            match = {n: _freeze(arguments.get(n)) for n in match_args}
+            for tool_name in tool_names:
+                dropped = memo.invalidate(tool_name, match)
+                if dropped:
+                    logger.debug("Invalidated %d memo entries of %s after %s", dropped, tool_name, func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _invalidate(args, kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _invalidate(args, kwargs)
+        return sync_wrapper
+    return decorator
+
+# (conversation, tool, scope) key -> (call key, result) of the latest completed call
+_idempotent_results = LRUCache(maxsize=IDEMPOTENCY_MAX_ENTRIES, ttl=IDEMPOTENCY_TTL_SECONDS)
+_idempotent_in_flight: Dict[str, "asyncio.Future[Any]"] = {}
+register_cache("idempotent_results", lambda: _idempotent_results._data)
+duplicate_calls = metrics.counter(
+    "tool_duplicate_calls_suppressed_total", "Repeated mutating tool calls answered from the idempotency store", ("tool",)
+)
+idempotent_executions = metrics.counter("tool_idempotent_executions_total", "Mutating tool calls that ran", ("tool",))
+
+def idempotency_key(conversation_id: str, tool_name: str, arguments: Dict[str, Any]) -> str:
+    """Stable key for a mutating tool's arguments in a conversation."""
+    payload = json.dumps([conversation_id, tool_name, _freeze(arguments)], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def idempotent_tool(
+    name: Optional[str] = None,
+    scope_args: Iterable[str] = (),
+    ttl: float = IDEMPOTENCY_TTL_SECONDS,
+    record_if: Callable[[Any], bool] = _completed_write,
+    on_replay: Optional[Callable[..., None]] = None,
+    scope: Optional[Callable[[Dict[str, Any]], Any]] = None,
+):
+    """Suppress repeats of a mutating tool call, as retried agent runs produce.
+
+    Apply below @function_tool. The latest completed call per conversation and
+    scope_args (e.g. the confirmation number) is recorded for ttl; scope, called
+    with the bound arguments, adds a derived value to the scope (e.g. a
+    normalized name inside a model argument). Calling again with identical
+    arguments returns the recorded result without running the tool, and a
+    repeat that arrives while the call is still running waits for it. A call
+    with different arguments in the same scope runs and replaces the record,
+    so changing a seat back and forth still writes every time. Outside
+    a conversation the tool always runs; conversation ids are per caller (see
+    main.conversation_for), so a record is never replayed to someone else.
+
+    A replay skips the tool body, so on_replay, called with the tool's
+    arguments (context included), re-applies the tool's effects on the
+    context: a retried run may carry a context that never saw the first call.
+    Completed calls, replays included, are listed in the conversation memo's
+    writes, so a run that fails afterwards can still report them.
+    """
+    scope_args = tuple(scope_args)
+
+    def decorator(func):
+        tool_name = name or func.__name__
+        sig = inspect.signature(func)
+        names = tuple(p for p in sig.parameters if p != "context")
+
+        def _keys(args: tuple, kwargs: dict) -> Tuple[Optional[str], Optional[str]]:
+            memo = _current_memo.get()
+            conversation_id = memo.conversation_id if memo is not None else conversation_id_var.get()
+            if not conversation_id:
+                return None, None
+            arguments = _bind_args(sig, args, kwargs)
+            scoped = {n: arguments.get(n) for n in scope_args}
+            if scope is not None:
+                scoped["scope"] = scope(arguments)
+            return (idempotency_key(conversation_id, tool_name, scoped),
+                    idempotency_key(conversation_id, tool_name, {n: arguments.get(n) for n in names}))
+
+        def _note_write(result: Any) -> None:
+            memo = _current_memo.get()
+            if memo is not None and record_if(result):
+                memo.writes.append((tool_name, result))
+
+        def _reapply(args: tuple, kwargs: dict) -> None:
+            if on_replay is None:
+                return
+            try:
+                on_replay(*args, **kwargs)
+            except Exception as e:
+                logger.warning("Re-applying %s to the context failed: %s", tool_name, e)
+
+        def _replayed(scope_key: str, call_key: str, args: tuple, kwargs: dict) -> Tuple[bool, Any]:
+            recorded = _idempotent_results.get(scope_key)
+            if recorded is None or recorded[0] != call_key:
+                return False, None
+            duplicate_calls.inc(tool=tool_name)
+            logger.info("Suppressed duplicate %s call (key %s)", tool_name, call_key[:12])
+            _reapply(args, kwargs)
+            _note_write(recorded[1])
+            return True, recorded[1]
+
+        def _record(scope_key: str, call_key: str, result: Any) -> None:
+            _note_write(result)
+            if record_if(result):
+                _idempotent_results.set(scope_key, (call_key, result), ttl)
+            else:
+                _idempotent_results.pop(scope_key)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                scope_key, call_key = _keys(args, kwargs)
+                if call_key is None:
+                    return await func(*args, **kwargs)
+                found, value = _replayed(scope_key, call_key, args, kwargs)
+                if found:
+                    return value
+                running = _idempotent_in_flight.get(call_key)
+                if running is not None:
+                    duplicate_calls.inc(tool=tool_name)
+                    result = await asyncio.shield(running)
+                    if record_if(result):
+                        _reapply(args, kwargs)
+                    _note_write(result)
+                    return result
+                running = _idempotent_in_flight[call_key] = asyncio.get_running_loop().create_future()
+                try:
+                    idempotent_executions.inc(tool=tool_name)
+                    result = await func(*args, **kwargs)
+                except asyncio.CancelledError:
+                    running.cancel()
+                    raise
+                except Exception as e:
+                    running.set_exception(e)
+                    running.exception()  # Mark retrieved when nobody was waiting
+                    raise
+                finally:
+                    _idempotent_in_flight.pop(call_key, None)
+                _record(scope_key, call_key, result)
+                running.set_result(result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            scope_key, call_key = _keys(args, kwargs)
+            if call_key is None:
+                return func(*args, **kwargs)
+            found, value = _replayed(scope_key, call_key, args, kwargs)
+            if found:
+                return value
+            idempotent_executions.inc(tool=tool_name)
+            result = func(*args, **kwargs)
+            _record(scope_key, call_key, result)
+            return result
+        return sync_wrapper
+    return decorator
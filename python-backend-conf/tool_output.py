@@ -0,0 +1,105 @@
+"""Compact tool output: a header line and tab-separated rows instead of decorated markdown.
+
+Every tool result is fed back into the model on the following calls, so
+repeated labels and emoji cost context on each of them. Agents built with
+agent_tools() can run their tools in compact mode; the tools check
+is_compact() and render the same data as a table, and the agent's final
+answer (or humanize(), for fallbacks that skip the model) turns it into
+prose once.
+"""
+import dataclasses
+import functools
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, List, Optional, Sequence
+
+VERBOSE = "verbose"
+COMPACT = "compact"
+
+# Agents whose tools answer in compact mode
+COMPACT_AGENTS = {a.strip() for a in os.getenv("COMPACT_TOOL_OUTPUT_AGENTS", "ConferenceAgent").split(",") if a.strip()}
+
+COMPACT_INSTRUCTIONS = (
+    " Tool results are tables: a header line of tab-separated column names, then one row per line;"
+    " a last line like more=<cursor> means another page is available."
+    " Answer the user in readable sentences or lists, never as raw tables."
+)
+
+_output_mode: ContextVar[str] = ContextVar("tool_output_mode", default=VERBOSE)
+
+def output_mode() -> str:
+    return _output_mode.get()
+
+def is_compact() -> bool:
+    return _output_mode.get() == COMPACT
+
+@contextmanager
+def output_mode_scope(mode: str):
+    token = _output_mode.set(mode)
+    try:
+        yield
+    finally:
+        _output_mode.reset(token)
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = ",".join(str(v) for v in value)
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+def table(columns: Sequence[str], rows: Iterable[Sequence[Any]], more: Optional[str] = None) -> str:
+    """Header line plus one tab-separated line per row; more is the next-page cursor, if any."""
+    lines = ["\t".join(columns)]
+    lines.extend("\t".join(_cell(value) for value in row) for row in rows)
+    if more:
+        lines.append(f"more={more}")
+    return "\n".join(lines)
+
+def humanize(text: str) -> str:
+    """Compact tables as numbered "column: value" lines, for answers that bypass the model."""
+    blocks = []
+    for block in text.split("\n\n"):
+        lines = block.splitlines()
+        if len(lines) < 2 or "\t" not in lines[0]:
+            blocks.append(block)
+            continue
+        columns = lines[0].split("\t")
+        out = []
+        for i, line in enumerate(lines[1:], 1):
+            if line.startswith("more="):
+                out.append("More results are available.")
+                continue
+            values = line.split("\t")
+            out.append(f"{i}. " + ", ".join(f"{c.replace('_', ' ')}: {v}" for c, v in zip(columns, values) if v))
+        blocks.append("\n".join(out))
+    return "\n\n".join(blocks)
+
+def with_output_mode(tool: Any, mode: str) -> Any:
+    """A copy of an SDK function tool whose invocations run in the given output mode."""
+    invoke = getattr(tool, "on_invoke_tool", None)
+    if invoke is None or not dataclasses.is_dataclass(tool):
+        return tool
+
+    async def on_invoke_tool(ctx, input_json):
+        with output_mode_scope(mode):
+            return await invoke(ctx, input_json)
+    return dataclasses.replace(tool, on_invoke_tool=on_invoke_tool)
+
+def agent_tools(agent_name: str, tools: List[Any]) -> List[Any]:
+    """The agent's tools, switched to compact output when the agent is in COMPACT_AGENTS."""
+    if agent_name not in COMPACT_AGENTS:
+        return tools
+    return [with_output_mode(tool, COMPACT) for tool in tools]
+
+def agent_instructions(agent_name: str, instructions: Any) -> Any:
+    """The agent's instructions (a string or a callable returning one), explaining compact results when it uses them."""
+    if agent_name not in COMPACT_AGENTS:
+        return instructions
+    if callable(instructions):
+        @functools.wraps(instructions)
+        def compact_instructions(*args):
+            return instructions(*args) + COMPACT_INSTRUCTIONS
+        return compact_instructions
+    return instructions + COMPACT_INSTRUCTIONS
@@ -18,6 +18,10 @@ export async function callChatAPI(
       body.registration_id = registrationId;
     }
 
+    if (conversationId) {
+      body.conversation_id = conversationId;
+    }
+
     // Use the defined base URL for the chat endpoint
     const res = await fetch(`${BACKEND_API_BASE_URL}/chat`, { 
       method: "POST",
@@ -57,4 +61,18 @@ export async function getBookingInfo(confirmationNumber: string) {
     console.error("Error fetching booking info:", err);
     return null;
   }
+}
+
+// Helper to get several bookings (e.g. a customer's itinerary) in one request
+export async function getBookingsInfo(confirmationNumbers: string[]) {
+  try {
+    const params = new URLSearchParams();
+    confirmationNumbers.forEach((number) => params.append("confirmation", number));
+    const res = await fetch(`${BACKEND_API_BASE_URL}/bookings?${params.toString()}`);
+    if (!res.ok) throw new Error(`Bookings API error: ${res.status}`);
+    return res.json();
+  } catch (err) {
+    console.error("Error fetching bookings info:", err);
+    return null;
+  }
 }
\ No newline at end of file